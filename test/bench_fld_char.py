@@ -0,0 +1,64 @@
+"""
+Benchmark of 'spearman_matrix' against the previous implementation, which
+correlated columns with the same rows together and every other pair of
+columns on its own, for columns with a share of their rows missing. Run
+from the test directory:
+    python bench_fld_char.py [rows_n] [cols_n]
+"""
+import sys
+import numpy as np
+from util.fld_char import _spearman_, spearman_matrix
+from util.timer import Timer
+
+
+def spearman_matrix_pairs(rows, samples):
+    """ Previous 'spearman_matrix', ranking each pair of columns apart. """
+    k = len(samples)
+    cr = np.full((k, k), np.nan)
+    pv = np.full((k, k), np.nan)
+    srt = []
+    groups = {}
+    for i, (rw, smp) in enumerate(zip(rows, samples)):
+        order = np.argsort(rw, kind='stable')
+        srt.append((rw[order], smp[order]))
+        groups.setdefault(srt[i][0].tobytes(), []).append(i)
+    for idx in groups.values():
+        ix = np.ix_(idx, idx)
+        cr[ix], pv[ix] = _spearman_(np.column_stack([srt[i][1] for i in idx]))
+    grp = {i: g for g, idx in enumerate(groups.values()) for i in idx}
+    for i in range(k - 1):
+        for j in range(i + 1, k):
+            if grp[i] != grp[j]:
+                _, ii, jj = np.intersect1d(srt[i][0], srt[j][0],
+                                           return_indices=True)
+                pcr, ppv = _spearman_(
+                    np.column_stack([srt[i][1][ii], srt[j][1][jj]]))
+                cr[i, j] = cr[j, i] = pcr[0, 1]
+                pv[i, j] = pv[j, i] = ppv[0, 1]
+    return cr, pv
+
+
+def bench(rows_n, cols_n):
+    rng = np.random.default_rng(1)
+    print("%-22s %6s %10s %10s" % ('function', 'nulls', 'secs', 'max_diff'))
+    for nulls in (0, .01, .05):
+        rows = []
+        samples = []
+        for _ in range(cols_n):
+            keep = rng.random(rows_n) >= nulls
+            rows.append(np.arange(rows_n, dtype=float)[keep])
+            samples.append(rng.random(rows_n)[keep])
+        with Timer() as prev_tm:
+            prev_cr, _ = spearman_matrix_pairs(rows, samples)
+        with Timer() as tm:
+            cr, _ = spearman_matrix(rows, samples)
+        max_diff = np.nanmax(np.abs(prev_cr - cr))
+        for fn, t in ((spearman_matrix_pairs, prev_tm),
+                      (spearman_matrix, tm)):
+            print("%-22s %6.2f %10.3f %10.2g" %
+                  (fn.__name__, nulls, t.secs, max_diff))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+          int(sys.argv[2]) if len(sys.argv) > 2 else 50)
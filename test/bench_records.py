@@ -0,0 +1,55 @@
+"""
+Benchmark of building, sorting and hashing OpenRecords, flat and nested,
+of FrozenRecords, which cache their keys, and of reading CSV as OpenRecords
+and SlotRecords. Run from the test directory:
+    python bench_records.py [data_n]
+"""
+import csv
+import io
+from random import randint, seed
+import sys
+from util.open_record import OpenRecord
+from util.slot_record import SlotRecord
+from util.timer import Timer
+
+
+def timed(fn):
+    """ Seconds for the best of three calls of 'fn'. """
+    secs = []
+    for _ in range(3):
+        with Timer() as tm:
+            fn()
+        secs.append(tm.secs)
+    return min(secs)
+
+
+def bench(data_n):
+    seed(1)
+    flat = [dict(('f%d' % j, randint(0, 1000)) for j in range(10))
+            for _ in range(data_n)]
+    nested = [dict(a=randint(0, 100), b={'x': randint(0, 9)}, c=[1, 2])
+              for _ in range(data_n)]
+    flat_recs = [OpenRecord(x) for x in flat]
+    nested_recs = [OpenRecord(x) for x in nested]
+    frozen_recs = [rec.freeze() for rec in nested_recs]
+    so = io.StringIO()
+    wrt = csv.DictWriter(so, fieldnames=list(flat[0]))
+    wrt.writeheader()
+    wrt.writerows(flat)
+    csv_text = so.getvalue()
+    print("%-16s %10s %12s" % ('operation', 'secs', 'records/sec'))
+    for name, fn in (
+            ('construct', lambda: [OpenRecord(x) for x in flat]),
+            ('sort flat', lambda: sorted(flat_recs)),
+            ('sort nested', lambda: sorted(nested_recs)),
+            ('set flat', lambda: set(flat_recs)),
+            ('freeze nested', lambda: [rec.freeze() for rec in nested_recs]),
+            ('set frozen', lambda: set(frozen_recs)),
+            ('csv open', lambda: OpenRecord.from_csv(csv_text)),
+            ('csv slot', lambda: SlotRecord.from_csv(csv_text))):
+        secs = timed(fn)
+        print("%-16s %10.3f %12.0f" % (name, secs, data_n / secs))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,96 @@
+"""
+Benchmark of the percentile ranked, T independent and grouped rank sums
+score generators over a long stream of values against the previous
+implementations, which re-sort and re-summarize the entire base each time it
+is refreshed or insert each value in a sorted list. Run from the test
+directory:
+    python bench_testers.py [data_n]
+"""
+from bisect import bisect_left, bisect_right, insort
+from math import sqrt
+from random import weibullvariate
+import sys
+import numpy as np
+from util.stat_utils import _rs_score_
+from util.testers import grs_scores, pr_scores, ti_scores
+from util.timer import Timer
+from util.transform import to_sqrt_trans
+
+
+def pr_scores_sort(data):
+    """ Previous 'pr_scores', sorting the base on each refresh. """
+    n = len(data)
+    ref_n = int(sqrt(n))
+    stage = []
+    base = []
+    for x in data:
+        ps = 0
+        if len(base):
+            ps = (bisect_left(base, x) / (len(base) + .5) - .5) * 2
+        stage.append(x)
+        if len(stage) == ref_n:
+            base.extend(stage)
+            base.sort()
+            stage = []
+        yield ps
+
+
+def ti_scores_full(data):
+    """ Previous 'ti_scores', recomputing base moments on each refresh. """
+    n = len(data)
+    ref_n = int(sqrt(n))
+    stage = []
+    base = []
+    mu = sd = 1
+    for x in to_sqrt_trans(data):
+        ts = 0
+        if len(base):
+            ts = min(max((x - mu) / sd, -6), 6)
+        stage.append(x)
+        if len(stage) == ref_n:
+            base.extend(stage)
+            mu = np.mean(base)
+            sd = np.std(base) / .6745
+            stage = []
+        yield ts
+
+
+def grs_scores_insort(data, gp_n):
+    """ Previous 'grs_scores', inserting each value in a sorted base. """
+    gp = []
+    base = []
+    for x in data:
+        gp.append(x)
+        if len(gp) == gp_n:
+            ts = 0
+            if len(base) >= gp_n * 2:
+                rs = gp_n * (gp_n + 1) / 2
+                for y in gp:
+                    li = bisect_left(base, y)
+                    rs += li + (bisect_right(base, y, li) - li) / 2
+                ts = _rs_score_(rs, gp_n, len(base))
+            for y in gp:
+                insort(base, y)
+            gp = []
+            yield min(max(ts, -6), 6)
+
+
+def bench(data_n):
+    data = [weibullvariate(1, 1.1) for _ in range(data_n)]
+    print("%-16s %10s %12s %10s" %
+          ('tester', 'secs', 'points/sec', 'max_diff'))
+    for prev_fn, fn, args in ((pr_scores_sort, pr_scores, ()),
+                              (ti_scores_full, ti_scores, ()),
+                              (grs_scores_insort, grs_scores, (5,))):
+        with Timer() as prev_tm:
+            prev_scores = list(prev_fn(data, *args))
+        with Timer() as tm:
+            scores = list(fn(data, *args))
+        max_diff = max(abs(x - y) for x, y in zip(prev_scores, scores))
+        for name, t in ((prev_fn.__name__, prev_tm), (fn.__name__, tm)):
+            print("%-16s %10.3f %12.0f %10.2g" %
+                  (name, t.secs, data_n / t.secs, max_diff))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,116 @@
+"""
+Benchmark of 'to_snake_name', 'flatten_list' and 'find_lcs' against the
+previous implementations, a character loop without a cache, a recursive
+flatten and a longest match for every pair of names. Column names are
+converted for each row batch of a query, so most are repeats. Run from the
+test directory:
+    python bench_util_tools.py [data_n] [names_n]
+"""
+from collections import defaultdict
+from difflib import SequenceMatcher
+import operator
+from random import choice, seed
+import sys
+from util.timer import Timer
+from util.util_tools import find_lcs, flatten_list, to_snake_name
+
+COLUMNS = ['CustomerId', 'FirstName', 'LastName', 'OrderDate', 'totalAmount',
+           'ship_to', 'Status', 'HTTPStatusCode']
+
+
+def to_snake_name_loop(name):
+    """ Previous 'to_snake_name', rescanning to remove double '_'. """
+    result = []
+    chx = [c if c.isalnum() else '_' for c in name.strip()]
+    for i, ch in enumerate(chx):
+        if ch.isupper():
+            if ((i - 1 > 0 and chx[i - 1].islower()) or
+                    (i - 1 > 0 and i + 1 < len(chx) and chx[i + 1].islower())):
+                result.append("_%s" % ch.lower())
+            else:
+                result.append(ch.lower())
+        else:
+            result.append(ch)
+    sn_name = ''.join(result)
+    while '__' in sn_name:
+        sn_name = sn_name.replace('__', '_')
+    return sn_name
+
+
+def flatten_list_rec(x):
+    """ Previous 'flatten_list', recursing into each sub-list. """
+    def _flatten_list_(x, fls):
+        if isinstance(x, (list, tuple)):
+            for y in x:
+                if isinstance(y, (list, tuple)):
+                    for z in y:
+                        _flatten_list_(z, fls)
+                else:
+                    fls.append(y)
+        else:
+            fls.append(x)
+        return fls
+    return _flatten_list_(x, [])
+
+
+def find_lcs_pairs(names):
+    """ Previous 'find_lcs', matching every pair of names. """
+    sub_counts = defaultdict(int)
+    for i in range(0, len(names)):
+        for j in range(i + 1, len(names)):
+            sm = SequenceMatcher(None, names[i], names[j])
+            match = sm.find_longest_match(0, len(names[i]), 0, len(names[j]))
+            match_sub = names[i][match.a:match.a + match.size]
+            sub_counts[match_sub] += 1
+    common_sub = max(sub_counts.items(), key=operator.itemgetter(1))[0]
+    return common_sub, [name.replace(common_sub, '') for name in names]
+
+
+def metric_names(names_n):
+    """ 'names_n' metric names sharing a prefix, for 'find_lcs'. """
+    seed(1)
+    return ['prod.dc1.host%03d.%s.%s' %
+            (choice(range(500)), choice(['cpu', 'mem', 'disk', 'net']),
+             choice(['p50', 'p90', 'p99', 'max', 'count']))
+            for _ in range(names_n)]
+
+
+def timed(fn, data):
+    """ Seconds to apply 'fn' to each of 'data', and the results. """
+    with Timer() as tm:
+        results = [fn(x) for x in data]
+    return tm.secs, results
+
+
+def bench(data_n, names_n):
+    repeated = COLUMNS * (data_n // len(COLUMNS))
+    unique = ['someColumn%dName' % i for i in range(data_n)]
+    wide = [[[i, (i, i + 1)], [i]] for i in range(data_n)]
+    deep = [0]
+    for i in range(10000):
+        deep = [deep, i]
+    print("%-20s %-10s %10s %12s %6s" %
+          ('function', 'data', 'secs', 'items/sec', 'same'))
+    for prev_fn, fn, cases in (
+            (to_snake_name_loop, to_snake_name,
+             (('repeated', repeated), ('unique', unique))),
+            (flatten_list_rec, flatten_list,
+             (('wide', [wide]), ('deep', [deep]))),
+            (find_lcs_pairs, find_lcs,
+             (('metrics', [metric_names(names_n)]),))):
+        for case, data in cases:
+            if fn is to_snake_name:
+                to_snake_name.cache_clear()
+            prev_secs, prev_res = timed(prev_fn, data)
+            secs, res = timed(fn, data)
+            n = len(data) if len(data) > 1 else len(flatten_list(data))
+            for name, t in ((prev_fn.__name__, prev_secs),
+                            (fn.__name__, secs)):
+                print("%-20s %-10s %10.3f %12.0f %6s" %
+                      (name, case, t, n / t, prev_res == res))
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(30000)
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+          int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
@@ -1,8 +1,8 @@
 import unittest
 from copy import deepcopy
 from random import choice
-from util.ab_tester import ab_test
-from util.data_generator import gen_cycle, gen_flat
+from util.ab_tester import ab_test, ab_test_batch
+from util.data_generator import change, gen_cycle, gen_flat
 from test_evaluator import TestEvaluator
 from util.util_tools import get_source_info
 
@@ -133,6 +133,44 @@ class TestABTester(unittest.TestCase):
             self.assertTrue(rpt.fn < .5, rpt)
             self.assertTrue(rpt.eff > .5, rpt)
 
+    def test_ab_tester_batch(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        count = 20
+        day_n = 288
+        data_n = day_n * 14
+        test_n = day_n // 24
+        dates, _ = gen_cycle(5, day_n, data_n, cycle='mid')
+        names = []
+        values = []
+        for i in range(count):
+            names.append("series_%02d" % i)
+            values.append(change(gen_cycle(5, day_n, data_n)[1],
+                                 choice((.5, 1.0, 2.0)),
+                                 data_n - test_n,
+                                 data_n))
+        tests, data_set = ab_test_batch(
+            names, dates, values, test_n=test_n, day_type_n=3, hour_n=3)
+        self.assertEqual(count, len(tests))
+        self.assertEqual(test_n, len(data_set.a_dates))
+        for name, series, test in zip(names, values, tests):
+            exp_test, exp_data_set = ab_test(
+                name, dates, series, test_n=test_n, day_type_n=3, hour_n=3)
+            self.assertEqual(exp_data_set.b_dates, data_set.b_dates)
+            for fn in ('before', 'after', 'mape', 'mpe', 'pct_diff', 'score'):
+                self.assertAlmostEqual(exp_test[fn], test[fn], 6, fn)
+            self.assertEqual(exp_test.is_under, test.is_under)
+            self.assertEqual(exp_test.is_over, test.is_over)
+
+    def test_ab_tester_batch_not_enough_data(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        dates, values = gen_cycle(5, 288, 288 * 2)
+        tests, data_set = ab_test_batch(['a', 'b'], dates, [values, values])
+        self.assertEqual(2, len(tests))
+        self.assertEqual(0, tests[0].score)
+        self.assertFalse('a_dates' in data_set)
+        with self.assertRaises(ValueError):
+            ab_test_batch(['a'], dates, [values[1:]])
+
 
 if __name__ == '__main__':
     unittest.main()
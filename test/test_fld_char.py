@@ -1,12 +1,39 @@
+from collections import deque
+import csv
+import datetime as dt
+import io
+import json
+import os
+import pickle
+import tempfile
 import unittest
+import numpy as np
+import scipy.stats as ss
 from random import choice, choices, randint, weibullvariate
 from string import ascii_uppercase
 from uuid import uuid4
 from util.describer import describe
-from util.fld_char import Field, FieldChars
+import util.fld_char as fld_char
+from util.fld_char import (
+    _plan_procs_,
+    _split_csv_bytes_,
+    Field,
+    FieldChars,
+    read_csv,
+    read_json,
+    read_range,
+    read_range_mmap,
+    RingBuffer,
+    spearman_matrix
+)
 from util.random_utils import RandomUtils
 from util.stat_utils import fit
 from util.util_tools import get_source_info
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 
 
 DATA = [0.52, 0.55, 0.56, 0.63, 0.64, 0.65, 0.66, 0.72, 0.75, 0.75, 0.79, 0.8, 0.89, 0.91, 0.92, 0.93, 0.95, 0.96, 0.96, 0.98, 0.99, 1.01, 1.03, 1.05, 1.06, 1.06, 1.1, 1.1, 1.11, 1.12, 1.12, 1.15, 1.16, 1.25, 1.31, 1.32, 1.37, 1.44, 1.44, 1.46, 1.49, 1.49, 1.52, 1.55, 1.55, 1.64, 1.65, 1.7, 1.72, 1.76, 1.77, 1.81, 1.83, 1.9, 1.9, 1.99, 2.02, 2.03, 2.03, 2.15, 2.16, 2.2, 2.26, 2.3, 2.31, 2.33, 2.35, 2.35, 2.36, 2.37, 2.38, 2.44, 2.44, 2.55, 2.55, 2.57, 2.57, 2.57, 2.6, 2.6, 2.6, 2.62, 2.62, 2.63, 2.64, 2.67, 2.67, 2.68, 2.75, 2.76, 2.81, 2.83, 2.85, 2.85, 2.91, 2.91, 2.93, 2.99, 3.01, 3.01, 3.07, 3.12, 3.12, 3.13, 3.13, 3.26, 3.27, 3.31, 3.33, 3.38, 3.45, 3.47, 3.5, 3.58, 3.59, 3.6, 3.62, 3.63, 3.7, 3.73, 3.73, 3.75, 3.77, 3.83, 3.89, 3.92, 3.99, 4.0, 4.04, 4.11, 4.14, 4.17, 4.28, 4.32, 4.35, 4.37, 4.45, 4.47, 4.54, 4.61, 4.63, 4.72, 4.76, 4.94, 5.03, 5.06, 5.08, 5.08, 5.14, 5.34, 5.41, 5.43, 5.48, 5.62, 5.74, 5.77, 5.81, 5.83, 5.87, 5.91, 5.95, 6.01, 6.02, 6.13, 6.18, 6.26, 6.37, 6.39, 6.42, 6.42, 6.44, 6.65, 6.65, 6.81, 6.84, 6.85, 6.91, 7.22, 7.3, 7.59, 7.79, 8.07, 8.16, 8.32, 8.38, 8.4, 8.52, 8.66, 8.76, 9.54, 9.55, 9.7, 9.95, 10.22, 10.44, 10.76, 11.0, 12.5, 13.31, 16.84]
@@ -64,6 +91,549 @@ class FldCharTest(unittest.TestCase):
         fc = FieldChars.evaluate(records)
         print(fc.report())
 
+    def gen_records(self, n):
+        rn = RandomUtils()
+        return [dict(id=rn.short_uid(),
+                     seq=str(i),
+                     amt='%.3f' % rn.random().weibullvariate(5, .75),
+                     cd1=rn.digits(1),
+                     fld1=rn.b62(20))
+                for i in range(n)]
+
+    def test_read_json(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(50)
+        for text in (json.dumps(records),
+                     json.dumps(records, indent=4),
+                     '\n'.join([json.dumps(rec) for rec in records])):
+            for chunk_size in (7, 100, 1 << 20):
+                self.assertEqual(
+                    records, list(read_json(io.StringIO(text), chunk_size)))
+        self.assertEqual([records[0]],
+                         list(read_json(io.StringIO(json.dumps(records[0])))))
+        self.assertEqual([], list(read_json(io.StringIO(' [ ] '))))
+        with self.assertRaises(ValueError):
+            list(read_json(io.StringIO('[{"a": 1}, {"a": '), 5))
+        # A large value is read in reads doubling the buffer, and malformed
+        # JSON raises without reading the rest.
+        text = json.dumps(dict(a=list(range(20000)), b='x' * 20000))
+        fi = io.StringIO(text + '\n{"a" 1}\n' + text)
+        reads = []
+        fi.read = (lambda n, read=fi.read: reads.append(n) or read(n))
+        with self.assertRaises(ValueError):
+            list(read_json(fi, 100))
+        self.assertLess(len(reads), 15)
+        self.assertLess(fi.tell(), len(text) * 2)
+
+    def test_read_csv(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(500)
+        so = io.StringIO()
+        wrt = csv.DictWriter(so, fieldnames=list(records[0]))
+        wrt.writeheader()
+        wrt.writerows(records)
+        self.assertEqual(records,
+                         list(read_csv(io.StringIO(so.getvalue()))))
+        self.assertEqual([], list(read_csv(io.StringIO(''))))
+
+    def test_evaluate_stream(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(300)
+        with tempfile.TemporaryDirectory() as td:
+            csv_fn = os.path.join(td, 'recs.csv')
+            with open(csv_fn, 'w') as fo:
+                wrt = csv.DictWriter(fo, fieldnames=list(records[0]))
+                wrt.writeheader()
+                wrt.writerows(records)
+            json_fn = os.path.join(td, 'recs.ndjson')
+            with open(json_fn, 'w') as fo:
+                for rec in records:
+                    print(json.dumps(rec), file=fo)
+            exp_rpt = FieldChars.evaluate(records).report()
+            for fn in (csv_fn, json_fn):
+                self.assertEqual(exp_rpt, FieldChars.evaluate(fn).report())
+                fc = FieldChars.evaluate(fn, stream=True, chunk_size=64)
+                self.assertEqual(exp_rpt, fc.report())
+            fc = FieldChars.evaluate_stream(
+                csv_fn,
+                fields=['amt', 'cd*'],
+                select="lambda r: r['cd1'] < '5'")
+            self.assertEqual(['amt', 'cd1'], sorted(fc.get_fields()))
+            self.assertEqual(
+                len([rec for rec in records if rec['cd1'] < '5']),
+                fc.get_fields()['amt'].get_count())
+
+    def write_files(self, td, records):
+        csv_fn = os.path.join(td, 'recs.csv')
+        with open(csv_fn, 'w') as fo:
+            wrt = csv.DictWriter(fo, fieldnames=list(records[0]))
+            wrt.writeheader()
+            wrt.writerows(records)
+        json_fn = os.path.join(td, 'recs.ndjson')
+        with open(json_fn, 'w') as fo:
+            for rec in records:
+                print(json.dumps(rec), file=fo)
+        return csv_fn, json_fn
+
+    def assert_fields_equal(self, exp_fc, fc):
+        exp_flds = exp_fc.get_fields()
+        flds = fc.get_fields()
+        self.assertEqual(sorted(exp_flds), sorted(flds))
+        for fn, exp_fld in exp_flds.items():
+            fld = flds[fn]
+            self.assertEqual(exp_fld.get_count(), fld.get_count(), fn)
+            self.assertEqual(exp_fld.get_unique_count(),
+                             fld.get_unique_count(), fn)
+            self.assertEqual(sorted(exp_fld.get_chars()),
+                             sorted(fld.get_chars()), fn)
+            self.assertEqual(exp_fld.get_conv_types(),
+                             fld.get_conv_types(), fn)
+            self.assertEqual(sorted(exp_fld.probs()), sorted(fld.probs()), fn)
+            self.assertEqual(sorted(exp_fld.get_data()),
+                             sorted(fld.get_data()), fn)
+
+    def test_read_range(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        with tempfile.TemporaryDirectory() as td:
+            csv_fn, json_fn = self.write_files(td, self.gen_records(200))
+            for fn in (csv_fn, json_fn):
+                with open(fn, 'rb') as fi:
+                    exp_lines = [line.decode() for line in fi]
+                size = os.path.getsize(fn)
+                for range_size in (1, 33, 1000, size):
+                    lines = []
+                    for st in range(0, size, range_size):
+                        lines.extend(read_range(fn, st, st + range_size))
+                    self.assertEqual(exp_lines, lines)
+
+    def test_evaluate_ranges(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(2000)
+        exp_fc = FieldChars.evaluate(records)
+        with tempfile.TemporaryDirectory() as td:
+            for fn in self.write_files(td, records):
+                fc = FieldChars.evaluate_ranges(fn, range_size=5000)
+                self.assert_fields_equal(exp_fc, fc)
+            fc = FieldChars.evaluate_ranges(
+                fn, range_size=5000, fields=['amt', 'cd*'])
+            self.assertEqual(['amt', 'cd1'], sorted(fc.get_fields()))
+
+    def test_evaluate_ranges_settings(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = [{'a': i} if i < 200 else
+                   {'a': i, 'late': i * 3, 'code': 'c%d' % i}
+                   for i in range(1000)]
+        with tempfile.TemporaryDirectory() as td:
+            json_fn = os.path.join(td, 'recs.ndjson')
+            with open(json_fn, 'w') as fo:
+                for rec in records:
+                    print(json.dumps(rec), file=fo)
+            fc = FieldChars.evaluate_ranges(
+                json_fn, range_size=1000, max_uniques=20, max_collect=10)
+            self.assertEqual(
+                20, len(set(fc.get_fields()['code'].values())))
+            self.assertEqual(10, len(fc.get_fields()['late'].get_data()))
+
+    def test_read_range_mmap(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        with tempfile.TemporaryDirectory() as td:
+            for fn in self.write_files(td, self.gen_records(200)):
+                size = os.path.getsize(fn)
+                for range_size in (1, 33, 1000, size):
+                    lines = []
+                    mm_lines = []
+                    for st in range(0, size, range_size):
+                        end = min(st + range_size, size)
+                        lines.extend(read_range(fn, st, end))
+                        mm_lines.extend(bytes(line).decode() for line in
+                                        read_range_mmap(fn, st, end))
+                    self.assertEqual(lines, mm_lines)
+            empty_fn = os.path.join(td, 'empty.csv')
+            open(empty_fn, 'w').close()
+            self.assertEqual([], list(read_range_mmap(empty_fn, 0, 10)))
+
+    def test_split_csv_bytes(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        text = 'a,b\r\n"1,2",3,x\r\n\r\n4\r\n5,6,7,8\r\n9,"y"\r\n10,11\r\n'
+        fmt = dict(delimiter=',', doublequote=True, escapechar=None,
+                   quotechar='"', quoting=csv.QUOTE_MINIMAL,
+                   skipinitialspace=False)
+        lines = [memoryview(ln.encode())
+                 for ln in text.splitlines(keepends=True)[1:]]
+        # Quoted lines are parsed as text, the others split as bytes.
+        to_str = (lambda x: x.decode() if isinstance(x, bytes) else x)
+        recs = [{fn: [to_str(x) for x in fv] if fn is None else to_str(fv)
+                 for fn, fv in rec.items()}
+                for rec in _split_csv_bytes_(lines, ['a', 'b'], fmt)]
+        self.assertEqual(list(csv.DictReader(io.StringIO(text))), recs)
+        self.assertEqual([{'a': '4', 'b': None},
+                          {'a': '5', 'b': '6', None: ['7', '8']}], recs[1:3])
+
+    def test_evaluate_mmap(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(2000)
+        records[-1]['fld1'] = 'quoted, value'
+        exp_fc = FieldChars.evaluate(records)
+        with tempfile.TemporaryDirectory() as td:
+            for fn in self.write_files(td, records):
+                fc = FieldChars.evaluate(fn, mmap=True, range_size=5000)
+                self.assert_fields_equal(exp_fc, fc)
+                for name, fld in fc.get_fields().items():
+                    self.assertEqual(['str'], fld.get_orig_types(), name)
+            fc = FieldChars.evaluate(
+                fn, mmap=True, select="lambda r: r['cd1'] < '5'")
+            self.assertTrue(all([v < '5' for v in
+                                 fc.get_fields()['cd1'].values()]))
+
+    def test_evaluate_line_breaks(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(1000)
+        records[500]['fld1'] = 'line1\nline2'
+        exp_fc = FieldChars.evaluate(records)
+        self.assertEqual(1000, exp_fc.get_fields()['fld1'].get_count())
+        multi_proc_bytes = fld_char.MULTI_PROC_BYTES
+        with tempfile.TemporaryDirectory() as td:
+            csv_fn, json_fn = self.write_files(td, records)
+            for mmap in (False, True):
+                with self.assertRaises(fld_char.LineBreakError):
+                    FieldChars.evaluate_ranges(
+                        csv_fn, mmap=mmap, range_size=5000)
+                fc = FieldChars.evaluate(csv_fn, mmap=True, range_size=5000)
+                self.assert_fields_equal(exp_fc, fc)
+            try:
+                fld_char.MULTI_PROC_BYTES = 1
+                fc = FieldChars.evaluate(csv_fn, range_size=5000)
+                self.assert_fields_equal(exp_fc, fc)
+            finally:
+                fld_char.MULTI_PROC_BYTES = multi_proc_bytes
+            fc = FieldChars.evaluate_ranges(json_fn, range_size=5000)
+            self.assert_fields_equal(exp_fc, fc)
+
+    def test_evaluate_cached_number(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        # Numbers of the form last seen skip type inference, so a field fed
+        # values in turn matches one merged from a field per value.
+        vals = ['12', '7', '-3', '4.5', '-.5', '8', '1e3', '9.', ' 10 ',
+                '1_000', 'nan', '+6', 'abc', '', '11', b'13', b'-2',
+                b'2.5', '3.25', 'x1', '14']
+        for order in (vals, vals[::-1], sorted(vals, key=str)):
+            fld = Field('f')
+            exp = Field('f')
+            for i, val in enumerate(order):
+                fld.evaluate(val, i)
+                part = Field('f')
+                part.evaluate(val, i)
+                exp.evaluate(part)
+            exp, fld = exp.to_dict(), fld.to_dict()
+            np.testing.assert_array_equal(exp.pop('data'), fld.pop('data'))
+            self.assertEqual(exp, fld, order)
+
+    def test_evaluate_bytes(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        for val in ('abc', ' Ab1 ', '12', '-3.5', '2021-03-04 05:06:07',
+                    'a\tb\x01~', '', 'caf\u00e9', '1e3'):
+            exp_fld = Field('f')
+            exp_fld.evaluate(val)
+            fld = Field('f')
+            fld.evaluate(val.encode())
+            self.assertEqual(exp_fld.to_dict(), fld.to_dict(), val)
+
+    def test_ring_buffer(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        for size in (1, 5, 16, 40):
+            for chunks in ([1] * 100, [3, 20, 1, 7, 50, 2], [200]):
+                rb = RingBuffer(size)
+                exp = deque(maxlen=size)
+                x = 0
+                for k in chunks:
+                    xs = list(range(x, x + k))
+                    x += k
+                    if k == 1:
+                        rb.append(xs[0])
+                    else:
+                        rb.extend(xs)
+                    exp.extend(xs)
+                    self.assertEqual(len(exp), len(rb))
+                    self.assertEqual(list(exp), rb.ordered().tolist())
+                    self.assertEqual(sorted(exp), sorted(rb.view()))
+        with self.assertRaises(ValueError):
+            rb.view()[0] = 1
+        with self.assertRaises(ValueError):
+            RingBuffer(0)
+
+    def test_field_max_collect(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        x_fld = Field('x', max_collect=100)
+        y_fld = Field('y', max_collect=100)
+        for x in range(250):
+            x_fld.evaluate(str(x))
+            y_fld.evaluate(str(2 * x))
+        self.assertEqual(list(range(150, 250)), x_fld.get_data())
+        self.assertEqual(list(range(300, 500, 2)),
+                         sorted(y_fld.get_samples()))
+        self.assertEqual((2 * x_fld.get_samples()).tolist(),
+                         y_fld.get_samples().tolist())
+        fld = Field('x', max_collect=100)
+        fld.evaluate(Field('x', data=range(80)))
+        fld.evaluate(Field('x', data=range(80, 120)))
+        self.assertEqual(list(range(20, 120)), fld.get_data())
+
+    def test_field_max_uniques(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        values = ['c%d' % (i % 7) if i % 2 else 'u%d' % i
+                  for i in range(20000)]
+        fld = Field('code', max_uniques=100)
+        merged = Field('code', max_uniques=100)
+        for i in range(0, len(values), 5000):
+            part = Field('code', max_uniques=100)
+            for x in values[i:i + 5000]:
+                fld.evaluate(x)
+                part.evaluate(x)
+            merged.evaluate(part)
+        for f in (fld, merged):
+            self.assertAlmostEqual(10007, f.get_unique_count(), delta=500)
+            top = [x for x, _ in f.probs()[:7]]
+            self.assertEqual(['c%d' % i for i in range(7)], sorted(top))
+            self.assertIn('(estimated)', f.report())
+        fld = Field('code', max_uniques=100)
+        for x in values[:100]:
+            fld.evaluate(x)
+        self.assertEqual(57, fld.get_unique_count())
+        fld = Field('code', max_uniques=5,
+                    values={'v%d' % i: i + 1 for i in range(20)})
+        self.assertEqual(20, fld.get_unique_count())
+        self.assertEqual(fld.to_dict(),
+                         Field.from_dict(fld.to_dict()).to_dict())
+
+    def test_spearman_matrix(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        rn = RandomUtils(3)
+        xs = [rn.random().random() for _ in range(200)]
+        cols = [[x * k + rn.random().random() for x in xs] for k in range(4)]
+        rows = [np.arange(200.0) for _ in range(4)]
+        # Drop some rows from one column and shuffle another.
+        rows[1] = rows[1][::2]
+        cols[1] = cols[1][::2]
+        order = np.random.default_rng(1).permutation(200)
+        rows[2] = rows[2][order]
+        cols[2] = np.array(cols[2])[order]
+        cr, pv = spearman_matrix(rows, [np.array(c) for c in cols])
+        for i in range(4):
+            for j in range(i + 1, 4):
+                common = np.intersect1d(rows[i], rows[j])
+                exp_cr, exp_pv = ss.spearmanr(
+                    [cols[i][list(rows[i]).index(r)] for r in common],
+                    [cols[j][list(rows[j]).index(r)] for r in common])
+                self.assertAlmostEqual(exp_cr, cr[i, j])
+                self.assertAlmostEqual(exp_pv, pv[i, j])
+                self.assertAlmostEqual(cr[i, j], cr[j, i])
+        cr, pv = spearman_matrix([np.arange(2.0)] * 2, [np.arange(2.0)] * 2)
+        self.assertTrue(np.isnan(cr).all())
+
+        # Sparse columns with ties, repeated rows, NaN and a constant.
+        rng = np.random.default_rng(5)
+        rows = [rng.choice(60, size=50) for _ in range(5)]
+        cols = [rng.integers(0, 8, size=50).astype(float) for _ in range(5)]
+        cols[3][::7] = np.nan
+        cols[4][:] = 2.0
+        cr, pv = spearman_matrix(rows, cols)
+        firsts = []
+        for rw, col in zip(rows, cols):
+            rw, ix = np.unique(rw, return_index=True)
+            firsts.append(dict((r, v) for r, v in zip(rw, col[ix])
+                               if not np.isnan(v)))
+        for i in range(5):
+            for j in range(i + 1, 5):
+                if j == 4:
+                    self.assertTrue(np.isnan(cr[i, j]))
+                    continue
+                common = sorted(set(firsts[i]) & set(firsts[j]))
+                exp_cr, exp_pv = ss.spearmanr(
+                    [firsts[i][r] for r in common],
+                    [firsts[j][r] for r in common])
+                self.assertAlmostEqual(exp_cr, cr[i, j])
+                self.assertAlmostEqual(exp_pv, pv[i, j])
+
+    def test_correlations(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = [dict(x=str(i), y=str(i * i), z='', c='a%d' % (i % 3))
+                   for i in range(3000)]
+        records[5]['y'] = 'missing'
+        fc = FieldChars.evaluate(records)
+        crs = fc.correlations()
+        self.assertEqual(1, len(crs))
+        self.assertEqual(('x', 'y'), (crs[0]['x'], crs[0]['y']))
+        self.assertAlmostEqual(1, crs[0]['cr'])
+        self.assertIn('x y', fc.report(corr=True))
+
+        # A sparse field does not reduce the rows of the other pairs.
+        records[0]['w'] = '1'
+        records[1]['w'] = '2'
+        crs = FieldChars.evaluate(records).correlations()
+        self.assertEqual(1, len(crs))
+        self.assertAlmostEqual(1, crs[0]['cr'])
+        with tempfile.TemporaryDirectory() as td:
+            csv_fn, _ = self.write_files(td, records)
+            fc = FieldChars.evaluate_ranges(csv_fn, range_size=5000)
+            self.assertAlmostEqual(1, fc.correlations()[0]['cr'])
+
+    def test_field_round_trip(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        fld = Field('f', max_uniques=5, max_collect=10)
+        for val in ('a', 'b', 'b', '2021-03-04 05:06:07', '1', '2.5', None,
+                    'c', 'd', 'e', 'f') + tuple(str(i) for i in range(20)):
+            fld.evaluate(val)
+        state = fld.to_dict()
+        rt_fld = Field.from_dict(pickle.loads(pickle.dumps(state)))
+        self.assertEqual(state, rt_fld.to_dict())
+        self.assertEqual(fld.report(), rt_fld.report())
+        self.assertEqual(sorted(zip(fld.get_rows(), fld.get_samples())),
+                         sorted(zip(rt_fld.get_rows(), rt_fld.get_samples())))
+
+    def test_evaluate_resume(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(3000)
+        with tempfile.TemporaryDirectory() as td:
+            for fn in self.write_files(td, records):
+                exp_fc = FieldChars.evaluate_ranges(fn, range_size=5000)
+                with open(fn, 'rb') as fi:
+                    text = fi.read()
+                state_fn = os.path.join(td, 'state.gz')
+                if os.path.exists(state_fn):
+                    os.remove(state_fn)
+                # Append the file in pieces, the last line partly written.
+                for pc in (.3, .31, .75, 1):
+                    with open(fn, 'wb') as fo:
+                        fo.write(text[:int(len(text) * pc)])
+                    fc = FieldChars.evaluate_resume(
+                        fn, state_fn, range_size=5000)
+                    with open(fn, 'rb') as fi:
+                        self.assertEqual(
+                            fi.read().rfind(b'\n') + 1, fc.get_offset())
+                self.assert_fields_equal(exp_fc, fc)
+                self.assert_fields_equal(exp_fc, FieldChars.load(state_fn))
+                with open(fn, 'wb') as fo:
+                    fo.write(text[:100])
+                with self.assertRaises(ValueError):
+                    FieldChars.evaluate_resume(fn, state_fn)
+            json_fn = os.path.join(td, 'recs.json')
+            with open(json_fn, 'w') as fo:
+                json.dump(records, fo)
+            for fn in (json_fn, os.path.join(td, 'recs.parquet')):
+                with self.assertRaises(ValueError):
+                    FieldChars.evaluate_resume(
+                        fn, os.path.join(td, 'json_state.gz'))
+                self.assertFalse(
+                    os.path.exists(os.path.join(td, 'json_state.gz')))
+
+    def test_plan_procs(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        self.assertEqual((1, 1000), _plan_procs_(1000, 1e-5, 8))
+        self.assertEqual((1, 1), _plan_procs_(0, 1e-5, 8))
+        procs_n, task_n = _plan_procs_(10 ** 6, 1e-5, 8)
+        self.assertEqual(8, procs_n)
+        self.assertEqual(25000, task_n)
+        procs_n, task_n = _plan_procs_(10 ** 6, 1e-5, 32)
+        self.assertEqual(20, procs_n)
+        self.assertEqual(10 ** 6 // (20 * 4), task_n)
+        self.assertEqual((1, 100), _plan_procs_(100, 1e-5, 1))
+
+    def test_evaluate_procs(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        records = self.gen_records(6000)
+        exp_fc = FieldChars.evaluate(records)
+        self.assertEqual(1, exp_fc.get_stats()['procs'])
+        self.assertEqual(6000, exp_fc.get_stats()['n'])
+        min_proc_secs = fld_char.MIN_PROC_SECS
+        try:
+            fld_char.MIN_PROC_SECS = 1e-9
+            fc = FieldChars.evaluate(records, procs=2)
+            self.assertEqual(2, fc.get_stats()['procs'])
+            self.assert_fields_equal(exp_fc, fc)
+            with tempfile.TemporaryDirectory() as td:
+                for fn in self.write_files(td, records):
+                    fc = FieldChars.evaluate_ranges(
+                        fn, procs=2, range_size=5000)
+                    stats = fc.get_stats()
+                    self.assertEqual(2, stats['procs'])
+                    self.assertEqual('bytes', stats['units'])
+                    self.assertGreater(stats['rate'], 0)
+                    self.assert_fields_equal(exp_fc, fc)
+        finally:
+            fld_char.MIN_PROC_SECS = min_proc_secs
+
+    def test_field_dates(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        fld = Field('dates')
+        for val in ('03/04/2021 10:11:12', '12/31/2020 23:59:59',
+                    '13/04/2021 10:11:12', '2021-03-04 05:06:07',
+                    'Mar 4, 2021 10:11:12'):
+            fld.evaluate(val)
+            fld.evaluate(val)
+        self.assertEqual(['datetime'], fld.get_conv_types())
+        self.assertEqual(['0-9', 'A-Z', 'a-z', 'space', 'special'],
+                         sorted(fld.get_chars()))
+        rpt = fld.to_dict()
+        self.assertEqual(dt.datetime(2020, 12, 31, 23, 59, 59,
+                                     tzinfo=dt.timezone.utc),
+                         rpt['min_val'])
+        self.assertEqual(dt.datetime(2021, 4, 13, 10, 11, 12,
+                                     tzinfo=dt.timezone.utc),
+                         rpt['max_val'])
+
+    def test_field_numbers(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        for val, exp in (('12', 12), ('-3', -3), ('1_000', 1000),
+                         ('3.5', 3.5), ('.5', .5), ('1e3', 1000.0),
+                         ('-2.5E-3', -.0025), ('Infinity', float('inf'))):
+            fld = Field('num')
+            fld.evaluate(val)
+            self.assertEqual([exp], fld.get_data(), val)
+            self.assertEqual(type(exp).__name__, fld.get_conv_types()[0])
+        fld = Field('num')
+        for val in ('nan', 'abc123', 'e', '1,000', '1.2.3'):
+            fld.evaluate(val)
+        self.assertEqual(['float', 'str'], fld.get_conv_types())
+
+    def test_field_columns(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        vals = ['12', ' ab ', '', '2021-04-13', '3.5', 'ab', '12']
+        fld = Field('col')
+        for i, val in enumerate(vals + [None]):
+            fld.evaluate(val, i)
+        uniques = sorted(set(vals))
+        indices = np.array([uniques.index(val) for val in vals] + [-1])
+        col = Field('col')
+        col.evaluate_strings(uniques, indices, np.arange(len(indices)))
+        self.assertEqual(fld.to_dict(), col.to_dict())
+        nums = Field('nums')
+        for i, val in enumerate([3, None, -1]):
+            nums.evaluate(val, i)
+        col = Field('nums')
+        col.evaluate_numbers(np.array([3, -1]), np.array([0, 2]), 1)
+        self.assertEqual(nums.to_dict(), col.to_dict())
+
+    @unittest.skipUnless(pa is not None, "pyarrow is not installed")
+    def test_evaluate_columnar(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = [dict(id=i,
+                     x=i * .5 if i % 5 else None,
+                     code=choice(['A1', 'B2', ' 7 ', '', None]),
+                     loc=dict(city=choice(['Oslo', 'Lima']), zip=i % 10))
+                for i in range(1000)]
+        exp = FieldChars.evaluate(recs, procs=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fn = os.path.join(tmp_dir, 'recs.parquet')
+            pq.write_table(pa.Table.from_pylist(recs), fn,
+                           row_group_size=300)
+            fc = FieldChars.evaluate(fn, procs=2)
+            self.assertEqual(exp.report(corr=True), fc.report(corr=True))
+            self.assertEqual(1000, fc.get_stats()['n'])
+            fc = FieldChars.evaluate(fn, fields=['loc.*'])
+            self.assertEqual(['loc.city', 'loc.zip'],
+                             sorted(fc.get_fields()))
+        fc = FieldChars.evaluate(pa.Table.from_pylist(recs))
+        self.assertEqual(exp.report(corr=True), fc.report(corr=True))
 
 
 if __name__ == '__main__':
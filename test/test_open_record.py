@@ -5,7 +5,7 @@ import io
 import json
 from random import choice, choices, shuffle
 import string
-from util.open_record import OpenRecord
+from util.open_record import FrozenRecord, LazyRecord, OpenRecord
 from util.util_tools import get_source_info
 
 
@@ -55,6 +55,61 @@ class OpenRecordTest(unittest.TestCase):
         self.assertEqual(cd, recs[1].f2)
         self.assertEqual('3', recs[2].f3)
 
+    def test_iter_csv(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        so = io.StringIO()
+        wt = csv.writer(so)
+        wt.writerow(('Name', 'Age', 'Score'))
+        for i in range(1000):
+            wt.writerow(('n%d' % i, i, i / 4))
+        src = so.getvalue()
+        recs = OpenRecord.iter_csv(io.StringIO(src), sniff_size=100)
+        self.assertEqual(OpenRecord(name='n0', age='0', score='0.0'),
+                         next(recs))
+        self.assertEqual(999, len(list(recs)))
+        batches = list(OpenRecord.iter_csv(src, batch_size=300))
+        self.assertEqual([300, 300, 300, 100], [len(b) for b in batches])
+        self.assertEqual(OpenRecord.from_csv(src), sum(batches, []))
+        recs = list(OpenRecord.iter_csv("a;1\nb;2\nc;3\n"))
+        self.assertEqual(['a', 'b', 'c'], [rec.fld_01 for rec in recs])
+        self.assertEqual([], list(OpenRecord.iter_csv('')))
+
+    def test_iter_cursor(self):
+        print("-- %s(%d): %s --" % get_source_info())
+
+        class Cursor:
+            description = [('Id', None), ('FirstName', None)]
+
+            def __init__(self, rows):
+                self.rows = rows
+
+            def __iter__(self):
+                return iter(self.rows)
+
+            def fetchmany(self, n):
+                rows, self.rows = self.rows[:n], self.rows[n:]
+                return rows
+
+        rows = [(i, 'n%d' % i) for i in range(5)]
+        recs = list(OpenRecord.iter_cursor(Cursor(rows)))
+        self.assertEqual(OpenRecord(id=4, first_name='n4'), recs[-1])
+        self.assertEqual(recs, OpenRecord.from_cursor(Cursor(rows)))
+        batches = list(OpenRecord.iter_cursor(Cursor(rows), batch_size=2))
+        self.assertEqual([2, 2, 1], [len(b) for b in batches])
+        self.assertEqual(recs, sum(batches, []))
+
+    def test_iter_ndjson(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        js = '{"a": 1, "b": {"c": 2}}\n\n[{"a": 2}, {"a": 3}]\n{"a": 4}\n'
+        recs = list(OpenRecord.iter_ndjson(io.StringIO(js)))
+        self.assertEqual([1, 2, 3, 4], [rec.a for rec in recs])
+        self.assertTrue(isinstance(recs[0].b, OpenRecord))
+        self.assertEqual(recs, OpenRecord.from_json(js))
+        recs = list(OpenRecord.iter_ndjson(js, lazy=True))
+        self.assertTrue(isinstance(recs[0], LazyRecord))
+        self.assertEqual(
+            [3, 1], [len(b) for b in OpenRecord.iter_ndjson(js, 3)])
+
     def test_dict_1(self):
         print("-- %s(%d): %s --" % get_source_info())
         rec1 = OpenRecord(a=1, b=2.1)
@@ -98,6 +153,29 @@ class OpenRecordTest(unittest.TestCase):
         self.assertTrue(isinstance(rec.b, OpenRecord))
         self.assertTrue(isinstance(rec.b.y, OpenRecord))
 
+    def test_lazy(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        dd = {'a': 1,
+              'b': {'x': 1.23, 'y': {'a': 1, 'b': 2}},
+              'c': [{'d': 4}, 5]}
+        rec = LazyRecord(dd)
+        self.assertIs(dd['b'], dict.__getitem__(rec, 'b'))
+        self.assertTrue(isinstance(rec.b, LazyRecord))
+        self.assertIs(rec.b, rec['b'])
+        self.assertIs(dd['b']['y'], dict.__getitem__(rec.b, 'y'))
+        self.assertEqual(2, rec.b.y.b)
+        self.assertEqual(4, rec.c[0].d)
+        self.assertTrue(isinstance(rec.get('c')[0], LazyRecord))
+        self.assertTrue(all(isinstance(v, LazyRecord)
+                            for k, v in rec.items() if k == 'b'))
+        self.assertEqual(OpenRecord(dd), rec)
+        self.assertEqual(OpenRecord(dd).to_json(), rec.to_json())
+        rec.b = {'z': 3}
+        self.assertEqual(3, rec.b.z)
+        js = json.dumps(dd)
+        self.assertEqual(OpenRecord.from_json(js),
+                         OpenRecord.from_json(js, lazy=True))
+
     def test_equals(self):
         print("-- %s(%d): %s --" % get_source_info())
         r1 = OpenRecord(a='one', b='two')
@@ -175,6 +253,63 @@ class OpenRecordTest(unittest.TestCase):
         r2.c = 'three'
         self.assertFalse(hash(r1) == hash(r2))
 
+    def test_hash_changed(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        r1 = OpenRecord(a=1, b='two')
+        r2 = OpenRecord(a=1, b='two', c=[3])
+        h1 = hash(r1)
+        r1.c = [3]
+        self.assertNotEqual(h1, hash(r1))
+        self.assertEqual(r1, r2)
+        r1.c.append(4)
+        self.assertNotEqual(r1, r2)
+        del r1['c']
+        self.assertEqual(h1, hash(r1))
+        self.assertNotEqual(OpenRecord(a=1), OpenRecord(a='1'))
+        self.assertEqual(2, len({OpenRecord(a=1), OpenRecord(a='1'),
+                                 OpenRecord(a=1)}))
+
+    def test_hash_mixed_keys(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        r1 = OpenRecord([(1, 'a'), ('b', [2]), (None, {3: 'c', 'd': 4})])
+        r2 = OpenRecord([('b', [2]), (None, {'d': 4, 3: 'c'}), (1, 'a')])
+        self.assertEqual(r1, r2)
+        self.assertEqual(hash(r1), hash(r2))
+        self.assertEqual(1, len({r1, r2, r1.freeze()}))
+        r2.b.append(5)
+        self.assertNotEqual(r1, r2)
+        self.assertTrue(r1 < r2 or r2 < r1)
+
+    def test_hash_keys(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = [OpenRecord(a=i % 2, b=i % 3, c=i) for i in range(12)]
+        for rec in recs:
+            rec.add_key('b', 'a')
+        self.assertEqual(6, len(set(recs)))
+        self.assertEqual([(rec.b, rec.a) for rec in sorted(recs)],
+                         sorted((rec.b, rec.a) for rec in recs))
+
+    def test_frozen(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        rec = OpenRecord(a=1, b={'x': [1, 2]}, c=[{'y': 2}])
+        rec.add_key('a', 'b')
+        frz = rec.freeze()
+        self.assertTrue(isinstance(frz, FrozenRecord))
+        self.assertTrue(isinstance(frz.b, FrozenRecord))
+        self.assertEqual((1, 2), frz.b.x)
+        self.assertEqual(rec, frz)
+        self.assertEqual(hash(rec), hash(frz))
+        self.assertIn(OpenRecord(a=1, b={'x': [1, 2]}).freeze(),
+                      {frz: 1})
+        for change in (lambda: setattr(frz, 'a', 2),
+                       lambda: frz.update(a=2),
+                       lambda: frz.pop('a'),
+                       lambda: frz.add_key('c'),
+                       lambda: frz.b.clear()):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertEqual(1, frz.a)
+
     def test_json(self):
         print("-- %s(%d): %s --" % get_source_info())
         js = '{"a":1,"b":2.31,"c":[1,2,3]}'
@@ -0,0 +1,98 @@
+import unittest
+import io
+import pickle
+from util.open_record import OpenRecord
+from util.record_batch import MISSING, RecordBatch
+from util.util_tools import get_source_info
+
+
+class Cursor:
+    """ DBI cursor over 'rows' with columns 'names'. """
+
+    def __init__(self, names, rows):
+        self.description = [(fn, None) for fn in names]
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+RECS = [OpenRecord(a=3, b='x'),
+        OpenRecord(a=1, c=2.5),
+        OpenRecord(b='z', a=2, c=None)]
+
+
+class RecordBatchTest(unittest.TestCase):
+
+    def test_from_records(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        batch = RecordBatch.from_records(RECS)
+        self.assertEqual(3, len(batch))
+        self.assertEqual(['a', 'b', 'c'], batch.names())
+        self.assertEqual(['x', MISSING, 'z'], batch.column('b'))
+        self.assertEqual(RECS, list(batch))
+        self.assertEqual(RECS[1], batch[1])
+        self.assertEqual(RECS[1:], list(batch[1:]))
+        self.assertIs(MISSING, pickle.loads(pickle.dumps(MISSING)))
+        with self.assertRaises(ValueError):
+            RecordBatch({'a': [1], 'b': [1, 2]})
+
+    def test_normalize(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        batch = RecordBatch.from_records(RECS)
+        norm = batch.normalize(0)
+        self.assertEqual(OpenRecord.normalize(RECS, 0), list(norm))
+        self.assertIs(batch.column('a'), norm.column('a'))
+        self.assertEqual(['x', MISSING, 'z'], batch.column('b'))
+
+    def test_select_filter(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        batch = RecordBatch.from_records(RECS)
+        sel = batch.select(['c', 'a'])
+        self.assertEqual(['c', 'a'], sel.names())
+        self.assertIs(batch.column('a'), sel.column('a'))
+        self.assertEqual(['b', 'c'], batch.select(['a'], True).names())
+        self.assertEqual([3, 2], batch.filter([1, 0, 1]).column('a'))
+        self.assertEqual([3, 2],
+                         batch.filter(lambda r: 'b' in r).column('a'))
+        self.assertEqual(0, len(batch.filter([0, 0, 0])))
+        with self.assertRaises(ValueError):
+            batch.filter([True])
+
+    def test_sort(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        batch = RecordBatch.from_records(RECS)
+        self.assertEqual([1, 2, 3], batch.sort('a').column('a'))
+        self.assertEqual([3, 2, 1], batch.sort('a', reverse=True).column('a'))
+        self.assertEqual([MISSING, 'x', 'z'], batch.sort('b').column('b'))
+        self.assertEqual(['z', 'x', MISSING],
+                         batch.sort('b', reverse=True).column('b'))
+        self.assertEqual(sorted(RECS, key=lambda r: (r.get('b', ''), r.a)),
+                         list(batch.sort('b', 'a')))
+        self.assertEqual([2], batch.take([2]).column('a'))
+
+    def test_csv_text(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        batch = RecordBatch.from_records(RECS)
+        so = io.StringIO()
+        batch.to_csv(so)
+        exp = io.StringIO()
+        OpenRecord.to_csv(list(batch.normalize()), exp)
+        self.assertEqual(exp.getvalue(), so.getvalue())
+        self.assertEqual(OpenRecord.to_text_rows(list(batch.normalize(''))),
+                         batch.to_text_rows())
+        self.assertEqual(OpenRecord.to_text_cols(list(batch.normalize())),
+                         batch.to_text_cols())
+
+    def test_from_cursor(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        batch = RecordBatch.from_cursor(
+            Cursor(['Id', 'FirstName'], [(1, 'Ann'), (2, 'Bob')]))
+        self.assertEqual(['id', 'first_name'], batch.names())
+        self.assertEqual(['Ann', 'Bob'], batch.column('first_name'))
+        empty = RecordBatch.from_cursor(Cursor(['Id'], []))
+        self.assertEqual((0, ['id']), (len(empty), empty.names()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+from collections import Counter
+import pickle
+import unittest
+from util.random_utils import RandomUtils
+from util.sketches import HyperLogLog, SpaceSaving
+from util.util_tools import get_source_info
+
+
+class SketchesTest(unittest.TestCase):
+
+    def gen_values(self, n, seed=1):
+        rn = RandomUtils(seed)
+        return ['v%d' % int(rn.random().paretovariate(1.2))
+                for _ in range(n)]
+
+    def test_space_saving_exact(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        values = self.gen_values(2000)
+        exp = Counter(values)
+        ss = SpaceSaving(len(exp))
+        for x in values:
+            ss.add(x)
+        self.assertTrue(ss.is_exact())
+        self.assertEqual(dict(exp), dict(ss.items()))
+        self.assertEqual(len(values), ss.total())
+        self.assertEqual(exp.most_common(5)[0], ss.top(5)[0])
+        ss.add('new')
+        self.assertFalse(ss.is_exact())
+        self.assertEqual(len(exp), len(ss))
+        with self.assertRaises(ValueError):
+            SpaceSaving(0)
+
+    def test_space_saving_top(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        values = self.gen_values(20000)
+        exp = Counter(values)
+        ss = SpaceSaving(50)
+        for x in values:
+            ss.add(x)
+        self.assertFalse(ss.is_exact())
+        self.assertEqual(50, len(ss))
+        self.assertEqual(len(values), sum([c for _, c in ss.items()]))
+        for x, c in ss.items():
+            self.assertGreaterEqual(c, exp[x])
+            self.assertLessEqual(c - ss.error(x), exp[x])
+        self.assertEqual([x for x, _ in exp.most_common(10)],
+                         [x for x, _ in ss.top(10)])
+
+    def test_space_saving_merge(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        values = self.gen_values(20000)
+        exp = Counter(values)
+        whole = SpaceSaving(50)
+        for x in values:
+            whole.add(x)
+        ss = SpaceSaving(50)
+        for i in range(0, len(values), 3000):
+            part = SpaceSaving(50)
+            for x in values[i:i + 3000]:
+                part.add(x)
+            ss.merge(pickle.loads(pickle.dumps(part)))
+        self.assertEqual(len(values), ss.total())
+        small = SpaceSaving(3)
+        for part in ('a' * 10 + 'bcd', 'x' * 10 + 'yzd', 'dddd' + 'y' * 9):
+            small.merge(SpaceSaving(3, Counter(part)))
+            self.assertLessEqual(sum([c for _, c in small.items()]),
+                                 small.total())
+        for x, c in ss.items():
+            self.assertGreaterEqual(c, exp[x])
+            self.assertLessEqual(c - ss.error(x), exp[x])
+        self.assertEqual([x for x, _ in whole.top(10)],
+                         [x for x, _ in ss.top(10)])
+        small = SpaceSaving(10, dict(a=2, b=1))
+        small.merge(SpaceSaving(10, dict(b=3, c=1)))
+        self.assertTrue(small.is_exact())
+        self.assertEqual([('b', 4), ('a', 2), ('c', 1)], small.top())
+
+    def test_hyper_log_log(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        for n in (0, 1, 10, 1000, 50000):
+            hll = HyperLogLog()
+            for i in range(n):
+                hll.add('x%d' % i)
+                hll.add('x%d' % i)
+            self.assertAlmostEqual(n, hll.estimate(), delta=max(n * .05, 1))
+        parts = [HyperLogLog(10) for _ in range(4)]
+        for i in range(20000):
+            parts[i % 4].add(i)
+            parts[(i + 1) % 4].add(i)
+        hll = HyperLogLog(10)
+        for part in parts:
+            hll.merge(part)
+        self.assertAlmostEqual(20000, len(hll), delta=20000 * .1)
+        with self.assertRaises(ValueError):
+            hll.merge(HyperLogLog())
+
+
+if __name__ == '__main__':
+    unittest.main()
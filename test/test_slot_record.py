@@ -0,0 +1,116 @@
+import unittest
+import copy
+import io
+import pickle
+from util.open_record import OpenRecord
+from util.slot_record import record_class, SlotRecord
+from util.util_tools import get_source_info
+
+
+class Cursor:
+    """ DBI cursor over 'rows' with columns 'names'. """
+
+    def __init__(self, names, rows):
+        self.description = [(fn, None) for fn in names]
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class SlotRecordTest(unittest.TestCase):
+
+    def test_construct(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        rec_cls = record_class(['foo', 'bar'])
+        self.assertIs(rec_cls, record_class(('foo', 'bar')))
+        for rec in (rec_cls(456, 'def'), rec_cls(foo=456, bar='def'),
+                    rec_cls({'bar': 'def', 'foo': 456}),
+                    rec_cls._make([456, 'def'])):
+            self.assertEqual(456, rec.foo)
+            self.assertEqual('def', rec['bar'])
+            self.assertEqual(['foo', 'bar'], list(rec))
+        self.assertIsNone(rec_cls(foo=1).bar)
+        with self.assertRaises(ValueError):
+            rec_cls(1, 2, 3)
+        with self.assertRaises(ValueError):
+            rec_cls(baz=1)
+        with self.assertRaises(ValueError):
+            record_class(['a', 'a'])
+
+    def test_dict_api(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        rec = record_class(['id', 'count', 'first name'])(1, 2, 'Ann')
+        self.assertEqual(2, rec.count)
+        self.assertEqual('Ann', rec['first name'])
+        self.assertEqual('Ann', rec.get('first name'))
+        self.assertEqual(0, rec.get('last name', 0))
+        self.assertIn('id', rec)
+        self.assertNotIn(1, rec)
+        self.assertEqual(3, len(rec))
+        self.assertEqual({'id': 1, 'count': 2, 'first name': 'Ann'},
+                         rec.to_dict())
+        self.assertEqual(OpenRecord(rec.items()), rec)
+        self.assertEqual(rec.to_json(), OpenRecord(rec.items()).to_json())
+        with self.assertRaises(KeyError):
+            rec['missing']
+        with self.assertRaises(AttributeError):
+            rec.missing
+        with self.assertRaises(AttributeError):
+            rec.id = 2
+
+    def test_replace_select(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        rec = record_class(['a', 'b', 'c'])(1, 2, 3)
+        self.assertEqual({'a': 1, 'b': 5, 'c': 3}, rec.replace(b=5))
+        self.assertEqual(2, rec.b)
+        self.assertEqual({'c': 3, 'a': 1}, rec.select(['c', 'a', 'x']))
+        self.assertEqual({'b': 2}, rec.select(['a', 'c'], exclude=True))
+
+    def test_hash_pickle(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        rec = record_class(['a', 'b'])(1, [2, 3])
+        self.assertEqual(rec, pickle.loads(pickle.dumps(rec)))
+        cp = copy.deepcopy(rec)
+        self.assertEqual(rec, cp)
+        self.assertIsNot(rec.b, cp.b)
+        ab_cls = record_class(['a', 'b'])
+        recs = {ab_cls(1, 2), ab_cls(1, 2), record_class(['b', 'a'])(1, 2)}
+        self.assertEqual(2, len(recs))
+
+    def test_from_cursor(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = SlotRecord.from_cursor(
+            Cursor(['Id', 'FirstName'], [(1, 'Ann'), (2, 'Bob')]))
+        self.assertEqual(['id', 'first_name'], list(recs[0]))
+        self.assertIs(type(recs[0]), type(recs[1]))
+        self.assertEqual('Bob', recs[1].first_name)
+
+    def test_from_csv(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        src = "Name,Age,Score\nAnn,34,1.5\nBob,27,2.25\nCy,45,3.75\n"
+        recs = SlotRecord.from_csv(src)
+        self.assertEqual(OpenRecord.from_csv(src), recs)
+        so = io.StringIO()
+        SlotRecord.to_csv(recs, so)
+        self.assertEqual(recs, SlotRecord.from_csv(so.getvalue()))
+        self.assertEqual(OpenRecord.to_text_rows(OpenRecord.from_csv(src)),
+                         SlotRecord.to_text_rows(recs))
+        self.assertEqual([], SlotRecord.from_csv(''))
+        long_src = src + 'Di,52,4.5\n' * 100
+        self.assertEqual(list(OpenRecord.iter_csv(long_src, sniff_size=40)),
+                         SlotRecord.from_csv(io.StringIO(long_src), 40))
+        nul_src = src.replace('Cy', 'C\0y')
+        self.assertEqual('C\0y', SlotRecord.from_csv(nul_src)[2].name)
+
+    def test_from_records(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = SlotRecord.from_records([dict(a=1, b=2), dict(a=3, b=4),
+                                        dict(b=5)])
+        self.assertIs(type(recs[0]), type(recs[1]))
+        self.assertEqual(['b'], list(recs[2]))
+        self.assertEqual(3, recs[1].a)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,13 @@ import datetime as dt
 from random import randint, weibullvariate
 import unittest
 import numpy as np
+import scipy.stats as ss
 from util.data_generator import gen_dates
 from util.describer import describe
 from util.open_record import OpenRecord
 from util.stat_utils import (
+    RankSums,
+    RankTree,
     fit,
     mk_trend,
     pct_diff,
@@ -17,6 +20,8 @@ from util.stat_utils import (
     period_secs,
     period_truncate,
     periods_per_day,
+    rank_sums,
+    rank_sums_split,
     t_limits,
     trim_mean,
     w_stderr,
@@ -144,6 +149,66 @@ class TestStatUtils(unittest.TestCase):
         dates = gen_dates(day_n, day_n - 1)
         self.assertEqual(day_n, periods_per_day(dates))
 
+    def test_rank_sums(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        self.assertAlmostEqual(ss.ranksums(DATA3, DATA1)[0],
+                               rank_sums(DATA3, DATA1), 9)
+        self.assertAlmostEqual(ss.ranksums(DATA2[:10], DATA2[10:])[0],
+                               rank_sums(DATA2[:10], DATA2[10:]), 9)
+        tss = rank_sums([DATA3[:10], DATA1[:10]], [DATA1[10:30], DATA3[10:30]])
+        self.assertAlmostEqual(ss.ranksums(DATA3[:10], DATA1[10:30])[0],
+                               tss[0], 9)
+        self.assertAlmostEqual(ss.ranksums(DATA1[:10], DATA3[10:30])[0],
+                               tss[1], 9)
+
+    def test_rank_sums_split(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        tss = rank_sums_split(DATA5, 5, 35)
+        self.assertEqual(30, len(tss))
+        for k, ts in zip(range(5, 35), tss):
+            self.assertAlmostEqual(ss.ranksums(DATA5[k:], DATA5[:k])[0], ts, 9)
+        self.assertEqual(0, len(rank_sums_split(DATA5[:3], 5)))
+
+    def test_rank_sums_incremental(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        base = []
+        rs = RankSums(DATA2)
+        self.assertEqual(0, rs.score(DATA2[:4]))
+        for i in range(0, len(DATA2) - 3, 3):
+            gp = DATA2[i:i + 3]
+            if len(base):
+                self.assertAlmostEqual(ss.ranksums(gp, base)[0],
+                                       rs.score(gp), 9)
+            base.extend(gp)
+            rs.add(gp)
+        self.assertEqual(len(base), len(rs))
+
+    def test_rank_tree(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        base = []
+        rt = RankTree(DATA2 + DATA3)
+        self.assertEqual([0, 0], rt.count_below([0, 5]).tolist())
+        for data in (DATA2, DATA3):
+            rt.add(data)
+            base.extend(data)
+            for x in (-1, 0, 1, 2, 7.01, 7.5, 21):
+                self.assertEqual(len([y for y in base if y < x]),
+                                 rt.count_below([x])[0])
+                self.assertEqual(len([y for y in base if y <= x]),
+                                 rt.count_below([x], equal=True)[0])
+        self.assertEqual(len(base), len(rt))
+        # Arrays of values are added and counted at once, as in loops.
+        data = np.random.default_rng(2).integers(0, 500, 1000).astype(float)
+        rt = RankTree(data)
+        rt.add(data[:700])
+        for i in range(700, 1000, 3):
+            rt.add(data[i:i + 3])
+        xs = np.arange(-1, 502, .5)
+        self.assertEqual([np.sum(data < x) for x in xs],
+                         rt.count_below(xs).tolist())
+        self.assertEqual([np.sum(data <= x) for x in xs[:10]],
+                         rt.count_below(xs[:10], equal=True).tolist())
+
     def test_t_limits(self):
         print("-- %s(%d): %s --" % get_source_info())
         self.assertEqual((7, 23), t_limits(30, .25))
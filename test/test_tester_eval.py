@@ -0,0 +1,66 @@
+import unittest
+from util.tester_eval import METHODS, evaluate, gen_series, run_method
+from util.util_tools import get_source_info
+
+
+class TesterEvalTest(unittest.TestCase):
+
+    def test_gen_series(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        base, ci = gen_series(7, 1, 72, day_n=288, days=3)
+        changed, ci = gen_series(7, 2, 72, day_n=288, days=3)
+        self.assertEqual(288 * 3, len(base))
+        self.assertEqual(288 * 3 - 72, ci)
+        self.assertEqual(base[:ci], changed[:ci])
+        for x, y in zip(base[ci:], changed[ci:]):
+            self.assertAlmostEqual(x * 2, y)
+
+    def test_run_method(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        values, ci = gen_series(3, 3, 72, day_n=288, days=3, cycle='low')
+        for name in ('grs_cusum', 'ti_ewma', 'rs_cpd_multi'):
+            args, h = METHODS[name][2][0]
+            max_ts, cp_k, fa_n = run_method(name, args, h, values, ci, 72)
+            self.assertTrue(max_ts > h, name)
+            self.assertTrue(cp_k >= ci - 72, name)
+            self.assertEqual(0, fa_n, name)
+            # Placed after the series the change is detected as a false alarm.
+            _, cp_k, fa_n = run_method(name, args, h, values,
+                                       len(values) + 72, 72)
+            self.assertEqual(0, cp_k, name)
+            self.assertTrue(fa_n > 0, name)
+        # A decrease detected on an increased series is not a detection.
+        values, ci = gen_series(3, 3, 72, day_n=288, days=3, cycle='low')
+        values[ci:] = [-x for x in values[ci:]]
+        max_ts, cp_k, fa_n = run_method('grs_cusum', (5, 1), 3.5, values,
+                                         ci, 72)
+        self.assertTrue(max_ts < -3.5)
+
+    def test_evaluate(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        grid = {'grs_cusum': [((5, 1), 3.5)], 'ti_cusum': [((.5,), 3.5)]}
+        rpts = evaluate(['grs_cusum', 'ti_cusum', 'rs_cpd_multi'],
+                        grid=grid,
+                        count=4,
+                        proc_n=2,
+                        day_n=96,
+                        days=4)
+        self.assertEqual(4, len(rpts))
+        self.assertEqual(['grs_cusum', 'ti_cusum', 'rs_cpd_multi',
+                          'rs_cpd_multi'], [rpt.method for rpt in rpts])
+        for rpt in rpts:
+            self.assertEqual(12, rpt.n)
+            self.assertAlmostEqual(
+                1, rpt.tp + rpt.fn + rpt.wd + rpt.fp + rpt.tn)
+            self.assertTrue(0 <= rpt.dr <= 1)
+            self.assertTrue(0 <= rpt.fpr <= 1)
+            self.assertTrue(0 <= rpt.far <= 1)
+            # False positives are a share of the unchanged third.
+            self.assertAlmostEqual(rpt.fp * 3, rpt.fpr)
+            self.assertTrue(rpt.pps > 0)
+        with self.assertRaises(ValueError):
+            evaluate(['no_such_method'])
+
+
+if __name__ == '__main__':
+    unittest.main()
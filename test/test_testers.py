@@ -3,14 +3,26 @@ from random import weibullvariate
 from test_evaluator import TestEvaluator
 from util.open_record import OpenRecord
 from util.testers import (
+    cusum,
+    cusum_batch,
+    ewma,
+    ewma_batch,
     grs_cusum,
+    grs_cusum_batch,
     grs_ewma,
+    grs_ewma_batch,
     gti_cusum,
+    gti_cusum_batch,
     gti_ewma,
+    gti_ewma_batch,
     pr_cusum,
+    pr_cusum_batch,
     pr_ewma,
+    pr_ewma_batch,
     ti_cusum,
-    ti_ewma
+    ti_cusum_batch,
+    ti_ewma,
+    ti_ewma_batch
 )
 from util.timer import Timer
 from util.util_tools import get_source_info
@@ -54,6 +66,40 @@ class TestersTest(unittest.TestCase):
                     self.assertEqual(n, i, tst.__name__)
                     break
 
+    def test_cusum_ewma_batch(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        scores = [[x - 5 for x in DATA1], [x - 3 for x in DATA2]]
+        for tst, tst_batch, tp in ((cusum, cusum_batch, .5),
+                                   (ewma, ewma_batch, .33)):
+            tss = tst_batch(scores, tp)
+            self.assertEqual((2, len(DATA1)), tss.shape)
+            for row, exp_row in zip(tss, scores):
+                for ts, exp_ts in zip(row, tst(exp_row, tp)):
+                    self.assertAlmostEqual(exp_ts, ts, 9, tst.__name__)
+        with self.assertRaises(ValueError):
+            cusum_batch(scores, 0)
+        with self.assertRaises(ValueError):
+            ewma_batch(scores, 1)
+
+    def test_testers_batch(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        data = [DATA1, DATA2, [weibullvariate(1, 1.1) for _ in DATA1]]
+        for tst, tst_batch, args in ((grs_cusum, grs_cusum_batch, (4, .5)),
+                                     (grs_ewma, grs_ewma_batch, (4, .5)),
+                                     (gti_cusum, gti_cusum_batch, (4, .5)),
+                                     (gti_ewma, gti_ewma_batch, (4, .5)),
+                                     (pr_cusum, pr_cusum_batch, (.5,)),
+                                     (pr_ewma, pr_ewma_batch, (.33,)),
+                                     (ti_cusum, ti_cusum_batch, (.5,)),
+                                     (ti_ewma, ti_ewma_batch, (.33,))):
+            tss = tst_batch(data, *args)
+            self.assertEqual(len(data), len(tss), tst.__name__)
+            for row, values in zip(tss, data):
+                exp_row = list(tst(values, *args))
+                self.assertEqual(len(exp_row), len(row), tst.__name__)
+                for ts, exp_ts in zip(row, exp_row):
+                    self.assertAlmostEqual(exp_ts, ts, 9, tst.__name__)
+
     def test_grouped_testers_range(self):
         print("-- %s(%d): %s --" % get_source_info())
         count = 200
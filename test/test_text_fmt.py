@@ -1,7 +1,15 @@
 import unittest
 from collections import OrderedDict
 import datetime as dt
-from util.text_fmt import to_text_cols, to_text_rows
+from decimal import Decimal
+import io
+from util.text_fmt import (
+    cols_to_text_cols,
+    cols_to_text_rows,
+    to_text_cols,
+    to_text_rows,
+    write_text_rows
+)
 from util.util_tools import get_source_info
 
 
@@ -43,6 +51,70 @@ class TextFmtTest(unittest.TestCase):
         self.assertEqual(5, len(content.split('\n')), content)
         self.assertEqual(3, len(content.split('\n')[0].split()), content)
 
+    def test_format_columns(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = [OrderedDict(n=1, x=1.5, d=Decimal('2.25'), s='12',
+                            t=dt.datetime(2020, 1, 2), e=None),
+                OrderedDict(n=None, x=Decimal(3), d=None, s='abc',
+                            t='nan', e=None),
+                OrderedDict(n=True, x=None, d=4.0, s=' 1_0 ',
+                            t=[1], f='zzzz')]
+        self.assertEqual(['n x     d     s     t                   f   ',
+                          '1 1.500 2.250    12 2020-01-02T00:00:00     ',
+                          '  3.000       abc                   nan     ',
+                          '1       4.000  1_0                      zzzz'],
+                         to_text_rows(recs).split('\n'))
+        cols = OrderedDict([(fn, [rec.get(fn) for rec in recs])
+                            for fn in ('n', 'x', 'd', 's', 't', 'e', 'f')])
+        self.assertEqual(to_text_rows(recs), cols_to_text_rows(cols))
+        # Records are laid out with the fields of the first, columns all.
+        self.assertEqual(to_text_cols(recs[:2]), cols_to_text_cols(
+            OrderedDict([(fn, col[:2]) for fn, col in cols.items()])))
+        self.assertEqual(' f', cols_to_text_cols(cols).split('\n')[-1][:2])
+        self.assertEqual([' n                   1           1',
+                          ' x               1.500 3.000      ',
+                          ' d               2.250       4.000',
+                          ' s                  12   abc  1_0 ',
+                          ' t 2020-01-02T00:00:00   nan'],
+                         to_text_cols(recs).split('\n'))
+
+    def test_write_text_rows(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = [OrderedDict(name='n%d' % (i * 37), value=i / 3, empty=None)
+                for i in range(50)]
+        so = io.StringIO()
+        self.assertEqual(50, write_text_rows(recs, so, indent=2))
+        self.assertEqual(to_text_rows(recs, indent=2), so.getvalue().rstrip())
+
+        # Rows are written as they are generated after the sample.
+        so = io.StringIO()
+
+        def gen():
+            for i, rec in enumerate(recs):
+                if i == 20:
+                    self.assertEqual(21, len(so.getvalue().splitlines()))
+                yield rec
+        self.assertEqual(50, write_text_rows(gen(), so, sample_n=10))
+        lines = so.getvalue().splitlines()
+        self.assertEqual(51, len(lines))
+
+        # Text wider than the sampled column is cut, numbers are not.
+        self.assertEqual('n181', lines[-1].split()[0])
+        self.assertEqual('16.333', lines[-1].split()[1])
+        for sample_n in (0, None):
+            with self.assertRaises(ValueError):
+                write_text_rows(recs, io.StringIO(), sample_n=sample_n)
+
+    def test_write_text_rows_widths(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = [dict(name='abcdefgh', value=12345, other=1),
+                dict(name='xy', value=1)]
+        so = io.StringIO()
+        write_text_rows(recs, so, widths=OrderedDict(value=3, name=5))
+        self.assertEqual(['value name ',
+                          '12345 abcde',
+                          '    1 xy   '], so.getvalue().splitlines())
+
 
 if __name__ == '__main__':
     unittest.main()
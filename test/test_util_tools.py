@@ -1,6 +1,10 @@
 import unittest
 import datetime as dt
-from random import randint, sample
+from decimal import Decimal
+import io
+import json
+from random import choice, randint, sample, seed
+import sys
 from uuid import uuid4
 from util.util_tools import (
     find_lcs,
@@ -10,13 +14,34 @@ from util.util_tools import (
     is_empty,
     is_list,
     is_num,
+    JSON_BACKENDS,
+    set_json_backend,
     to_camel_name,
+    to_json,
+    to_ndjson,
+    to_safe_json,
     to_snake_name,
     to_str,
     zero_if_none
 )
 
 
+def find_lcs_brute(names):
+    """
+    Substring of 'names' with the most pairs of names containing it times
+    its length, the longest then the first to end in 'names' on ties.
+    """
+    best, best_key = '', (0, 0, 0, 0)
+    for i, name in enumerate(names):
+        for j in range(1, len(name) + 1):
+            for sub in (name[k:j] for k in range(j)):
+                n = sum(sub in x for x in names)
+                key = (n * (n - 1) // 2 * len(sub), len(sub), -i, -j)
+                if n > 1 and key > best_key:
+                    best, best_key = sub, key
+    return best
+
+
 class UtilToolsTest(unittest.TestCase):
 
     def test_find_lcs_prefix(self):
@@ -42,6 +67,32 @@ class UtilToolsTest(unittest.TestCase):
         self.assertEqual(5, len(unique))
         self.assertEqual(72, len(unique[0]))
 
+    def test_find_lcs_shared(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        names = ['app.web%02d.%s' % (i % 12, m)
+                 for i in range(60) for m in ('cpu', 'mem', 'disk')]
+        common, unique = find_lcs(names)
+        self.assertEqual('app.web', common)
+        self.assertEqual('00.cpu', unique[0])
+        self.assertEqual(('', ['abc', 'xyz']), find_lcs(['abc', 'xyz']))
+        self.assertEqual(('ab', ['', '']), find_lcs(['ab', 'ab']))
+        with self.assertRaises(ValueError):
+            find_lcs(['abc'])
+
+    def test_find_lcs_objective(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        # The substring shared by the most pairs of names times its length,
+        # not the longest match of each pair counted, which is 'app_'.
+        names = ['app_latency_p50', 'app_latency_p99', 'app_errors',
+                 'web_latency_p50', 'db_latency_p99']
+        self.assertEqual('_latency_p', find_lcs(names)[0])
+        seed(7)
+        for _ in range(300):
+            names = [''.join(choice('ab_c') for _ in range(randint(0, 8)))
+                     for _ in range(randint(2, 6))]
+            self.assertEqual(find_lcs_brute(names), find_lcs(names)[0],
+                             names)
+
     def test_flatten_list(self):
         print("-- %s(%d): %s --" % get_source_info())
         self.assertEqual([1, 2, 3], flatten_list([1, 2, 3]))
@@ -50,6 +101,16 @@ class UtilToolsTest(unittest.TestCase):
                          flatten_list([[1, 2], [3, [4, 5]], {'no': 9}, [9]]))
         self.assertEqual([1, 2, 3, 4, 5],
                          flatten_list([[1, 2], [3, [4, 5], []]]))
+        self.assertEqual([1, 2, 3, 4], flatten_list((1, [(2, [3])], 4)))
+        self.assertEqual(['ab'], flatten_list('ab'))
+
+    def test_flatten_list_deep(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        deep = [0]
+        for i in range(1, sys.getrecursionlimit() * 2):
+            deep = [deep, i]
+        self.assertEqual(list(range(sys.getrecursionlimit() * 2)),
+                         flatten_list(deep))
 
     def test_get_default(self):
         print("-- %s(%d): %s --" % get_source_info())
@@ -100,6 +161,61 @@ class UtilToolsTest(unittest.TestCase):
         self.assertEqual('getHttpResponseCode',
                          to_camel_name('get_http_response_code'))
 
+    def test_to_json(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        x = {'a': dt.datetime(2021, 4, 13, 10, 11, 12),
+             'b': [Decimal('1.25'), dt.date(2021, 4, 13)],
+             'c': {'d': {3}, 'e': None}}
+        exp = {'a': '2021-04-13T10:11:12',
+               'b': [1.25, '2021-04-13'],
+               'c': {'d': [3], 'e': None}}
+        self.assertEqual(exp, to_safe_json(x))
+        self.assertEqual(exp, json.loads(to_json(x, indent=4)))
+        for name in JSON_BACKENDS:
+            try:
+                set_json_backend(name)
+            except ImportError:
+                continue
+            self.assertEqual(exp, json.loads(to_json(x)), name)
+        set_json_backend()
+        with self.assertRaises(ValueError):
+            set_json_backend('pickle')
+
+    def test_to_json_backends(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        x = {'big': [2 ** 70, -2 ** 64], 'nan': float('nan'),
+             'inf': [float('inf'), Decimal('-Infinity')], 'e': 1e16,
+             's': 'café/', 1: None}
+        exp = ('{"big":[1180591620717411303424,-18446744073709551616],'
+               '"nan":null,"inf":[null,null],"e":%s,"s":"café/",'
+               '"1":null}')
+        recs = [{'i': 2 ** 64}, {'i': float('nan')}]
+        for name in JSON_BACKENDS:
+            try:
+                set_json_backend(name)
+            except ImportError:
+                continue
+            text = to_json(x)
+            self.assertIn(text, (exp % '1e16', exp % '1e+16'), name)
+            self.assertEqual(1e16, json.loads(text)['e'], name)
+            fo = io.StringIO()
+            self.assertEqual(2, to_ndjson(recs, fo))
+            self.assertEqual('{"i":18446744073709551616}\n{"i":null}\n',
+                             fo.getvalue(), name)
+        set_json_backend()
+        self.assertEqual('{\n  "nan": null\n}',
+                         to_json({'nan': float('nan')}, indent=2))
+
+    def test_to_ndjson(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        recs = [{'i': i, 'at': dt.date(2021, 1, i + 1)} for i in range(5)]
+        for fo in (io.StringIO(), io.BytesIO()):
+            self.assertEqual(5, to_ndjson(recs, fo, chunk_size=2))
+            text = fo.getvalue()
+            text = text if isinstance(text, str) else text.decode()
+            self.assertEqual(to_safe_json(recs),
+                             [json.loads(ln) for ln in text.splitlines()])
+
     def test_to_snake_name_1(self):
         print("-- %s(%d): %s --" % get_source_info())
         self.assertEqual('one_two_three', to_snake_name('OneTwoThree'))
@@ -113,6 +229,18 @@ class UtilToolsTest(unittest.TestCase):
         self.assertEqual("_to_snake_name_", to_snake_name("_To_SnakeName__"))
         self.assertEqual("to_snake_name", to_snake_name("toSNAKEName"))
 
+    def test_to_snake_name_3(self):
+        print("-- %s(%d): %s --" % get_source_info())
+        self.assertEqual('ab_c_de', to_snake_name(' abCDe\n'))
+        self.assertEqual('ab', to_snake_name('aB'))
+        self.assertEqual('order_date_', to_snake_name('Order Date ($)'))
+        self.assertEqual('http_status', to_snake_name('HTTPStatus'))
+        self.assertEqual('über_größe', to_snake_name('überGröße'))
+        to_snake_name.cache_clear()
+        for _ in range(3):
+            to_snake_name('CustomerId')
+        self.assertEqual(2, to_snake_name.cache_info().hits)
+
     def test_to_snake_name_and_back(self):
         print("-- %s(%d): %s --" % get_source_info())
         words = ["One", "Green", "Plus", "Forever", "Not",
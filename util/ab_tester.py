@@ -4,15 +4,60 @@ before values.
 """
 import datetime as dt
 import numpy as np
-import scipy.stats as ss
 from util.open_record import OpenRecord
 from util.stat_utils import fit
 from util.stat_utils import pct_diff
 from util.stat_utils import period_key
 from util.stat_utils import periods_per_day
+from util.stat_utils import rank_sums
 from util.util_tools import zero_if_none
 
 
+def ab_periods(dates, test_n=15, day_type_n=3, hour_n=3):
+    """
+    Selects the after and before periods for time-series 'dates'. The after
+    periods are the last 'test_n' dates and the before periods are the dates
+    matching the minute, hour and type of day of the after periods, allowing
+    for 'hour_n' hours around each after period and looking back at most
+    'day_type_n' days of the same type, starting one day back.
+    Returns lists of after and before offsets into 'dates', before offsets in
+    reverse order, or None, None if there are not enough dates to test.
+    """
+    if len(dates) <= day_type_n * hour_n * test_n:
+        return None, None
+    day_n = periods_per_day(dates)
+    if len(dates) <= day_n * 3:
+        return None, None
+
+    # Select the after value periods.
+    a_idx = list(range(len(dates) - test_n, len(dates)))
+    a_periods = set()
+    for i in a_idx:
+        # Add an hour period for the exact date.
+        a_periods.add(period_key(dates[i]))
+        if hour_n > 1:
+            # Allocate additional hours.
+            n = (hour_n - 1) // 2
+            m = (hour_n - 1) % 2
+            for j in range(n + m):
+                a_periods.add(
+                    period_key(dates[i] - dt.timedelta(hours=j + 1)))
+            for j in range(n):
+                a_periods.add(
+                    period_key(dates[i] + dt.timedelta(hours=j + 1)))
+
+    # Find periods that match the set of after periods, starting one
+    # day back. Stop if maximum possible periods reached.
+    b_idx = []
+    max_possible = test_n * hour_n * day_type_n
+    for i in range(len(dates) - day_n, -1, -1):
+        if period_key(dates[i]) in a_periods:
+            b_idx.append(i)
+            if len(b_idx) >= max_possible:
+                break
+    return a_idx, b_idx
+
+
 def ab_test(name,
             dates,
             values,
@@ -55,53 +100,119 @@ def ab_test(name,
         is_over=False
     )
     # Make sure test has enough data.
-    if len(dates) > day_type_n * hour_n * test_n:
-        day_n = periods_per_day(dates)
-        if len(dates) > day_n * 3:
-
-            # Select the after value periods.
-            data_set.a_dates = dates[-test_n:]
-            data_set.a_values = zero_if_none(values[-test_n:])
-            a_periods = set()
-            for date in data_set.a_dates:
-                # Add an hour period for the exact date.
-                a_periods.add(period_key(date))
-                if hour_n > 1:
-                    # Allocate additional hours.
-                    n = (hour_n - 1) // 2
-                    m = (hour_n - 1) % 2
-                    for i in range(n + m):
-                        a_periods.add(
-                            period_key(date - dt.timedelta(hours=i + 1)))
-                    for i in range(n):
-                        a_periods.add(
-                            period_key(date + dt.timedelta(hours=i + 1)))
-
-            # Find periods that match the set of after periods, starting one
-            # day back. Stop if maximum possible periods reached.
-            data_set.b_dates = []
-            data_set.b_values = []
-            max_possible = test_n * hour_n * day_type_n
-            for i in range(len(dates) - day_n, -1, -1):
-                pd = period_key(dates[i])
-                if pd in a_periods:
-                    data_set.b_dates.append(dates[i])
-                    data_set.b_values.append(zero_if_none(values[i]))
-                    if len(data_set.b_values) >= max_possible:
-                        break
-
-            # Test after values against before values.
-            test.before = np.median(data_set.b_values)
-            test.after = np.median(data_set.a_values)
-            test.mape, test.mpe = fit(data_set.b_values, test.before)
-            test.pct_diff = pct_diff(test.after, test.before)
-            test.score = ss.ranksums(data_set.a_values, data_set.b_values)[0]
+    a_idx, b_idx = ab_periods(dates, test_n, day_type_n, hour_n)
+    if a_idx is not None:
+
+        # Select the after and matching before values.
+        data_set.a_dates = [dates[i] for i in a_idx]
+        data_set.a_values = zero_if_none([values[i] for i in a_idx])
+        data_set.b_dates = [dates[i] for i in b_idx]
+        data_set.b_values = zero_if_none([values[i] for i in b_idx])
+
+        # Test after values against before values.
+        test.before = np.median(data_set.b_values)
+        test.after = np.median(data_set.a_values)
+        test.mape, test.mpe = fit(data_set.b_values, test.before)
+        test.pct_diff = pct_diff(test.after, test.before)
+        test.score = rank_sums(data_set.a_values, data_set.b_values)
+        test.is_under = False
+        test.is_over = False
+        if abs(test.pct_diff) > min_pcd:
+            if test.score < lower_h:
+                test.is_under = True
+            if test.score > upper_h:
+                test.is_over = True
+
+    return test, data_set
+
+
+def ab_test_batch(names,
+                  dates,
+                  values,
+                  test_n=15,
+                  day_type_n=3,
+                  hour_n=3,
+                  lower_h=-3,
+                  upper_h=3,
+                  min_pcd=15):
+    """
+    After/Before period tester for many series sharing the same time-series
+    'dates'. 'values' is a matrix with a row of values per series and a column
+    per date, 'names' is the name of each series. The after and before periods
+    are selected once from 'dates' and every series is then tested at the same
+    time using vectorized rank sums. Missing values are treated as zero.
+    Parameters are the same as for 'ab_test'. Returns a list of test results,
+    one per series, and a data set with the after/before dates shared by all
+    series and the after/before value matrices.
+    """
+    values = np.array(values, dtype=float, ndmin=2)
+    if values.shape[1] != len(dates):
+        raise ValueError("Expected a column of values per date.")
+    if values.shape[0] != len(names):
+        raise ValueError("Expected a name per series.")
+    data_set = OpenRecord(names=names)
+    tests = [OpenRecord(
+        name=name,
+        periods=len(dates),
+        test_n=test_n,
+        day_type_n=day_type_n,
+        hour_n=hour_n,
+        lower_h=-lower_h,
+        upper_h=upper_h,
+        score=0,
+        min_pcd=min_pcd,
+        is_under=False,
+        is_over=False
+    ) for name in names]
+    # Make sure test has enough data.
+    a_idx, b_idx = ab_periods(dates, test_n, day_type_n, hour_n)
+    if a_idx is not None:
+
+        # Select the after and matching before values for all series.
+        values[np.isnan(values)] = 0
+        data_set.a_dates = [dates[i] for i in a_idx]
+        data_set.a_values = values[:, a_idx]
+        data_set.b_dates = [dates[i] for i in b_idx]
+        data_set.b_values = values[:, b_idx]
+
+        # Test after values against before values.
+        befores = np.median(data_set.b_values, axis=1)
+        afters = np.median(data_set.a_values, axis=1)
+        mapes = mpes = np.zeros(len(names))
+        if len(b_idx) >= 2:
+            pcds = _pct_diffs_(data_set.b_values, befores[:, np.newaxis])
+            mapes = np.mean(np.abs(pcds), axis=1)
+            mpes = np.mean(pcds, axis=1)
+        pcds = _pct_diffs_(afters, befores)
+        scores = rank_sums(data_set.a_values, data_set.b_values)
+        for test, before, after, mape, mpe, pcd, score in zip(
+                tests,
+                befores.tolist(),
+                afters.tolist(),
+                mapes.tolist(),
+                mpes.tolist(),
+                pcds.tolist(),
+                scores.tolist()):
+            test.before = before
+            test.after = after
+            test.mape = mape
+            test.mpe = mpe
+            test.pct_diff = pcd
+            test.score = score
             test.is_under = False
             test.is_over = False
-            if abs(test.pct_diff) > min_pcd:
-                if test.score < lower_h:
+            if abs(pcd) > min_pcd:
+                if score < lower_h:
                     test.is_under = True
-                if test.score > upper_h:
+                if score > upper_h:
                     test.is_over = True
 
-    return test, data_set
+    return tests, data_set
+
+
+def _pct_diffs_(x, y):
+    """ Element-wise 'pct_diff' for arrays 'x' and 'y'. """
+    s = x + y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(s != 0, (x - y) / (s / 2) * 100, 0)
+
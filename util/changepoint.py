@@ -4,7 +4,7 @@ Functions for finding changepoints in a time-series of data.
 from math import sqrt
 import numpy as np
 from util.open_record import OpenRecord
-from util.stat_utils import pct_diff, rankdata
+from util.stat_utils import pct_diff, rank_sums_split
 from util.transform import to_sqrt_trans
 
 
@@ -64,13 +64,15 @@ def rs_cpd(data):
     """
     n = len(data)
     cp_k = max_ts = 0
-    ranks = [r - (n / 2) for r in rankdata(data)]
-    for k in range(14, n - 4):
-        sd = sqrt((k * (n - k) * (k + (n - k) + 1)) / 3)
-        ts = sum(ranks[k:]) / sd
-        if abs(ts) > abs(max_ts):
-            cp_k = k
-            max_ts = ts
+    # Half the rank sums score, with ranks centred on n / 2.
+    ks = np.arange(14, max(n - 4, 14))
+    tss = rank_sums_split(data, 14, n - 4) / 2 + \
+        (n - ks) / (2 * np.sqrt(ks * (n - ks) * (n + 1) / 3))
+    if len(tss):
+        i = int(np.argmax(np.abs(tss)))
+        if tss[i] != 0:
+            cp_k = i + 14
+            max_ts = float(tss[i])
     return max_ts, cp_k
 
 
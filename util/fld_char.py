@@ -3,30 +3,280 @@
 Examines records and fields to characterize the types of characters and values.
 """
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from collections import defaultdict
 import concurrent.futures as cf
 import csv
+import datetime as dt
 from decimal import Decimal
 from fnmatch import fnmatch
+import gzip
 import io
+from itertools import chain, islice
 import json
-from math import sqrt
+import mmap
 from multiprocessing import cpu_count
 import numpy as np
 import scipy.stats as ss
 import os
+import pickle
+import re
 import string
 import sys
+from util.sketches import HyperLogLog, SpaceSaving
 from util.time_utils import to_utc
+from util.timer import Timer
 from util.util_tools import get_type, max_or_none, min_or_none
 
+CHUNK_SIZE = 1 << 20
+COLUMNAR_EXTS = ('.parquet', '.pq', '.arrow', '.feather', '.ipc')
 DIGITS = 3
+JSON_LINES_EXTS = ('.jsonl', '.ndjson')
 MAX_COLLECT = 1000000
 MAX_UNIQUES = 50000
 MAX_SHOW = 50
 MAX_SIZE = 40
 MIN_UNIQ = 2
-MULTI_PROC_H = 500000
+MIN_PROC_SECS = .5
+MULTI_PROC_BYTES = 1 << 26
+PARQUET_EXTS = ('.parquet', '.pq')
+SAMPLE_BYTES = 1 << 20
+SAMPLE_RECORDS = 2000
+STATE_VERSION = 1
+TASK_SECS = .25
+TASKS_PER_PROC = 4
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Character class names with the characters reported for them, in the order
+# of their class codes.
+CHAR_CLASSES = {
+    'a-z': string.ascii_lowercase,
+    'A-Z': string.ascii_uppercase,
+    '0-9': string.digits,
+    'space': ' ',
+    'special': string.punctuation,
+    'ctrl': ''
+}
+CLASS_NAMES = tuple(CHAR_CLASSES)
+
+
+def _char_class_(c):
+    """ Class code of character 'c', an index into CLASS_NAMES. """
+    if c.isalpha():
+        return 0 if c.islower() else 1
+    elif c.isdigit():
+        return 2
+    elif c.isspace():
+        return 3
+    elif c.isprintable():
+        return 4
+    return 5
+
+
+# Translation table from ASCII bytes to their class codes, so the classes in
+# ASCII text are found with one pass in C.
+ASCII_CLASSES = bytes(_char_class_(chr(b)) for b in range(256))
+
+# Expressions for (int, float, not a number) literals, as str and as bytes.
+# Values matching neither number form are only passed to int() and float()
+# if they consist of characters a number could be spelled with.
+NUMBER_RES = tuple(tuple(re.compile(x) for x in exprs) for exprs in (
+    (r'[-+]?[0-9]+\Z',
+     r'[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?\Z',
+     r'[^-+.0-9_eEnNaAiIfFtTyY]'),
+    (rb'[-+]?[0-9]+\Z',
+     rb'[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?\Z',
+     rb'[^-+.0-9_eEnNaAiIfFtTyY]')))
+
+# Expressions for the values of a field with a cached numeric type, by the
+# type of value, the numeric type and whether the field has special
+# characters. Values matching have no character class the field lacks and
+# convert to the cached type, so they are only counted and sampled.
+CACHED_NUMBER_RES = {
+    (str, 'int', False): re.compile(r'[0-9]+\Z'),
+    (str, 'int', True): re.compile(r'[-+]?[0-9]+\Z'),
+    (str, 'float', True): re.compile(r'[-+]?(?:[0-9]+\.[0-9]*|\.[0-9]+)\Z'),
+    (bytes, 'int', False): re.compile(rb'[0-9]+\Z'),
+    (bytes, 'int', True): re.compile(rb'[-+]?[0-9]+\Z'),
+    (bytes, 'float', True): re.compile(rb'[-+]?(?:[0-9]+\.[0-9]*|\.[0-9]+)\Z')
+}
+
+# Formats tried for the dates parsed in a field, to find one that parses the
+# same dates as dateutil without its overhead.
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S%z',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y'
+)
+DATE_SHAPE = bytes.maketrans(b'0123456789', b'9999999999')
+MAX_DATE_SHAPES = 100
+
+
+def _char_classes_(val):
+    """ Set of class codes of the characters in string or bytes 'val'. """
+    if isinstance(val, str):
+        if not val.isascii():
+            return set(_char_class_(c) for c in val)
+        val = val.encode()
+    return set(val.translate(ASCII_CLASSES))
+
+
+def _to_number_(val):
+    """
+    Convert string or bytes 'val' to an (int, 'int') or (float, 'float')
+    pair as int() or float() would, or None if neither accepts it. Common
+    forms are matched with precompiled expressions, so exceptions are only
+    raised for unusual ones.
+    """
+    int_re, float_re, other_re = NUMBER_RES[isinstance(val, bytes)]
+    if int_re.match(val):
+        return int(val), 'int'
+    if float_re.match(val):
+        return float(val), 'float'
+    if val.isascii() and other_re.search(val):
+        return None
+    try:
+        return int(val), 'int'
+    except BaseException:
+        try:
+            return float(val), 'float'
+        except BaseException:
+            return None
+
+
+def _date_format_(val, dx):
+    """
+    Format from DATE_FORMATS that parses string 'val' to the same UTC
+    datetime 'dx' as dateutil, or None if there is none or 'val' is in ISO
+    format, which to_utc already parses quickly.
+    """
+    try:
+        dt.datetime.fromisoformat(val)
+        return None
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            if to_utc(dt.datetime.strptime(val, fmt)) == dx:
+                return fmt
+        except ValueError:
+            pass
+    return None
+
+
+def _to_date_(val, fmts):
+    """
+    Convert string 'val' to a UTC datetime if it looks like a date, or None.
+    'fmts' memoizes the format found for each shape of date, the string with
+    its digits replaced, so dateutil only parses the dates no known format
+    parses.
+    """
+    if len(val) < 10 or len(val) > 30:
+        return None
+    if len([v for v in val if v.isdigit()]) < 8 or \
+            len([v for v in val if v in "-/, "]) < 2:
+        return None
+    if val.isascii():
+        shape = val.encode().translate(DATE_SHAPE)
+    else:
+        shape = val.translate(DATE_SHAPE)
+    fmt = fmts.get(shape)
+    if fmt is not None:
+        try:
+            return to_utc(dt.datetime.strptime(val, fmt))
+        except ValueError:
+            pass
+    try:
+        dx = to_utc(val)
+    except BaseException:
+        return None
+    if dx is not None and shape not in fmts and len(fmts) < MAX_DATE_SHAPES:
+        fmts[shape] = _date_format_(val, dx)
+    return dx
+
+
+class LineBreakError(ValueError):
+    """ CSV fields with line breaks, so records cannot be read by line. """
+
+
+class RingBuffer:
+    """
+    Keeps the last 'size' numbers added as floats in a NumPy array. The
+    array grows by doubling up to 'size', after which each value overwrites
+    the oldest, so appends are O(1) and values are never shifted or trimmed.
+    """
+
+    def __init__(self, size, values=()):
+        if size < 1:
+            raise ValueError("Ring buffer size must be at least 1.")
+        self.__size = size
+        self.__buf = np.empty(min(size, 16))
+        self.__n = 0
+        self.extend(values)
+
+    def __len__(self):
+        return min(self.__n, self.__size)
+
+    def __grow(self, n):
+        """ Grow the array to hold at least 'n' values. """
+        buf = np.empty(min(self.__size, max(n, 2 * len(self.__buf))))
+        buf[:len(self)] = self.__buf[:len(self)]
+        self.__buf = buf
+
+    def append(self, x):
+        """ Add number 'x', overwriting the oldest value if full. """
+        n = self.__n
+        if n < self.__size:
+            if n == len(self.__buf):
+                self.__grow(n + 1)
+            self.__buf[n] = x
+        else:
+            self.__buf[n % self.__size] = x
+        self.__n = n + 1
+
+    def extend(self, xs):
+        """ Add the numbers in 'xs' in order, in at most two array copies. """
+        xs = np.asarray(xs, dtype=float)
+        k = len(xs)
+        if len(self.__buf) < min(self.__n + k, self.__size):
+            self.__grow(self.__n + k)
+        if k > self.__size:
+            # Values that would be overwritten are skipped.
+            self.__n += k - self.__size
+            xs = xs[k - self.__size:]
+            k = self.__size
+        pos = self.__n % self.__size
+        first = min(k, self.__size - pos)
+        self.__buf[pos:pos + first] = xs[:first]
+        self.__buf[:k - first] = xs[first:]
+        self.__n += k
+
+    def ordered(self):
+        """ Copy of the values, oldest first. """
+        if self.__n <= self.__size:
+            return self.__buf[:self.__n].copy()
+        pos = self.__n % self.__size
+        return np.concatenate((self.__buf[pos:], self.__buf[:pos]))
+
+    def view(self):
+        """
+        Read only view of the values without copying, in the order they are
+        stored. Buffers of the same size with the same number of values added
+        store the values added together in the same positions.
+        """
+        view = self.__buf[:len(self)]
+        view.flags.writeable = False
+        return view
 
 
 class Field:
@@ -40,7 +290,8 @@ class Field:
         conv_types is the converted set of character types.
         count is number of values found in the field.
         missing is number of missing values.
-        values are the unique values and counts, up to MAX_UNIQUES.
+        values are the unique values and counts, the MAX_UNIQUES most frequent
+        kept in a SpaceSaving sketch with a HyperLogLog distinct count.
         chars is used to accumulate the types of characters.
         """
         self.__name = name
@@ -57,29 +308,53 @@ class Field:
         self.__max_val = kv_args.get('max_val', None)
         self.__count = kv_args.get('count', 0)
         self.__missing = kv_args.get('missing', 0)
-        self.__values = kv_args.get('values', defaultdict(int))
-        self.__data = kv_args.get('data', [])
+        values = kv_args.get('values')
+        self.__values = SpaceSaving(self.__max_uniques, values)
+        self.__distinct = None
+        if not self.__values.is_exact():
+            # Values were dropped from the sketch, so count them all here.
+            self.__distinct = HyperLogLog()
+            for x in values:
+                self.__distinct.add(x)
+        self.__data = RingBuffer(self.__max_collect, kv_args.get('data', []))
+        self.__rows = RingBuffer(self.__max_collect,
+                                 kv_args.get('rows', range(len(self.__data))))
         if 'chars' in kv_args:
             self.__chars = kv_args['chars']
         else:
             self.__chars = {}
+        self.__date_fmts = {}
+        self.__cached_number = None
 
     def describe(self):
         """ Descriptive statistics for data collected. """
         pcts = (0, 1, 5, 10, 25, 50, 75, 90, 95, 99, 100)
-        ds = dict(name=self.__name, n=len(self.__data), mu=0, sd=0)
+        data = self.__data.view()
+        ds = dict(name=self.__name, n=len(data), mu=0, sd=0)
         for pc in pcts:
             ds['p%02d' % pc] = 0
-        if len(self.__data) >= 3:
-            ds['mu'] = np.mean(self.__data)
-            ds['sd'] = np.std(self.__data)
-            for pc, pv in zip(pcts, np.percentile(self.__data, pcts)):
+        if len(data) >= 3:
+            ds['mu'] = np.mean(data)
+            ds['sd'] = np.std(data)
+            for pc, pv in zip(pcts, np.percentile(data, pcts)):
                 ds['p%02d' % pc] = pv
         return ds
 
-    def evaluate(self, val):
-        """ Characterize string 'val'. """
-        if val is None:
+    def evaluate(self, val, row=None):
+        """
+        Characterize string 'val'. Bytes are characterized as the ASCII or
+        UTF-8 encoded string, decoding them only when needed. 'row' numbers
+        the record the value is from, default the count of values so far,
+        and aligns numeric samples across Fields for correlation.
+        """
+        cached = self.__cached_number
+        if cached is not None and type(val) is cached[0] and \
+                cached[1].match(val):
+            # Same form of number as the last, adding nothing else.
+            self.__count += 1
+            self.__data.append(cached[2](val))
+            self.__rows.append(self.__count - 1 if row is None else row)
+        elif val is None:
             self.__count += 1
             self.__missing += 1
         elif isinstance(val, Field):
@@ -97,60 +372,51 @@ class Field:
             self.__max_val = max_or_none(self.__max_val, val.__max_val)
             self.__count += val.__count
             self.__missing += val.__missing
-            for v, c in val.__values.items():
-                if len(self.__values) < self.__max_uniques:
-                    self.__values[v] += c
+            if self.__distinct is not None or val.__distinct is not None or \
+                    len(self.__values) + len(val.__values) > \
+                    self.__max_uniques:
+                self.__get_distinct().merge(val.__get_distinct())
+            self.__values.merge(val.__values)
             self.__chars.update(val.__chars)
-            space = self.__max_collect - len(self.__data)
-            if space < len(val.__data):
-                self.__data = self.__data[len(val.__data) - space:]
-            self.__data.extend(val.__data)
+            self.__data.extend(val.__data.ordered())
+            self.__rows.extend(val.__rows.ordered())
         else:
             # Add a value to this field.
             self.__count += 1
             conv_val = val
             conv_type = get_type(val)
-            self.__orig_types.add(get_type(val))
-            if isinstance(val, str):
+            if isinstance(val, bytes):
+                # Undecoded text sliced from a memory mapped file.
+                conv_type = 'str'
+            self.__orig_types.add(conv_type)
+            if isinstance(val, (str, bytes)):
                 # Input type is string.
                 val = val.strip()
+                if isinstance(val, bytes) and not val.isascii():
+                    val = val.decode(errors='replace')
                 if not len(val):
                     self.__missing += 1
                 else:
-                    for c in val:
-                        if c.isalpha():
-                            if c.islower():
-                                self.__chars["a-z"] = string.ascii_lowercase
-                            else:
-                                self.__chars["A-Z"] = string.ascii_uppercase
-                        elif c.isdigit():
-                            self.__chars["0-9"] = string.digits
-                        elif c.isspace():
-                            self.__chars["space"] = ' '
-                        elif c.isprintable():
-                            self.__chars['special'] = string.punctuation
-                        else:
-                            self.__chars["ctrl"] = ''
+                    if len(self.__chars) < len(CHAR_CLASSES):
+                        for c in _char_classes_(val):
+                            self.__chars[CLASS_NAMES[c]] = \
+                                CHAR_CLASSES[CLASS_NAMES[c]]
                     conv_val = val
                     conv_type = 'str'
-                    try:
-                        conv_val = int(val)
-                        conv_type = 'int'
-                    except BaseException:
-                        try:
-                            conv_val = float(val)
-                            conv_type = 'float'
-                        except BaseException:
-                            if len(val) >= 10 and len(val) <= 30:
-                                if len([v for v in val if v.isdigit()]) >= 8:
-                                    if len([v for v in val if v in "-/, "]) >= 2:
-                                        try:
-                                            dx = to_utc(val)
-                                            if dx is not None:
-                                                conv_val = dx
-                                                conv_type = 'datetime'
-                                        except BaseException:
-                                            pass
+                    num = _to_number_(val)
+                    if num is not None:
+                        conv_val, conv_type = num
+                        expr = CACHED_NUMBER_RES.get(
+                            (type(val), conv_type, 'special' in self.__chars))
+                        self.__cached_number = None if expr is None else \
+                            (type(val), expr, type(conv_val))
+                    else:
+                        if isinstance(val, bytes):
+                            val = conv_val = val.decode()
+                        dx = _to_date_(val, self.__date_fmts)
+                        if dx is not None:
+                            conv_val = dx
+                            conv_type = 'datetime'
                     if conv_type == 'str':
                         self.__min_len = \
                             min_or_none(self.__min_len, len(conv_val))
@@ -169,17 +435,103 @@ class Field:
             else:
                 conv_type = get_type(val)
                 val = str(val)
+            if isinstance(val, bytes):
+                val = val.decode()
             self.__orig_types.add(get_type(val))
             self.__conv_types.add(conv_type)
             if conv_type == 'str' or conv_type == 'datetime':
                 if len(val) and len(val) <= self.__max_size:
-                    if len(self.__values) < self.__max_uniques:
-                        self.__values[val] += 1
+                    if self.__distinct is None and val not in self.__values \
+                            and len(self.__values) >= self.__max_uniques:
+                        self.__get_distinct()
+                    self.__values.add(val)
+                    if self.__distinct is not None:
+                        self.__distinct.add(val)
             elif conv_type == 'float' or conv_type == 'int':
-                if len(self.__data) > self.__max_collect * 1.05:
-                    self.__data = self.__data[int(
-                        self.__max_collect * .05):]
                 self.__data.append(conv_val)
+                self.__rows.append(self.__count - 1 if row is None else row)
+
+    def evaluate_numbers(self, values, rows, missing=0):
+        """
+        Characterize NumPy array 'values' of integers or floats at once, as
+        evaluating each number in turn would. 'rows' numbers the record of
+        each value and 'missing' counts the null values not in 'values'.
+        """
+        n = len(values)
+        self.__count += n + missing
+        self.__missing += missing
+        if n:
+            conv_type = 'float' if values.dtype.kind == 'f' else 'int'
+            self.__orig_types.update((conv_type, 'str'))
+            self.__conv_types.add(conv_type)
+            self.__data.extend(values)
+            self.__rows.extend(rows)
+
+    def evaluate_strings(self, uniques, indices, rows):
+        """
+        Characterize a dictionary encoded column of strings at once, as
+        evaluating each string in turn would except for the order numeric
+        samples are kept in. 'uniques' are the distinct strings, 'indices'
+        a NumPy array of the position in 'uniques' of each value, negative
+        if null, and 'rows' numbers the record of each value. Each distinct
+        string is characterized once and added with its count.
+        """
+        valid = indices >= 0
+        counts = np.bincount(indices[valid], minlength=len(uniques))
+        self.__count += len(indices)
+        self.__missing += len(indices) - len(indices[valid])
+        nums = np.full(len(uniques), np.nan)
+        for i, val in enumerate(uniques):
+            c = int(counts[i])
+            if not c:
+                continue
+            self.__orig_types.add('str')
+            val = val.strip()
+            if not len(val):
+                self.__missing += c
+                self.__conv_types.add('str')
+                continue
+            if len(self.__chars) < len(CHAR_CLASSES):
+                for cc in _char_classes_(val):
+                    self.__chars[CLASS_NAMES[cc]] = \
+                        CHAR_CLASSES[CLASS_NAMES[cc]]
+            num = _to_number_(val)
+            if num is not None:
+                nums[i], conv_type = num
+                self.__conv_types.add(conv_type)
+                continue
+            dx = _to_date_(val, self.__date_fmts)
+            if dx is None:
+                self.__min_len = min_or_none(self.__min_len, len(val))
+                self.__max_len = max_or_none(self.__max_len, len(val))
+                self.__conv_types.add('str')
+            else:
+                self.__min_val = min_or_none(self.__min_val, dx)
+                self.__max_val = max_or_none(self.__max_val, dx)
+                self.__conv_types.add('datetime')
+            if len(val) <= self.__max_size:
+                if self.__distinct is None and val not in self.__values \
+                        and len(self.__values) >= self.__max_uniques:
+                    self.__get_distinct()
+                self.__values.add(val, c)
+                if self.__distinct is not None:
+                    self.__distinct.add(val)
+        is_num = valid.copy()
+        is_num[valid] = ~np.isnan(nums[indices[valid]])
+        if is_num.any():
+            self.__data.extend(nums[indices[is_num]])
+            self.__rows.extend(rows[is_num])
+
+    def __get_distinct(self):
+        """
+        HyperLogLog of the unique values, only started when values are about
+        to be dropped from the sketch, from the values it has tracked exactly.
+        """
+        if self.__distinct is None:
+            self.__distinct = HyperLogLog()
+            for x, _ in self.__values.items():
+                self.__distinct.add(x)
+        return self.__distinct
 
     def get_chars(self):
         """ Character types found in the field. """
@@ -193,8 +545,8 @@ class Field:
         return self.__count
 
     def get_data(self):
-        """ Returns copy of numeric values. """
-        return [x for x in self.__data]
+        """ Returns copy of numeric values, oldest first. """
+        return self.__data.ordered().tolist()
 
     def get_max_len(self):
         """ Maximim length of string field. """
@@ -211,19 +563,38 @@ class Field:
     def get_orig_types(self):
         return sorted(list(self.__orig_types))
 
+    def get_rows(self):
+        """ Record rows of the numeric values, see 'get_samples'. """
+        return self.__rows.view()
+
+    def get_samples(self):
+        """
+        Numeric values as a read only NumPy view, without copying, in the
+        same order as their record rows from 'get_rows'.
+        """
+        return self.__data.view()
+
     def get_unique_count(self):
-        """ Number of unique values found. """
-        return len(self.__values)
+        """
+        Number of unique values found, estimated once there are more than
+        'max_uniques'.
+        """
+        if self.__values.is_exact():
+            return len(self.__values)
+        return self.__distinct.estimate()
 
     def is_numeric(self):
         """ Indicates it field is numeric. """
         return 'float' in self.__conv_types or 'int' in self.__conv_types
 
     def probs(self):
-        """ Probability of each unique value occurring. """
-        s = sum(self.__values.values())
-        xcs = sorted(self.__values.items(), key=lambda xc: xc[1], reverse=True)
-        return [(x, c / s) for x, c in xcs]
+        """
+        Probability of each unique value occurring. Once values are dropped
+        from the sketch these are over estimates, though they still sum to
+        at most 1, see 'SpaceSaving.merge'.
+        """
+        s = self.__values.total()
+        return [(x, c / s) for x, c in self.__values.top()]
 
     def values(self):
         """ Unique values found in the field. """
@@ -237,9 +608,10 @@ class Field:
         print("%s:" % self.__name, file=so)
         print("  %d values" % self.__count, file=so)
         if len(self.__values):
-            print("  %d distinct values" % len(self.__values), file=so)
+            print("  %d distinct values" % self.get_unique_count(), file=so)
         elif len(self.__data):
-            print("  %d distinct values" % len(set(self.__data)), file=so)
+            print("  %d distinct values" % len(np.unique(self.__data.view())),
+                  file=so)
         print("  %d missing" % self.__missing, file=so)
         if len(self.__chars):
             print("  Chars: %s" % ','.join(self.__chars), file=so)
@@ -261,11 +633,12 @@ class Field:
                   file=so)
         if len(self.__values) >= MIN_UNIQ:
             # Show top values for string field.
-            print("  Top %d values:" %
-                  min(self.__max_show, len(self.__values)), file=so)
-            max_len = max([len(x) for x in self.__values])
-            values = sorted(
-                self.__values.items(), key=lambda xc: xc[1], reverse=True)
+            print("  Top %d values%s:" %
+                  (min(self.__max_show, len(self.__values)),
+                   '' if self.__values.is_exact() else ' (estimated)'),
+                  file=so)
+            values = self.__values.top(self.__max_show + 1)
+            max_len = max([len(x) for x, _ in values])
             for i, (x, c) in enumerate(values):
                 print("    %s : %d" % (x.ljust(max_len), c), file=so)
                 if i == self.__max_show:
@@ -279,7 +652,23 @@ class Field:
                     print(fmt % (fn, fv), file=so)
         return so.getvalue()
 
+    @staticmethod
+    def from_dict(state):
+        """ Field restored from its 'to_dict' 'state'. """
+        state = dict(state)
+        values = state.pop('values')
+        distinct = state.pop('distinct')
+        fld = Field(state.pop('name'), **state)
+        fld.__values = SpaceSaving.from_dict(values)
+        if distinct is not None:
+            fld.__distinct = HyperLogLog.from_dict(distinct)
+        return fld
+
     def to_dict(self):
+        """
+        State of the Field as a dictionary of builtin types and datetimes,
+        see 'from_dict'. Numeric samples and their rows are oldest first.
+        """
         return dict(
             name=self.__name,
             digits=self.__digits,
@@ -287,40 +676,613 @@ class Field:
             max_uniques=self.__max_uniques,
             max_show=self.__max_show,
             max_size=self.__max_size,
-            orig_types=self.__orig_types,
-            conv_types=self.__conv_types,
+            orig_types=sorted(self.__orig_types),
+            conv_types=sorted(self.__conv_types),
             min_len=self.__min_len,
             max_len=self.__max_len,
             min_val=self.__min_val,
             max_val=self.__max_val,
             count=self.__count,
             missing=self.__missing,
-            values=self.__values,
-            chars=self.__chars
+            values=self.__values.to_dict(),
+            distinct=None if self.__distinct is None else
+            self.__distinct.to_dict(),
+            chars=dict(self.__chars),
+            data=self.__data.ordered().tolist(),
+            rows=self.__rows.ordered().tolist()
         )
 
     def __str__(self):
         return self.report()
 
 
-def analyze(kv_args, records):
-    """ Characterize each record in 'records'. """
+def analyze(kv_args, records, row=0):
+    """
+    Characterize each record in 'records', numbering their rows from 'row'.
+    """
     fcs = {}
-    for rec in records:
+    for i, rec in enumerate(records, row):
         if rec is not None:
-            _analyze_rec_(kv_args, fcs, rec)
+            _analyze_rec_(kv_args, fcs, rec, row=i)
     return fcs
 
 
-def _analyze_rec_(kv_args, fcs, rec, qual=None):
-    """ Characterize 'rec' with list of fields 'fcs' and name qualifier 'qual'. """
+def _filter_records_(kv_args, records):
+    """
+    Generate 'records' accepted by the 'select' lambda expression in
+    'kv_args', reduced to the fields matching the 'fields' name expressions,
+    as found in the first record.
+    """
+    sel_fn = None
+    if kv_args.get('select') is not None:
+        sel_fn = eval(kv_args['select'])
+    fld_exprs = kv_args.get('fields')
+    fld_names = None
+    for rec in records:
+        if sel_fn is not None and not sel_fn(rec):
+            continue
+        if fld_exprs:
+            if fld_names is None:
+                fld_names = set()
+                for fn in rec:
+                    for fe in fld_exprs:
+                        if fnmatch(fn, fe):
+                            fld_names.add(fn)
+            rec = {fn: fv for fn, fv in rec.items() if fn in fld_names}
+        yield rec
+
+
+def _analyze_rec_(kv_args, fcs, rec, qual=None, row=None):
+    """
+    Characterize 'rec' at 'row' with list of fields 'fcs' and name qualifier
+    'qual'.
+    """
     for fn, fv in rec.items():
         if isinstance(fv, dict):
-            _analyze_rec_(kv_args, fcs, fv, fn)
+            _analyze_rec_(kv_args, fcs, fv, fn, row)
         else:
             name = "%s.%s" % (qual, fn) if qual is not None else fn
-            fcs.setdefault(name, Field(name, **kv_args))
-            fcs[name].evaluate(fv)
+            fld = fcs.get(name)
+            if fld is None:
+                fld = fcs[name] = Field(name, **kv_args)
+            fld.evaluate(fv, row)
+
+
+def _analyze_range_(kv_args, src, start, end, fieldnames, fmt):
+    """
+    Characterize the records in byte range 'start' to 'end' of file 'src',
+    CSV with 'fieldnames' and format 'fmt' or NDJSON if 'fieldnames' is None.
+    """
+    use_mmap = kv_args.get('mmap')
+    if use_mmap and fieldnames is not None and kv_args.get('select') is None:
+        # Select expressions compare strings, so values are only left as
+        # bytes without one.
+        records = _split_csv_bytes_(
+            read_range_mmap(src, start, end), fieldnames, fmt)
+    else:
+        if use_mmap:
+            lines = (bytes(line).decode()
+                     for line in read_range_mmap(src, start, end))
+        else:
+            lines = read_range(src, start, end)
+        if fieldnames is not None:
+            records = csv.DictReader(
+                _check_lines_(lines, fmt['quotechar'], fmt['escapechar']),
+                fieldnames=fieldnames, **fmt)
+        else:
+            records = (json.loads(line) for line in lines
+                       if len(line.strip()))
+    # Fewer lines than bytes start in a range, so numbering rows from the
+    # start of the range keeps them unique across ranges.
+    return analyze(kv_args, _filter_records_(kv_args, records), start)
+
+
+def _check_lines_(lines, quote, esc):
+    """
+    Generate CSV 'lines', raising LineBreakError at a line with an odd
+    number of 'quote' characters not escaped by 'esc', where a quoted field
+    continues on the next line. Every line of such a field is found, so
+    wherever a range of lines starts.
+    """
+    for line in lines:
+        if quote and _open_quote_(line, quote, esc):
+            raise LineBreakError("CSV fields contain line breaks.")
+        yield line
+
+
+def _open_quote_(line, quote, esc):
+    """
+    Indicates CSV 'line', text or bytes, has an odd number of 'quote'
+    characters not escaped by 'esc', so a quoted field spans lines.
+    """
+    n = line.count(quote)
+    if esc:
+        n -= line.count(esc + quote)
+    return n % 2 == 1
+
+
+def _csv_fmt_(dialect):
+    """ CSV format parameters from 'dialect', for passing to processes. """
+    return dict(delimiter=dialect.delimiter,
+                doublequote=dialect.doublequote,
+                escapechar=dialect.escapechar,
+                quotechar=dialect.quotechar,
+                quoting=dialect.quoting,
+                skipinitialspace=dialect.skipinitialspace)
+
+
+def _split_csv_bytes_(lines, fieldnames, fmt):
+    """
+    Generate records with bytes values from CSV 'lines', memoryviews of
+    bytes, with 'fieldnames' and format 'fmt'. Each line is copied once to
+    split it. Lines without quote or escape characters are split on the
+    delimiter without decoding, other lines are decoded and parsed as CSV.
+    As with csv.DictReader, fields missing from short rows are None and
+    extra values are listed under the key None.
+    """
+    field_n = len(fieldnames)
+    delim = fmt['delimiter'].encode()
+    quote, esc = [c.encode() if c else None
+                  for c in (fmt['quotechar'], fmt['escapechar'])]
+    quoted = [c for c in (quote, esc) if c]
+    for line in lines:
+        line = bytes(line).rstrip(b'\r\n')
+        if not len(line):
+            continue
+        if any(c in line for c in quoted):
+            if quote and _open_quote_(line, quote, esc):
+                raise LineBreakError("CSV fields contain line breaks.")
+            row = next(csv.reader([line.decode()], **fmt), [])
+        else:
+            row = line.split(delim)
+        rec = dict(zip(fieldnames, row))
+        if len(row) > field_n:
+            rec[None] = row[field_n:]
+        else:
+            for fn in fieldnames[len(row):]:
+                rec[fn] = None
+        yield rec
+
+
+def _complete_size_(src):
+    """
+    Size of file 'src' up to the end of its last complete line, excluding a
+    line that may still be being written.
+    """
+    with open(src, 'rb') as fi:
+        end = fi.seek(0, os.SEEK_END)
+        while end > 0:
+            st = max(0, end - CHUNK_SIZE)
+            fi.seek(st)
+            nl = fi.read(end - st).rfind(b'\n')
+            if nl >= 0:
+                return st + nl + 1
+            end = st
+    return 0
+
+
+def _merge_fields_(kv_args, fcs, fc):
+    """
+    Merge the Fields in 'fc' into the Fields in 'fcs', adding Fields made
+    with the settings in 'kv_args', like 'max_uniques' and 'max_collect'.
+    """
+    for fn, fld in fc.items():
+        if fn is not None:
+            try:
+                fcs[fn].evaluate(fld)
+            except KeyError:
+                fcs[fn] = Field(fn, **kv_args)
+                fcs[fn].evaluate(fld)
+    return fcs
+
+
+def _plan_procs_(units, unit_secs, max_procs):
+    """
+    Number of processes and units of work per task for 'units' of work,
+    records or bytes, taking 'unit_secs' each, using up to 'max_procs'
+    processes. Each process must have at least MIN_PROC_SECS of work to pay
+    for starting it, and tasks take about TASK_SECS with at least
+    TASKS_PER_PROC per process, so faster processes take more of them.
+    """
+    secs = units * unit_secs
+    procs_n = max(1, min(max_procs, int(secs / MIN_PROC_SECS)))
+    if procs_n == 1:
+        return 1, max(1, units)
+    task_n = round(TASK_SECS / unit_secs) if unit_secs > 0 else units
+    task_n = min(task_n, -(-units // (procs_n * TASKS_PER_PROC)))
+    return procs_n, max(1, task_n)
+
+
+def _proc_count_(kv_args):
+    """
+    Maximum processes to use, the 'procs' key word argument if set, else the
+    cores available to this process.
+    """
+    if kv_args.get('procs'):
+        return kv_args['procs']
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return cpu_count()
+
+
+def _run_procs_(kv_args, analyze_fn, tasks, procs_n):
+    """
+    Run 'analyze_fn' on each of the 'tasks', tuples of arguments, in a pool
+    of 'procs_n' processes, merging the Fields returned, see
+    '_merge_fields_' for 'kv_args'. Tasks are submitted as others complete,
+    with at most two per process outstanding, so free processes pull the
+    next task and tasks are only pickled when needed.
+    """
+    fcs = {}
+    tasks = iter(tasks)
+    with cf.ProcessPoolExecutor(max_workers=procs_n) as executor:
+        futures = set()
+        try:
+            while True:
+                for task in islice(tasks, 2 * procs_n - len(futures)):
+                    futures.add(executor.submit(analyze_fn, *task))
+                if not len(futures):
+                    break
+                done, futures = cf.wait(
+                    futures, return_when=cf.FIRST_COMPLETED)
+                for ft in done:
+                    if ft.exception() is not None:
+                        raise ft.exception()
+                    _merge_fields_(kv_args, fcs, ft.result())
+        except KeyboardInterrupt:
+            print('Terminating...')
+            sys.exit(1)
+    return fcs
+
+
+def _pyarrow_():
+    """
+    The pyarrow module with its ipc and parquet modules loaded, imported
+    only when columnar input is read as pyarrow is an optional dependency.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as ex:
+        raise ImportError("pyarrow is required to read %s: %s" %
+                          (', '.join(COLUMNAR_EXTS), ex))
+    return pa
+
+
+def _is_table_(src):
+    """ Indicates 'src' is a pyarrow Table or RecordBatch. """
+    return hasattr(src, 'schema') and hasattr(src, 'column_names')
+
+
+def _column_names_(kv_args, names):
+    """
+    Column 'names' matching the 'fields' name expressions in 'kv_args', all
+    of them if not set.
+    """
+    fld_exprs = kv_args.get('fields')
+    if not fld_exprs:
+        return list(names)
+    return [fn for fn in names if any(fnmatch(fn, fe) for fe in fld_exprs)]
+
+
+def analyze_table(kv_args, table, row=0):
+    """
+    Characterize pyarrow Table or RecordBatch 'table' column by column,
+    numbering its rows from 'row'. Integer, float and decimal columns are
+    added to their Fields as arrays, and string columns are dictionary
+    encoded so each distinct string is characterized once, see
+    'Field.evaluate_strings'. Other columns are evaluated value by value.
+    Struct columns are flattened into columns named 'parent.child'. With a
+    'select' expression the table is converted to records and filtered.
+    """
+    pa = _pyarrow_()
+    if kv_args.get('select') is not None:
+        return analyze(
+            kv_args, _filter_records_(kv_args, table.to_pylist()), row)
+    if not isinstance(table, pa.Table):
+        table = pa.Table.from_batches([table])
+    while any(pa.types.is_struct(typ) for typ in table.schema.types):
+        table = table.flatten()
+    rows = np.arange(row, row + table.num_rows)
+    fcs = {}
+    for name in _column_names_(kv_args, table.column_names):
+        fld = fcs[name] = Field(name, **kv_args)
+        col = table.column(name).combine_chunks()
+        typ = col.type
+        if pa.types.is_dictionary(typ):
+            col = col.cast(typ.value_type)
+            typ = typ.value_type
+        if pa.types.is_decimal(typ):
+            col = col.cast(pa.float64())
+            typ = col.type
+        if pa.types.is_integer(typ) or pa.types.is_floating(typ):
+            valid = col.is_valid().to_numpy(zero_copy_only=False)
+            values = col.drop_null().to_numpy(zero_copy_only=False)
+            fld.evaluate_numbers(values, rows[valid], len(col) - len(values))
+        elif pa.types.is_string(typ) or pa.types.is_large_string(typ):
+            enc = col.dictionary_encode()
+            fld.evaluate_strings(
+                enc.dictionary.to_pylist(),
+                enc.indices.fill_null(-1).to_numpy(zero_copy_only=False),
+                rows)
+        else:
+            for val, rw in zip(col.to_pylist(), range(row, row + len(col))):
+                fld.evaluate(val, rw)
+    return fcs
+
+
+def _columnar_parts_(src):
+    """
+    Number of records in each part of Parquet or Arrow IPC file 'src', its
+    row groups or record batches, read from the file metadata.
+    """
+    pa = _pyarrow_()
+    if src.endswith(PARQUET_EXTS):
+        md = pa.parquet.ParquetFile(src).metadata
+        return [md.row_group(i).num_rows for i in range(md.num_row_groups)]
+    with pa.memory_map(src) as mm:
+        reader = pa.ipc.open_file(mm)
+        return [reader.get_batch(i).num_rows
+                for i in range(reader.num_record_batches)]
+
+
+def _analyze_part_(kv_args, src, part, row):
+    """
+    Characterize row group or record batch 'part' of Parquet or Arrow IPC
+    file 'src', numbering its rows from 'row'. Only the Parquet columns
+    that may match the 'fields' name expressions are read.
+    """
+    pa = _pyarrow_()
+    if src.endswith(PARQUET_EXTS):
+        pf = pa.parquet.ParquetFile(src)
+        columns = None
+        if kv_args.get('fields'):
+            schema = pf.schema_arrow
+            columns = [fn for fn in schema.names
+                       if pa.types.is_struct(schema.field(fn).type) or
+                       _column_names_(kv_args, [fn])]
+        return analyze_table(
+            kv_args, pf.read_row_group(part, columns=columns), row)
+    with pa.memory_map(src) as mm:
+        return analyze_table(
+            kv_args, pa.ipc.open_file(mm).get_batch(part), row)
+
+
+def spearman_matrix(rows, samples):
+    """
+    Spearman correlation and p value matrices for the columns of 'samples',
+    arrays of values for the record 'rows' in the same positions, as
+    scipy.stats.spearmanr computes them pairwise. Each pair of columns uses
+    the rows found in both, the first value of a row repeated in a column
+    and not NaN. The columns are aligned on all their rows and sorted once.
+    If every column has every row they are ranked together and correlated
+    with a single matrix product, else each column in turn is ranked within
+    the rows it shares with each later column, and they within its rows,
+    from counts of the shared rows along the sorted columns. Pairs with
+    fewer than 3 rows or a constant column have a NaN correlation and p
+    value.
+    """
+    k = len(samples)
+    cols = []
+    for rw, smp in zip(rows, samples):
+        rw, first = np.unique(rw, return_index=True)
+        smp = np.asarray(smp, dtype=float)[first]
+        cols.append((rw, smp))
+    union = np.unique(np.concatenate([rw for rw, _ in cols]))
+    vals = np.full((len(union), k), np.nan)
+    for j, (rw, smp) in enumerate(cols):
+        vals[np.searchsorted(union, rw), j] = smp
+    present = ~np.isnan(vals)
+    if present.all():
+        return _spearman_(vals)
+
+    # Columns as rows, sorted with NaN last, the inverse of each sort, and
+    # for columns with ties the first and last sorted positions of the run
+    # of equal values each is in.
+    vals = vals.T
+    present = present.T
+    order = np.argsort(vals, axis=1, kind='stable')
+    inv = np.empty_like(order)
+    np.put_along_axis(inv, order, np.arange(vals.shape[1]), axis=1)
+    srt = np.take_along_axis(vals, order, axis=1)
+    srt_ok = ~np.isnan(srt)
+    new = np.ones(srt.shape, dtype=bool)
+    new[:, 1:] = srt[:, 1:] != srt[:, :-1]
+    tied = ~new[:, 1:].all(axis=1) & (srt_ok.sum(axis=1) > 0)
+    pos = np.arange(vals.shape[1])
+    last = np.ones(srt.shape, dtype=bool)
+    last[:, :-1] = new[:, 1:]
+    starts = np.maximum.accumulate(np.where(new, pos, 0), axis=1)
+    ends = np.minimum.accumulate(
+        np.where(last, pos, len(pos) - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    ns = present.astype(float) @ present.T
+    cross = np.full((k, k), np.nan)
+    sq_i = np.full((k, k), np.nan)
+    sq_j = np.full((k, k), np.nan)
+    for i in range(k):
+        # Centered ranks of columns j >= i within the rows column i has.
+        shared = present[i][order[i:]] & srt_ok[i:]
+        ranks = _shared_ranks_(shared)
+        tj = np.flatnonzero(tied[i:])
+        if len(tj):
+            ranks[tj] = _shared_ranks_(
+                shared[tj], starts[i + tj], ends[i + tj])
+        r_j = np.take_along_axis(ranks, inv[i:], axis=1)
+        # Centered ranks of column i within the rows each column j >= i has.
+        shared = present[i:, order[i]] & srt_ok[i]
+        if tied[i]:
+            ranks = _shared_ranks_(shared, starts[[i]], ends[[i]])
+        else:
+            ranks = _shared_ranks_(shared)
+        r_i = ranks[:, inv[i]]
+        cross[i, i:] = cross[i:, i] = np.einsum('ju,ju->j', r_i, r_j)
+        sq_i[i, i:] = sq_j[i:, i] = np.einsum('ju,ju->j', r_i, r_i)
+        sq_j[i, i:] = sq_i[i:, i] = np.einsum('ju,ju->j', r_j, r_j)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cr = np.clip(cross / np.sqrt(sq_i * sq_j), -1, 1)
+        ts = cr * np.sqrt((ns - 2) / ((1 - cr) * (1 + cr)))
+    pv = 2 * ss.t.sf(np.abs(ts), ns - 2)
+    cr[ns < 3] = pv[ns < 3] = np.nan
+    return cr, pv
+
+
+def _shared_ranks_(shared, starts=None, ends=None):
+    """
+    Ranks of the sorted values in each row of 'shared' among those shared,
+    less their mean, and zero for the others. If there are ties 'starts'
+    and 'ends' hold the positions of the first and last of the values equal
+    to each, which have their average rank. Average ranks of n values have
+    a mean of (n + 1) / 2 whatever the ties.
+    """
+    counts = np.cumsum(shared, axis=1)
+    if starts is None:
+        ranks = counts.astype(float)
+    else:
+        before = np.take_along_axis(counts - shared, starts, axis=1)
+        upto = np.take_along_axis(counts, ends, axis=1)
+        ranks = before + (upto - before + 1) / 2
+    ranks -= (counts[:, -1:] + 1) / 2
+    ranks[~shared] = 0
+    return ranks
+
+
+def _spearman_(cols):
+    """
+    Spearman correlation and p value matrices for the columns of 'cols',
+    values for the same rows, NaN with fewer than 3 rows.
+    """
+    n, k = cols.shape
+    if n < 3:
+        return np.full((k, k), np.nan), np.full((k, k), np.nan)
+    ranks = ss.rankdata(cols, axis=0)
+    ranks -= ranks.mean(axis=0)
+    norms = np.sqrt(np.sum(ranks * ranks, axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cr = np.clip((ranks.T @ ranks) / np.outer(norms, norms), -1, 1)
+        ts = cr * np.sqrt((n - 2) / ((1 - cr) * (1 + cr)))
+    pv = 2 * ss.t.sf(np.abs(ts), n - 2)
+    return cr, pv
+
+
+def read_csv(fi):
+    """
+    Generate records as dictionaries from CSV file object 'fi', sniffing the
+    dialect from the start of the file without reading it twice.
+    """
+    sample = fi.read(4096)
+    if not len(sample):
+        return
+    sample += fi.readline()
+    dialect = csv.Sniffer().sniff(sample)
+    yield from csv.DictReader(chain(io.StringIO(sample), fi), dialect=dialect)
+
+
+def read_json(fi, chunk_size=CHUNK_SIZE):
+    """
+    Generate records from JSON file object 'fi', reading 'chunk_size'
+    characters at a time, or as many as are buffered for a value larger
+    than that, so it is decoded a number of times logarithmic in its size.
+    The JSON can be a single object, an array of objects or objects one
+    after the other, such as one per line. Malformed JSON raises as soon
+    as the buffer extends past the error.
+    """
+    decoder = json.JSONDecoder()
+    buf = fi.read(chunk_size)
+    pos = WHITESPACE.match(buf).end()
+    in_array = buf.startswith('[', pos)
+    if in_array:
+        pos += 1
+    eof = False
+    while True:
+        pos = WHITESPACE.match(buf, pos).end()
+        if in_array and buf.startswith(',', pos):
+            pos = WHITESPACE.match(buf, pos + 1).end()
+        if in_array and buf.startswith(']', pos):
+            return
+        if pos < len(buf):
+            try:
+                # Only accept a value ending before the end of the buffer,
+                # unless there is nothing more to read.
+                rec, end = decoder.raw_decode(buf, pos)
+                if end < len(buf) or eof:
+                    yield rec
+                    pos = end
+                    continue
+            except json.JSONDecodeError as ex:
+                # A value cut off by the end of the buffer fails within a
+                # token of the end, or in a string, which only ends with
+                # its closing quote.
+                if eof or (len(buf) - ex.pos > 16 and
+                           not ex.msg.startswith('Unterminated string')):
+                    raise
+        elif eof:
+            return
+        more = fi.read(max(chunk_size, len(buf) - pos))
+        eof = not len(more)
+        buf = buf[pos:] + more
+        pos = 0
+
+
+def read_range(src, start, end):
+    """
+    Generate the lines of file 'src' starting within byte range 'start' up
+    to 'end'. A line starting before 'start' belongs to the previous range,
+    so consecutive ranges generate each line exactly once.
+    """
+    with open(src, 'rb') as fi:
+        if start > 0:
+            # Skip the rest of a line started in the previous range.
+            fi.seek(start - 1)
+            fi.readline()
+        pos = fi.tell()
+        while pos < end:
+            line = fi.readline()
+            if not len(line):
+                break
+            pos += len(line)
+            yield line.decode()
+
+
+def read_range_mmap(src, start, end):
+    """
+    Generate the lines of file 'src' starting within byte range 'start' up
+    to 'end', as 'read_range', but as memoryviews of a read only memory map
+    of the file. Lines are not decoded or copied here, only by consumers
+    needing bytes, and the pages mapped are shared with the page cache and
+    other processes reading the file.
+    """
+    with open(src, 'rb') as fi:
+        size = os.fstat(fi.fileno()).st_size
+        if not size:
+            return
+        # Views of the map may outlive this generator, so the map is closed
+        # when it is no longer referenced rather than here.
+        mm = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+    mv = memoryview(mm)
+    pos = start
+    if start > 0:
+        # Skip the rest of a line started in the previous range.
+        nl = mm.find(b'\n', start - 1)
+        pos = size if nl < 0 else nl + 1
+    while pos < end and pos < size:
+        nl = mm.find(b'\n', pos)
+        nx = size if nl < 0 else nl + 1
+        yield mv[pos:nx]
+        pos = nx
+
+
+def read_records(src, chunk_size=CHUNK_SIZE):
+    """
+    Generate records from file name 'src', JSON if it ends with .json,
+    .jsonl or .ndjson, otherwise CSV, without reading it all into memory.
+    """
+    with open(src) as fi:
+        if src.endswith(('.json',) + JSON_LINES_EXTS):
+            yield from read_json(fi, chunk_size)
+        else:
+            yield from read_csv(fi)
 
 
 class FieldChars:
@@ -329,109 +1291,318 @@ class FieldChars:
     JSON string of CSV file.
     """
 
-    def __init__(self, src, fields):
+    def __init__(self, src, fields, offset=None, fieldnames=None, fmt=None,
+                 stats=None):
+        """
+        Create FieldChars for source 'src' with 'fields' by name. For files
+        read by byte range 'offset' is the end of the bytes analyzed, and
+        'fieldnames' and 'fmt' the CSV header and format, for resuming.
+        'stats' describes the work done, see 'get_stats'.
+        """
         self.__source = src
         self.__fields = fields
+        self.__offset = offset
+        self.__fieldnames = fieldnames
+        self.__fmt = fmt
+        self.__stats = stats
 
     @staticmethod
     def evaluate(src, **kv_args):
+        """
+        Characterize records from 'src', a list of records, a CSV or JSON
+        file name or a JSON string. Parquet and Arrow IPC files and pyarrow
+        Tables are characterized by column, see 'evaluate_columnar'. If the
+        'stream' key word argument is set
+        then records are analyzed as they are read, see 'evaluate_stream'.
+        Large CSV and NDJSON files, or any such file if the 'mmap' key word
+        argument is set, are read and analyzed in parallel by byte range, see
+        'evaluate_ranges', unless CSV fields contain line breaks, when they
+        are streamed instead. Otherwise the first SAMPLE_RECORDS are analyzed
+        and timed to plan the number of processes, up to the 'procs' key
+        word argument, and the records per chunk given to each.
+        """
+        if _is_table_(src) or \
+                isinstance(src, str) and src.endswith(COLUMNAR_EXTS):
+            return FieldChars.evaluate_columnar(src, **kv_args)
+        if kv_args.get('stream'):
+            return FieldChars.evaluate_stream(src, **kv_args)
+        if isinstance(src, str) and os.path.isfile(src) and \
+                not src.endswith('.json') and (
+                    kv_args.get('mmap') or
+                    os.path.getsize(src) >= MULTI_PROC_BYTES):
+            try:
+                return FieldChars.evaluate_ranges(src, **kv_args)
+            except LineBreakError:
+                # Records span lines, so must be read in order.
+                return FieldChars.evaluate_stream(src, **kv_args)
         records = []
         if isinstance(src, (list, tuple)):
             records = src
         elif isinstance(src, str):
             if os.path.exists(src):
-                if src.endswith('.json'):
-                    with open(src) as fi:
-                        records = json.load(fi)
-                else:
-                    sniffer = csv.Sniffer()
-                    with open(src) as fi:
-                        sample = fi.read(4096)
-                    with open(src) as fi:
-                        dialect = sniffer.sniff(sample)
-                        for rec in csv.DictReader(fi, dialect=dialect):
-                            records.append(rec)
+                records = list(read_records(
+                    src, kv_args.get('chunk_size', CHUNK_SIZE)))
             else:
                 try:
                     records = json.loads(src)
                 except Exception as ex:
                     raise ValueError("failed to parse %s: %s" % (src[:40], ex))
-
+        if kv_args.get('select') is not None or kv_args.get('fields'):
+            records = list(_filter_records_(kv_args, records))
         if not len(records):
             raise ValueError("No data to evaluate.")
-        if 'select' in kv_args and kv_args['select'] is not None:
-            sel_fn = eval(kv_args['select'])
-            records = [rec for rec in records if sel_fn(rec)]
-        if 'fields' in kv_args and kv_args['fields'] is not None:
-            if len(kv_args['fields']):
-                fld_names = set()
-                for fn in records[0]:
-                    for fe in kv_args['fields']:
-                        if fnmatch(fn, fe):
-                            fld_names.add(fn)
-                sel_recs = []
-                for rec in records:
-                    sel_recs.append(
-                        {fn: fv for fn, fv in rec.items() if fn in fld_names})
-                records = sel_recs
 
-        if len(records) * len(records[0]) < MULTI_PROC_H:
-            fcs = {fn: fld for fn, fld in analyze(kv_args, records).items()}
-            return FieldChars(src, fcs)
+        # Time a sample of records to plan the processes and chunks.
+        sample_n = min(len(records), SAMPLE_RECORDS)
+        with Timer() as sample_tm:
+            fcs = analyze(kv_args, records[:sample_n])
+        procs_n, chunk_n = _plan_procs_(len(records) - sample_n,
+                                        sample_tm.secs / sample_n,
+                                        _proc_count_(kv_args))
+        with Timer() as tm:
+            if procs_n == 1:
+                _merge_fields_(kv_args, fcs, analyze(
+                    kv_args, records[sample_n:], sample_n))
+            else:
+                tasks = ((kv_args, records[i:i + chunk_n], i)
+                         for i in range(sample_n, len(records), chunk_n))
+                _merge_fields_(kv_args, fcs, _run_procs_(
+                    kv_args, analyze, tasks, procs_n))
+        return FieldChars(src, fcs, stats=dict(
+            units='records', n=len(records), secs=sample_tm.secs + tm.secs,
+            procs=procs_n, chunk_n=chunk_n))
 
+    @staticmethod
+    def evaluate_columnar(src, **kv_args):
+        """
+        Characterize a Parquet or Arrow IPC file name 'src', or a pyarrow
+        Table or RecordBatch, column by column without building records,
+        see 'analyze_table'. Files are read by row group or record batch in
+        parallel, with each process reading its own parts of the file. The
+        first part is analyzed in this process and timed to plan the number
+        of processes, up to the 'procs' key word argument. Requires pyarrow.
+        """
+        procs_n = 1
+        if _is_table_(src):
+            parts = [src.num_rows]
+            with Timer() as tm:
+                fcs = analyze_table(kv_args, src)
+            secs = tm.secs
+        else:
+            parts = _columnar_parts_(src)
+            if not len(parts):
+                raise ValueError("No data to evaluate.")
+            rows = np.cumsum([0] + parts)
+            with Timer() as sample_tm:
+                fcs = _analyze_part_(kv_args, src, 0, 0)
+            if len(parts) > 1:
+                procs_n, _ = _plan_procs_(len(parts) - 1, sample_tm.secs,
+                                          _proc_count_(kv_args))
+            tasks = ((kv_args, src, i, int(rows[i]))
+                     for i in range(1, len(parts)))
+            with Timer() as tm:
+                if procs_n == 1:
+                    for task in tasks:
+                        _merge_fields_(kv_args, fcs, _analyze_part_(*task))
+                else:
+                    _merge_fields_(kv_args, fcs, _run_procs_(
+                        kv_args, _analyze_part_, tasks, procs_n))
+            secs = sample_tm.secs + tm.secs
+        if not sum(parts) or not len(fcs):
+            raise ValueError("No data to evaluate.")
+        return FieldChars(src, fcs, stats=dict(
+            units='records', n=sum(parts), secs=secs, procs=procs_n,
+            chunk_n=-(-sum(parts) // len(parts))))
+
+    @staticmethod
+    def evaluate_ranges(src, start=0, end=None, fieldnames=None, fmt=None,
+                        **kv_args):
+        """
+        Characterize records from CSV or NDJSON file name 'src' in parallel,
+        with each process reading and analyzing its own byte range of the
+        file, aligned to line boundaries. Only the Field summaries are
+        returned from the processes. Records must be one per line, so CSV
+        fields must not contain line breaks, and LineBreakError, a
+        ValueError, is raised if they do. Bytes from 'start' up to 'end'
+        (default the whole file) are analyzed, and CSV 'fieldnames' and
+        'fmt' are sniffed from the start of the file if not given. The first
+        range of SAMPLE_BYTES, or key word argument 'range_size' if set, is
+        analyzed in this process and timed to plan the number of processes,
+        up to key word argument 'procs', and the bytes per range if
+        'range_size' is not set. If 'mmap' is set the ranges are read from a
+        memory map of the file, see 'read_range_mmap', and CSV values are
+        characterized as bytes.
+        """
+        with open(src, 'rb') as fi:
+            if fieldnames is None and not src.endswith(JSON_LINES_EXTS):
+                sample = fi.read(4096)
+                sample += fi.readline()
+                text = sample.decode()
+                fmt = _csv_fmt_(csv.Sniffer().sniff(text))
+                fieldnames = next(csv.reader(io.StringIO(text), **fmt))
+                fi.seek(0)
+                fi.readline()
+            data_st = max(start, fi.tell())
+        end = os.path.getsize(src) if end is None else end
+        if data_st >= end:
+            raise ValueError("No data to evaluate.")
+        # Time a sample range to plan the processes and range sizes.
+        sample_end = min(
+            end, data_st + kv_args.get('range_size', SAMPLE_BYTES))
+        with Timer() as sample_tm:
+            fcs = _analyze_range_(
+                kv_args, src, data_st, sample_end, fieldnames, fmt)
+        procs_n, range_size = _plan_procs_(
+            end - sample_end, sample_tm.secs / (sample_end - data_st),
+            _proc_count_(kv_args))
+        range_size = kv_args.get('range_size', range_size)
+        tasks = ((kv_args, src, st, min(st + range_size, end), fieldnames, fmt)
+                 for st in range(sample_end, end, range_size))
+        with Timer() as tm:
+            if procs_n == 1:
+                for task in tasks:
+                    _merge_fields_(kv_args, fcs, _analyze_range_(*task))
+            else:
+                _merge_fields_(kv_args, fcs, _run_procs_(
+                    kv_args, _analyze_range_, tasks, procs_n))
+        if not len(fcs):
+            raise ValueError("No data to evaluate.")
+        return FieldChars(src, fcs, end, fieldnames, fmt, stats=dict(
+            units='bytes', n=end - data_st, secs=sample_tm.secs + tm.secs,
+            procs=procs_n, chunk_n=range_size))
+
+    @staticmethod
+    def evaluate_resume(src, state_fn, **kv_args):
+        """
+        Characterize CSV or NDJSON file name 'src', which is only appended
+        to, resuming from the state saved by a previous run in file
+        'state_fn' if it exists, see 'load'. Only the complete lines added
+        since the offset saved are analyzed, by byte range as in
+        'evaluate_ranges', and merged into the saved Fields. The new state
+        is saved to 'state_fn'. JSON array, Parquet and Arrow IPC files
+        cannot be resumed, and ValueError is raised for them.
+        """
+        if src.endswith(('.json',) + COLUMNAR_EXTS):
+            raise ValueError("Only CSV and NDJSON files can be resumed, "
+                             "not %s." % src)
         fcs = {}
-        procs_n = cpu_count() // 2 + 1
-        chunk_n = int(sqrt(len(records) / sqrt(procs_n)))
-        with cf.ProcessPoolExecutor(max_workers=procs_n) as executor:
-            futures = set()
-            for i in range(0, len(records), chunk_n):
-                ft = executor.submit(analyze, kv_args, records[i:i + chunk_n])
-                futures.add(ft)
-            try:
-                for ft in cf.as_completed(futures):
-                    if ft.exception() is not None:
-                        raise ft.exception()
-                    fc = ft.result()
-                    for fn, fld in fc.items():
-                        if fn is not None:
-                            try:
-                                fcs[fn].evaluate(fld)
-                            except KeyError:
-                                fcs[fn] = Field(fn)
-                                fcs[fn].evaluate(fld)
-            except KeyboardInterrupt:
-                print('Terminating...')
-                sys.exit(1)
+        start = 0
+        fieldnames = fmt = None
+        if os.path.exists(state_fn):
+            prev = FieldChars.load(state_fn)
+            fcs = prev.__fields
+            start = prev.__offset
+            fieldnames = prev.__fieldnames
+            fmt = prev.__fmt
+        if os.path.getsize(src) < start:
+            raise ValueError("%s is shorter than when last evaluated." % src)
+        end = _complete_size_(src)
+        if end > start:
+            fc = FieldChars.evaluate_ranges(
+                src, start, end, fieldnames, fmt, **kv_args)
+            _merge_fields_(kv_args, fcs, fc.__fields)
+            fieldnames = fc.__fieldnames
+            fmt = fc.__fmt
+        fc = FieldChars(src, fcs, max(start, end), fieldnames, fmt)
+        fc.save(state_fn)
+        return fc
+
+    @staticmethod
+    def evaluate_stream(src, **kv_args):
+        """
+        Characterize records from 'src', a CSV or JSON file name or any
+        iterable of records, analyzing each record as it is read. Files are
+        read 'chunk_size' characters at a time, so memory is bounded by the
+        Field summaries rather than the size of the input.
+        """
+        if isinstance(src, str):
+            records = read_records(src, kv_args.get('chunk_size', CHUNK_SIZE))
+        else:
+            records = src
+        fcs = analyze(kv_args, _filter_records_(kv_args, records))
+        if not len(fcs):
+            raise ValueError("No data to evaluate.")
         return FieldChars(src, fcs)
 
+    def correlations(self, max_pv=.01):
+        """
+        Spearman correlations between the numeric fields with p values below
+        'max_pv', strongest first, each pair over the rows sampled in both
+        fields, see 'spearman_matrix'.
+        """
+        num_flds = [fld for _, fld in sorted(self.__fields.items())
+                    if fld.is_numeric()]
+        if len(num_flds) < 2:
+            return []
+        cr, pv = spearman_matrix(
+            [fld.get_rows() for fld in num_flds],
+            [fld.get_samples() for fld in num_flds])
+        cr_recs = []
+        for i in range(len(num_flds) - 1):
+            for j in range(i + 1, len(num_flds)):
+                if pv[i, j] < max_pv:
+                    cr_recs.append(dict(x=num_flds[i].get_name(),
+                                        y=num_flds[j].get_name(),
+                                        cr=cr[i, j],
+                                        pv=pv[i, j]))
+        return sorted(cr_recs, key=lambda cr: abs(cr['cr']), reverse=True)
+
     def get_fields(self):
         return self.__fields
 
+    def get_stats(self):
+        """
+        Throughput of the evaluation, if timed, with the 'n' units of work,
+        records or bytes, the seconds taken and the rate per second, the
+        number of processes and units of work per task.
+        """
+        if self.__stats is None:
+            return None
+        stats = dict(self.__stats)
+        stats['rate'] = stats['n'] / stats['secs'] if stats['secs'] else 0
+        return stats
+
+    def get_offset(self):
+        """ End of the bytes analyzed in the source file, if read by range. """
+        return self.__offset
+
+    @staticmethod
+    def load(fn):
+        """
+        FieldChars restored from file 'fn' written by 'save'. The file is
+        unpickled, so only load files from trusted sources.
+        """
+        with gzip.open(fn, 'rb') as fi:
+            state = pickle.load(fi)
+        if state.get('version') != STATE_VERSION:
+            raise ValueError("Unsupported state version in %s." % fn)
+        return FieldChars.from_dict(state)
+
+    def save(self, fn):
+        """
+        Save the state of these FieldChars, with the offset to resume from,
+        to file 'fn' as a compressed pickle of 'to_dict', see 'load'.
+        """
+        state = self.to_dict()
+        state['version'] = STATE_VERSION
+        tmp_fn = fn + '.tmp'
+        with gzip.open(tmp_fn, 'wb') as fo:
+            pickle.dump(state, fo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_fn, fn)
+
     def report(self, max_show=100, corr=False):
         so = io.StringIO()
         for name in sorted(self.__fields):
             print(self.__fields[name], file=so)
         if corr:
-            num_flds = [fld for fld in self.__fields.values()
-                        if fld.is_numeric()]
-            max_len = max([len(fld.get_name()) for fld in num_flds])
-            if len(num_flds):
+            cr_recs = self.correlations()
+            if len(cr_recs):
+                max_len = max([max(len(cr_rec['x']), len(cr_rec['y']))
+                               for cr_rec in cr_recs])
                 print("\n%s %s %8s %8s" %
                       ('x'.ljust(max_len), 'y'.ljust(max_len), 'cr', 'pv'),
                       file=so)
-                cr_recs = []
-                for i in range(len(num_flds) - 1):
-                    for j in range(i + 1, len(num_flds)):
-                        cr, pv = ss.spearmanr(
-                            num_flds[i].get_data(), num_flds[j].get_data())
-                        if pv < .01:
-                            cr_recs.append(dict(x=num_flds[i].get_name(),
-                                                y=num_flds[j].get_name(),
-                                                cr=cr,
-                                                pv=pv))
-                for cr_rec in sorted(cr_recs,
-                                     key=lambda cr: abs(cr['cr']),
-                                     reverse=True):
+                for cr_rec in cr_recs:
                     print("%s %s %8.4f %8.4f" %
                           (cr_rec['x'].ljust(max_len),
                            cr_rec['y'].ljust(max_len),
@@ -440,9 +1611,22 @@ class FieldChars:
                           file=so)
         return so.getvalue()
 
+    @staticmethod
+    def from_dict(state):
+        """ FieldChars restored from its 'to_dict' 'state'. """
+        fields = [Field.from_dict(fld) for fld in state['fields']]
+        return FieldChars(state['source'],
+                          {fld.get_name(): fld for fld in fields},
+                          state.get('offset'),
+                          state.get('fieldnames'),
+                          state.get('fmt'))
+
     def to_dict(self):
         return dict(source=self.__source,
-                    fields=[fld.to_dict() for fld in self.__fields])
+                    offset=self.__offset,
+                    fieldnames=self.__fieldnames,
+                    fmt=self.__fmt,
+                    fields=[fld.to_dict() for fld in self.__fields.values()])
 
 
 if __name__ == '__main__':
@@ -451,7 +1635,7 @@ if __name__ == '__main__':
                             formatter_class=ArgumentDefaultsHelpFormatter)
     parser.add_argument(
         'file',
-        help="CSV file to analyze.")
+        help="CSV, JSON, Parquet or Arrow IPC file to analyze.")
     parser.add_argument(
         '--fields',
         nargs='+',
@@ -483,15 +1667,33 @@ if __name__ == '__main__':
         type=int,
         default=MAX_SHOW,
         help="Maximum size string field to collect.")
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help="Read the file from a memory map, by byte range in parallel.")
     parser.add_argument(
         '--procs',
         type=int,
-        default=5,
-        help="Number of processes to run.")
+        help="Maximum number of processes to run, default available cores.")
     parser.add_argument(
         '--select',
         help="Lambda expression for selecting rows.")
+    parser.add_argument(
+        '--state',
+        help="File to resume from and save state to, for appended files.")
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="Analyze records as they are read, in bounded memory.")
     args = parser.parse_args()
 
-    fc = FieldChars.evaluate(args.file, **vars(args))
+    if args.state:
+        fc = FieldChars.evaluate_resume(args.file, args.state, **vars(args))
+    else:
+        fc = FieldChars.evaluate(args.file, **vars(args))
     print(fc.report(args.max_show, args.corr))
+    stats = fc.get_stats()
+    if stats is not None:
+        print("%d %s in %.2f secs, %.0f %s/sec with %d processes" %
+              (stats['n'], stats['units'], stats['secs'], stats['rate'],
+               stats['units'], stats['procs']), file=sys.stderr)
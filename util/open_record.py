@@ -2,14 +2,132 @@
 OpenRecord is a mutable ordered dictionary with methods for attributes.
 """
 from collections import OrderedDict
+from collections.abc import ItemsView, ValuesView
+from contextlib import contextmanager
 from copy import deepcopy
 import csv
 import io
+from itertools import chain, islice
 import json
 import sys
 import types
-from util.text_fmt import to_text_cols, to_text_rows
-from util.util_tools import to_safe_json, to_snake_name, to_str
+from util.text_fmt import SAMPLE_ROWS, to_text_cols, to_text_rows, \
+    write_text_rows
+from util.util_tools import (
+    NDJSON_CHUNK,
+    to_json,
+    to_ndjson,
+    to_snake_name,
+    to_str
+)
+
+_SCALARS = {bool, float, int, str, type(None)}
+SNIFF_SIZE = 1 << 16
+
+
+@contextmanager
+def _open_text_(src):
+    """
+    Text file for 'src', a file handler, a file name opened and closed
+    after use, or else the text itself.
+    """
+    if hasattr(src, 'read'):
+        yield src
+        return
+    try:
+        fi = open(src)
+    except (OSError, ValueError):
+        yield io.StringIO(src)
+        return
+    with fi:
+        yield fi
+
+
+@contextmanager
+def _csv_rows_(src, sniff_size):
+    """
+    Field names and rows of CSV 'src', see '_open_text_', read a row at a
+    time. The dialect and whether the first row is a header are sniffed
+    from the first 'sniff_size' characters, extended to the end of a line.
+    Without a header fields are named fld_01, fld_02 and so on. A blank
+    'src' has no names or rows.
+    """
+    with _open_text_(src) as fi:
+        prefix = fi.read(sniff_size)
+        prefix += fi.readline()
+        if not len(prefix.strip()):
+            yield [], iter(())
+            return
+        sniffer = csv.Sniffer()
+        reader = csv.reader(chain(io.StringIO(prefix), fi),
+                            dialect=sniffer.sniff(prefix))
+        row = next(reader)
+        if sniffer.has_header(prefix):
+            yield [to_snake_name(fn) for fn in row], reader
+        else:
+            yield (['fld_%02d' % (i + 1) for i in range(len(row))],
+                   chain([row], reader))
+
+
+def _batches_(records, batch_size):
+    """
+    Generate 'records', or lists of up to 'batch_size' of them if set.
+    """
+    if not batch_size:
+        yield from records
+        return
+    records = iter(records)
+    batch = list(islice(records, batch_size))
+    while len(batch):
+        yield batch
+        batch = list(islice(records, batch_size))
+
+
+def _sorted_(x):
+    """
+    Sorted list of 'x', by representation if the values cannot be ordered.
+    """
+    try:
+        return sorted(x)
+    except TypeError:
+        return sorted(x, key=repr)
+
+
+def _struct_(x):
+    """
+    Hashable structure of 'x' compared for records, with dictionaries as
+    tuples of their items sorted, see '_sorted_', lists and
+    tuples as tuples and sets as frozensets. Nested values are not converted,
+    as a LazyRecord would, and nested records use their own, possibly
+    cached, keys.
+    """
+    if type(x) in _SCALARS:
+        return x
+    if isinstance(x, OpenRecord):
+        return x._key()
+    if isinstance(x, dict):
+        return tuple((k, _struct_(v)) for k, v in _sorted_(dict.items(x)))
+    if isinstance(x, (list, tuple)):
+        return tuple(_struct_(v) for v in x)
+    if isinstance(x, (set, frozenset)):
+        return frozenset(x)
+    if isinstance(x, types.MethodType):
+        return x.__func__
+    return x
+
+
+def _freeze_(x):
+    """
+    Immutable copy of 'x', with dictionaries as FrozenRecords, lists and
+    tuples as tuples and sets as frozensets.
+    """
+    if isinstance(x, dict):
+        return x if isinstance(x, FrozenRecord) else FrozenRecord(x)
+    if isinstance(x, (list, tuple)):
+        return tuple(_freeze_(v) for v in x)
+    if isinstance(x, set):
+        return frozenset(x)
+    return x
 
 
 class OpenRecord(OrderedDict):
@@ -18,18 +136,22 @@ class OpenRecord(OrderedDict):
     accessed as properties in addition to the dictionary style access.
     """
 
+    _convert = True
+
     def __init__(self, *args, **kwargs):
         """ Create an record with the same types of parameters
             accepted by OrderedDict. Any embedded dictionaries or lists
-            of dictionaries will also be converted into OpenRecord's."""
+            of dictionaries will also be converted into OpenRecord's,
+            unless the record is lazy, see LazyRecord."""
         super(OpenRecord, self).__init__(*args, **kwargs)
-        for key, val in self.items():
-            if isinstance(val, dict):
-                self[key] = OpenRecord(val)
-            elif isinstance(val, (list, tuple)):
-                for i in range(len(val)):
-                    if isinstance(val[i], dict):
-                        val[i] = OpenRecord(val[i])
+        if self._convert:
+            for key, val in self.items():
+                if isinstance(val, dict):
+                    self[key] = OpenRecord(val)
+                elif isinstance(val, (list, tuple)):
+                    for i in range(len(val)):
+                        if isinstance(val[i], dict):
+                            val[i] = OpenRecord(val[i])
         self.__key_fields = []
         self._initialized = True
 
@@ -43,14 +165,35 @@ class OpenRecord(OrderedDict):
 
     def __cmp(self, other):
         """ Compare 'self' to 'other' returning -1 if self is less than other,
-            1 if self greater than other, 0 if equal. """
+            1 if self greater than other, 0 if equal. Records are compared
+            by their structural keys, or the representations of their keys
+            if the values cannot be ordered. """
         rslt = 0
         if isinstance(other, OpenRecord):
-            k0 = repr(self)
-            k1 = repr(other)
-            rslt = -1 if k0 < k1 else 1 if k0 > k1 else 0
+            k0 = self._key()
+            k1 = other._key()
+            if k0 == k1:
+                return 0
+            try:
+                rslt = -1 if k0 < k1 else 1
+            except TypeError:
+                rslt = -1 if repr(k0) < repr(k1) else 1
         return rslt
 
+    def _key(self):
+        """
+        Structural key of the record, the key fields, if given, or all fields
+        with their values, sorted by name, or by representation if the names
+        cannot be ordered. The key is computed when needed, as the record
+        may have changed, except for a FrozenRecord, which caches it.
+        """
+        if len(self.__key_fields):
+            items = [(fn, dict.get(self, fn)) for fn in self.__key_fields]
+        else:
+            items = _sorted_(dict.items(self))
+        return tuple([(fn, fv if type(fv) in _SCALARS else _struct_(fv))
+                      for fn, fv in items])
+
     def copy(self):
         """ Copy the record. """
         return deepcopy(self)
@@ -70,22 +213,27 @@ class OpenRecord(OrderedDict):
             raise AttributeError(name)
 
     def __hash__(self):
-        """ Produce a hash code for use in sets and dictionaries. """
-        return hash(repr(self))
+        """ Produce a hash code for use in sets and dictionaries, from the
+            structural key, or the representation if a value is not
+            hashable. """
+        try:
+            return hash(self._key())
+        except TypeError:
+            return hash(repr(self))
 
     def __repr__(self):
         """ Flattened representation of key fields if given or all fields. """
         def to_repr(x):
             if isinstance(x, dict):
-                vals = ["%s=%s" % (k, to_repr(x[k])) for k in sorted(x)]
+                vals = ["%s=%s" % (k, to_repr(x[k])) for k in _sorted_(x)]
                 return "{%s}" % ','.join(vals)
             elif isinstance(x, (list, tuple)):
-                vals = [to_repr(v) for v in sorted(x)]
+                vals = [to_repr(v) for v in _sorted_(x)]
                 return "[%s]" % ','.join(vals)
             else:
                 return str(x)
         if len(self.__key_fields):
-            obj = self.select(*self.__key_fields)
+            obj = self.select(self.__key_fields)
         else:
             obj = self
         return to_repr(obj)
@@ -93,7 +241,7 @@ class OpenRecord(OrderedDict):
     def __setattr__(self, name, value):
         """ Set attribute by name, creating it if non-existant. """
         if hasattr(self, '_initialized'):
-            super(OpenRecord, self).__setitem__(name, value)
+            self[name] = value
         else:
             super(OpenRecord, self).__setattr__(name, value)
 
@@ -101,6 +249,12 @@ class OpenRecord(OrderedDict):
         """ Return string report of the record. """
         return OpenRecord.to_text_cols(self)
 
+    def freeze(self):
+        """ Immutable FrozenRecord copy of the record, with its key fields. """
+        rec = FrozenRecord(self)
+        OpenRecord.add_key(rec, *self.__key_fields)
+        return rec
+
     def select(self, fields, exclude=False):
         """ Produce a new record with only 'fields' selected if 'exclude'
             is False or ony fields not in 'fields' if 'exclude' is True. """
@@ -112,73 +266,105 @@ class OpenRecord(OrderedDict):
                 [(k, v) for k, v in self.items() if k not in fields])
 
     def to_json(self):
-        """ Generate unformatted JSON from the record. """
-        return json.dumps(to_safe_json(self))
+        """ Generate unformatted JSON from the record, see util_tools. """
+        return to_json(self)
 
     def to_pretty_json(self):
         """ Generate formatted JSON from the record. """
-        return json.dumps(to_safe_json(self), indent=4)
+        return to_json(self, indent=4)
 
     @staticmethod
     def from_cursor(src):
         """ Create records from DBI cursor 'src'. """
-        records = []
-        names = [to_snake_name(x[0]) for x in src.description]
-        for row in src:
-            records.append(OpenRecord(zip(names, row)))
-        return records
+        return list(OpenRecord.iter_cursor(src))
 
     @staticmethod
     def from_csv(src):
-        """ Create records from CSV 'src', a file handler or string. """
-        recs = []
-        if hasattr(src, 'fileno'):
-            src = src.read()
-        else:
-            try:
-                with open(src) as fi:
-                    src = fi.read()
-            except OSError:
-                pass
-        sniffer = csv.Sniffer()
-        dialect = sniffer.sniff(src)
-        reader = csv.reader(io.StringIO(src), dialect=dialect)
-        names = []
-        for row in reader:
-            if not len(names):
-                if sniffer.has_header(src):
-                    names = [to_snake_name(fn) for fn in row]
-                else:
-                    names = ['fld_%02d' % (i + 1) for i in range(len(row))]
-            else:
-                recs.append(OpenRecord(zip(names, row)))
-        return recs
+        """
+        Create records from CSV 'src', a file handler, file name or string,
+        see 'iter_csv'.
+        """
+        return list(OpenRecord.iter_csv(src))
 
     @staticmethod
-    def from_json(src):
+    def from_json(src, lazy=False):
         """
         Create records from JSON 'src', which can be a file or string. The JSON
         can be a single object, list of objects or a separate JSON per line.
+        If 'lazy' nested objects are only converted when accessed, see
+        LazyRecord.
         """
+        rec_cls = LazyRecord if lazy else OpenRecord
         if hasattr(src, 'fileno'):
             src = src.read()
         try:
             # Try source as a complete JSON document.
             src_recs = json.loads(src)
             if isinstance(src_recs, (list, tuple)):
-                return [OpenRecord(rec) for rec in src_recs]
-            return OpenRecord(src_recs)
+                return [rec_cls(rec) for rec in src_recs]
+            return rec_cls(src_recs)
         except json.decoder.JSONDecodeError:
             # Try source as each line being a JSON document.
-            for line in io.StringIO(src):
-                src_recs = json.loads(line.strip())
-                if isinstance(src_recs, (list, tuple)):
-                    return [OpenRecord(rec) for rec in src_recs]
-                return OpenRecord(src_recs)
+            return list(OpenRecord.iter_ndjson(io.StringIO(src), lazy=lazy))
         except TypeError:
-            return [OpenRecord.from_json(x) for x in src]
+            return [OpenRecord.from_json(x, lazy) for x in src]
         return None
 
+    @staticmethod
+    def iter_csv(src, batch_size=None, sniff_size=SNIFF_SIZE):
+        """
+        Generate records from CSV 'src', a file handler, file name or
+        string, reading a row at a time. The dialect and whether the first
+        row is a header are sniffed from the first 'sniff_size' characters,
+        extended to the end of a line. Without a header fields are named
+        fld_01, fld_02 and so on. If 'batch_size' is set, lists of up to
+        that many records are generated instead.
+        """
+        with _csv_rows_(src, sniff_size) as (names, rows):
+            yield from _batches_(
+                (OpenRecord(zip(names, row)) for row in rows), batch_size)
+
+    @staticmethod
+    def iter_cursor(src, batch_size=None):
+        """
+        Generate records from DBI cursor 'src', a row at a time. If
+        'batch_size' is set, lists of up to that many records are generated
+        instead, fetched with 'fetchmany' if the cursor has it.
+        """
+        names = [to_snake_name(x[0]) for x in src.description]
+        if batch_size and hasattr(src, 'fetchmany'):
+            rows = src.fetchmany(batch_size)
+            while len(rows):
+                yield [OpenRecord(zip(names, row)) for row in rows]
+                rows = src.fetchmany(batch_size)
+        else:
+            yield from _batches_(
+                (OpenRecord(zip(names, row)) for row in src), batch_size)
+
+    @staticmethod
+    def iter_ndjson(src, batch_size=None, lazy=False):
+        """
+        Generate records from newline delimited JSON 'src', a file handler,
+        file name or string, reading a line at a time. Lines holding a list
+        generate a record for each object in it and blank lines are skipped.
+        If 'lazy' nested objects are only converted when accessed, see
+        LazyRecord. If 'batch_size' is set, lists of up to that many records
+        are generated instead.
+        """
+        rec_cls = LazyRecord if lazy else OpenRecord
+
+        def records(fi):
+            for line in fi:
+                if len(line.strip()):
+                    src_recs = json.loads(line)
+                    if isinstance(src_recs, (list, tuple)):
+                        yield from (rec_cls(rec) for rec in src_recs)
+                    else:
+                        yield rec_cls(src_recs)
+
+        with _open_text_(src) as fi:
+            yield from _batches_(records(fi), batch_size)
+
     @staticmethod
     def normalize(records, default_value=None):
         """ Ensure that all 'records' have the same superset of fields. """
@@ -205,6 +391,14 @@ class OpenRecord(OrderedDict):
             for rec in records:
                 wrt.writerow([to_str(x) for x in rec.values()])
 
+    @staticmethod
+    def to_ndjson(records, fo=sys.stdout, chunk_size=NDJSON_CHUNK):
+        """
+        Write 'records' to 'fo' as newline delimited JSON, 'chunk_size'
+        lines at a time. Returns the number of records written.
+        """
+        return to_ndjson(records, fo, chunk_size)
+
     @staticmethod
     def to_text_cols(records, digits=3, max_len=80, indent=0):
         """
@@ -225,3 +419,105 @@ class OpenRecord(OrderedDict):
         specified number of spaces.
         """
         return to_text_rows(records, digits, max_len, indent)
+
+    @staticmethod
+    def write_text_rows(records, fo=sys.stdout, digits=3, max_len=80,
+                        indent=0, sample_n=SAMPLE_ROWS, widths=None):
+        """
+        Write 'records' to 'fo' as evenly spaced text rows in batches of
+        'sample_n' records, with column widths from 'widths' or the first
+        batch, see 'text_fmt.write_text_rows'.
+        """
+        return write_text_rows(records, fo, digits, max_len, indent,
+                               sample_n, widths)
+
+
+class LazyRecord(OpenRecord):
+    """
+    An OpenRecord that converts embedded dictionaries, and the dictionaries
+    in embedded lists, into LazyRecords when they are first accessed rather
+    than when the record is created. Converted values replace the originals
+    in the record, so each is converted once and only the parts of a large
+    document that are used are converted, one level at a time.
+    """
+    _convert = False
+
+    def __init__(self, *args, **kwargs):
+        """ Create a record as an OpenRecord is created. """
+        self.__converted = set()
+        super(LazyRecord, self).__init__(*args, **kwargs)
+
+    def __getitem__(self, key):
+        """ Value of field 'key', converted on first access. """
+        val = super(LazyRecord, self).__getitem__(key)
+        if key not in self.__converted:
+            if isinstance(val, dict) and not isinstance(val, OpenRecord):
+                val = LazyRecord(val)
+            elif isinstance(val, (list, tuple)):
+                val = type(val)(
+                    LazyRecord(x)
+                    if isinstance(x, dict) and not isinstance(x, OpenRecord)
+                    else x for x in val)
+            super(LazyRecord, self).__setitem__(key, val)
+            self.__converted.add(key)
+        return val
+
+    def __setitem__(self, key, value):
+        """ Set field 'key' to 'value', to be converted when accessed. """
+        self.__converted.discard(key)
+        super(LazyRecord, self).__setitem__(key, value)
+
+    def get(self, key, default=None):
+        """ Value of field 'key' if in the record, else 'default'. """
+        return self[key] if key in self else default
+
+    def items(self):
+        """ Fields and their values, converted as they are accessed. """
+        return ItemsView(self)
+
+    def values(self):
+        """ Values of the fields, converted as they are accessed. """
+        return ValuesView(self)
+
+
+class FrozenRecord(OpenRecord):
+    """
+    An immutable OpenRecord for use as a dictionary key or set member.
+    Embedded dictionaries are frozen and lists become tuples, so the
+    structural key compared and hashed is computed once and cached. The key
+    fields are those of the record frozen, see 'OpenRecord.freeze', and
+    cannot be added to, as that would change the hash.
+    """
+    _convert = False
+    __key = None
+
+    def __init__(self, *args, **kwargs):
+        """ Create a record as an OpenRecord is created, frozen. """
+        super(FrozenRecord, self).__init__(
+            [(k, _freeze_(v)) for k, v in
+             OrderedDict(*args, **kwargs).items()])
+
+    def __frozen(self, *args, **kwargs):
+        raise TypeError("FrozenRecord cannot be changed.")
+
+    def _key(self):
+        """ Structural key of the record, see 'OpenRecord._key', cached. """
+        if self.__key is None:
+            OrderedDict.__setattr__(
+                self, '_FrozenRecord__key', super(FrozenRecord, self)._key())
+        return self.__key
+
+    def __reduce__(self):
+        return FrozenRecord, (list(self.items()),), dict(vars(self))
+
+    def __setitem__(self, key, value):
+        if hasattr(self, '_initialized'):
+            self.__frozen()
+        super(FrozenRecord, self).__setitem__(key, value)
+
+    __delitem__ = __ior__ = add_key = clear = move_to_end = pop = \
+        popitem = setdefault = update = __frozen
+
+    def copy(self):
+        """ The record itself, as it cannot be changed. """
+        return self
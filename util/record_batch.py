@@ -0,0 +1,208 @@
+"""
+RecordBatch holds records by column, a list of values per field, for
+operations on many records at once without copying each record.
+"""
+import csv
+from itertools import compress
+from operator import itemgetter
+import sys
+from util.open_record import OpenRecord
+from util.text_fmt import cols_to_text_cols, cols_to_text_rows
+from util.util_tools import to_snake_name, to_str
+
+
+class _Missing:
+    """ Marks a field missing from a record, as distinct from None. """
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __reduce__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+class RecordBatch:
+    """
+    Records stored as a list of values per field, all the same length. A
+    field missing from a record holds MISSING until normalized. Iterating a
+    batch yields an OpenRecord per row with the fields present, so a batch
+    can stand in for the list of records it was built from. Selecting
+    fields shares the columns, and filtering and sorting build each column
+    once rather than copying each record.
+    """
+
+    def __init__(self, columns=None, length=None):
+        """
+        Create a batch from 'columns', a dictionary of field names to lists
+        of values in field order. 'length' is the number of rows, needed
+        when there are no columns.
+        """
+        self.__columns = dict(columns or {})
+        lens = set(len(col) for col in self.__columns.values())
+        if len(lens) > 1:
+            raise ValueError("Columns differ in length: %s" %
+                             ','.join(str(ln) for ln in sorted(lens)))
+        self.__length = lens.pop() if len(lens) else (length or 0)
+
+    def __getitem__(self, i):
+        """ Record at row 'i', or a batch of the rows in slice 'i'. """
+        if isinstance(i, slice):
+            return RecordBatch({fn: col[i] for fn, col in
+                                self.__columns.items()},
+                               len(range(*i.indices(self.__length))))
+        return OpenRecord([(fn, col[i]) for fn, col in self.__columns.items()
+                           if col[i] is not MISSING])
+
+    def __iter__(self):
+        names = list(self.__columns)
+        for vals in zip(*self.__columns.values()):
+            yield OpenRecord([(fn, fv) for fn, fv in zip(names, vals)
+                              if fv is not MISSING])
+
+    def __len__(self):
+        return self.__length
+
+    def column(self, name):
+        """ List of values of field 'name', shared with the batch. """
+        return self.__columns[name]
+
+    def filter(self, mask):
+        """
+        Batch of the rows selected by 'mask', either a sequence of booleans
+        for each row or a function of a record returning true for rows to
+        keep, which is called with each row in turn.
+        """
+        if callable(mask):
+            mask = [mask(rec) for rec in self]
+        elif len(mask) != self.__length:
+            raise ValueError("Mask must have a value for each row.")
+        mask = [bool(x) for x in mask]
+        return RecordBatch({fn: list(compress(col, mask))
+                            for fn, col in self.__columns.items()},
+                           sum(mask))
+
+    def names(self):
+        """ Field names, in the order they were first found. """
+        return list(self.__columns)
+
+    def normalize(self, default_value=None):
+        """
+        Batch where every record has all the fields, those missing set to
+        'default_value', with the fields in the order they were first found.
+        Columns without missing values are shared.
+        """
+        return RecordBatch(
+            {fn: [default_value if fv is MISSING else fv for fv in col]
+             if any(fv is MISSING for fv in col) else col
+             for fn, col in self.__columns.items()},
+            self.__length)
+
+    def select(self, fields, exclude=False):
+        """ Batch with only 'fields' selected if 'exclude' is False or only
+            fields not in 'fields' if 'exclude' is True, sharing the
+            columns. """
+        if not exclude:
+            cols = {fn: self.__columns[fn] for fn in fields
+                    if fn in self.__columns}
+        else:
+            cols = {fn: col for fn, col in self.__columns.items()
+                    if fn not in fields}
+        return RecordBatch(cols, self.__length)
+
+    def sort(self, *fields, reverse=False):
+        """
+        Batch sorted by the values of 'fields', in order, 'reverse' for
+        descending. The row order is found once and applied to each column.
+        Rows missing a field sort before the rows with it, or after them
+        with 'reverse'.
+        """
+        keys = []
+        for fn in fields:
+            col = self.__columns[fn]
+            if any(fv is MISSING for fv in col):
+                col = [(fv is not MISSING, None if fv is MISSING else fv)
+                       for fv in col]
+            keys.append(col)
+        if len(keys) == 1:
+            order = sorted(range(self.__length), key=keys[0].__getitem__,
+                           reverse=reverse)
+        else:
+            rows = list(zip(*keys))
+            order = sorted(range(self.__length), key=rows.__getitem__,
+                           reverse=reverse)
+        return self.take(order)
+
+    def take(self, rows):
+        """ Batch of the row indexes in 'rows', in that order. """
+        rows = list(rows)
+        if not len(rows):
+            return RecordBatch({fn: [] for fn in self.__columns})
+        get = itemgetter(*rows)
+        if len(rows) == 1:
+            return RecordBatch({fn: [get(col)] for fn, col in
+                                self.__columns.items()}, 1)
+        return RecordBatch({fn: list(get(col)) for fn, col in
+                            self.__columns.items()}, len(rows))
+
+    def to_csv(self, fo=sys.stdout, default_value=None):
+        """
+        Generate CSV for the batch written to 'fo', with a column for every
+        field and missing values written as 'default_value'.
+        """
+        if self.__length > 0:
+            wrt = csv.writer(fo)
+            wrt.writerow(self.__columns)
+            dflt = to_str(default_value)
+            wrt.writerows(
+                [dflt if fv is MISSING else to_str(fv) for fv in vals]
+                for vals in zip(*self.__columns.values()))
+
+    def to_records(self):
+        """ List of an OpenRecord for each row. """
+        return list(self)
+
+    def to_text_cols(self, digits=3, max_len=80, indent=0):
+        """
+        Formats the batch into text columns from its columns, a line for each
+        field with values, see OpenRecord.to_text_cols.
+        """
+        return cols_to_text_cols(self.normalize().__columns, digits, max_len,
+                                 indent)
+
+    def to_text_rows(self, digits=3, max_len=80, indent=0):
+        """
+        Formats the batch into evenly spaced text rows from its columns, see
+        OpenRecord.to_text_rows.
+        """
+        return cols_to_text_rows(self.normalize('').__columns, digits,
+                                 max_len, indent)
+
+    @staticmethod
+    def from_cursor(src):
+        """ Create a batch from DBI cursor 'src', one column per field. """
+        names = [to_snake_name(x[0]) for x in src.description]
+        cols = list(zip(*src)) or [()] * len(names)
+        return RecordBatch({fn: list(col) for fn, col in zip(names, cols)})
+
+    @staticmethod
+    def from_records(records):
+        """
+        Create a batch from 'records', dictionaries that may have different
+        fields. Fields missing from a record hold MISSING, see 'normalize'.
+        """
+        cols = {}
+        n = 0
+        for rec in records:
+            for fn, fv in rec.items():
+                col = cols.get(fn)
+                if col is None:
+                    col = cols[fn] = [MISSING] * n
+                col.append(fv)
+            n += 1
+            for col in cols.values():
+                if len(col) < n:
+                    col.append(MISSING)
+        return RecordBatch(cols, n)
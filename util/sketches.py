@@ -0,0 +1,227 @@
+"""
+Sketches summarizing streams of values in bounded memory: SpaceSaving for
+the most frequent values and HyperLogLog for the number of distinct values.
+Both merge, so streams can be summarized in parallel chunks and combined.
+"""
+from collections import defaultdict
+from hashlib import blake2b
+from heapq import heapify, heappop, heappush
+from math import log
+import numpy as np
+
+HLL_P = 12
+
+
+def _hash64_(x):
+    """ Stable 64 bit hash of 'x', the same in every process. """
+    if not isinstance(x, bytes):
+        x = str(x).encode()
+    return int.from_bytes(blake2b(x, digest_size=8).digest(), 'big')
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters, tracking at most 'size' values. Counts are
+    exact until more than 'size' distinct values are added. After that the
+    value with the smallest count is replaced by each new value, which
+    takes over its count, so counts are over estimates by at most their
+    error. See Metwally et al, Efficient Computation of Frequent and Top-k
+    Elements in Data Streams.
+    """
+
+    def __init__(self, size, counts=None):
+        if size < 1:
+            raise ValueError("Sketch size must be at least 1.")
+        self.__size = size
+        self.__counts = {}
+        self.__errors = {}
+        self.__heap = None
+        self.__seq = 0
+        self.__total = 0
+        self.__exact = True
+        for x, c in (counts or {}).items():
+            self.add(x, c)
+
+    def __contains__(self, x):
+        return x in self.__counts
+
+    def __len__(self):
+        return len(self.__counts)
+
+    def __push(self, x):
+        """ Push value 'x' on the heap with its count and a sequence. """
+        self.__seq += 1
+        heappush(self.__heap, (self.__counts[x], self.__seq, x))
+
+    def __min_value(self):
+        """ Value with the smallest count, kept in a heap once full. """
+        if self.__heap is None:
+            self.__heap = []
+            for x in self.__counts:
+                self.__seq += 1
+                self.__heap.append((self.__counts[x], self.__seq, x))
+            heapify(self.__heap)
+        while True:
+            # Heap counts are lower bounds, refreshed as they surface.
+            c, _, x = self.__heap[0]
+            if self.__counts[x] == c:
+                return x
+            heappop(self.__heap)
+            self.__push(x)
+
+    def add(self, x, c=1):
+        """ Add 'c' occurrences of value 'x'. """
+        self.__total += c
+        if x in self.__counts:
+            self.__counts[x] += c
+        elif len(self.__counts) < self.__size:
+            self.__counts[x] = c
+            if self.__heap is not None:
+                self.__push(x)
+        else:
+            y = self.__min_value()
+            m = self.__counts.pop(y)
+            self.__errors.pop(y, None)
+            heappop(self.__heap)
+            self.__counts[x] = m + c
+            self.__errors[x] = m
+            self.__push(x)
+            self.__exact = False
+
+    def count(self, x):
+        """ Estimated count of value 'x', zero if not tracked. """
+        return self.__counts.get(x, 0)
+
+    def error(self, x):
+        """ Maximum over estimate of the count of value 'x'. """
+        return self.__errors.get(x, 0)
+
+    def is_exact(self):
+        """ Indicates no value has been dropped, so all counts are exact. """
+        return self.__exact
+
+    def items(self):
+        """ Tracked values and their estimated counts. """
+        return self.__counts.items()
+
+    def merge(self, other):
+        """
+        Merge SpaceSaving 'other' into this one. A value missing from a full
+        sketch is counted as that sketch's smallest count, which bounds its
+        count there, and the 'size' values with the largest counts are kept.
+        The counts over estimate by at most their errors, but still sum to at
+        most 'total', as each smallest count added is at most a count of a
+        value that is not kept. See Agarwal et al, Mergeable Summaries.
+        """
+        counts = defaultdict(int)
+        errors = defaultdict(int)
+        for ss in (self, other):
+            for x, c in ss.__counts.items():
+                counts[x] += c
+                errors[x] += ss.__errors.get(x, 0)
+        for ss in (self, other):
+            if not ss.__exact and len(ss):
+                m = ss.__counts[ss.__min_value()]
+                for x in counts:
+                    if x not in ss:
+                        counts[x] += m
+                        errors[x] += m
+        keep = sorted(counts, key=lambda x: counts[x], reverse=True)
+        self.__exact = self.__exact and other.__exact and \
+            len(keep) <= self.__size
+        keep = keep[:self.__size]
+        self.__counts = {x: counts[x] for x in keep}
+        self.__errors = {x: errors[x] for x in keep if errors[x]}
+        self.__heap = None
+        self.__total += other.__total
+        return self
+
+    @staticmethod
+    def from_dict(state):
+        """ SpaceSaving restored from its 'to_dict' 'state'. """
+        ss = SpaceSaving(state['size'], state['counts'])
+        ss.__errors = dict(state['errors'])
+        ss.__total = state['total']
+        ss.__exact = state['exact']
+        return ss
+
+    def to_dict(self):
+        """ State of the sketch as a dictionary of builtin types. """
+        return dict(size=self.__size,
+                    counts=dict(self.__counts),
+                    errors=dict(self.__errors),
+                    total=self.__total,
+                    exact=self.__exact)
+
+    def top(self, n=None):
+        """ The 'n' (default all) values with the largest counts, in order. """
+        xcs = sorted(self.__counts.items(), key=lambda xc: xc[1], reverse=True)
+        return xcs if n is None else xcs[:n]
+
+    def total(self):
+        """
+        Number of occurrences added, the sum of the counts, or at least their
+        sum once sketches that dropped values are merged.
+        """
+        return self.__total
+
+
+class HyperLogLog:
+    """
+    HyperLogLog estimate of the number of distinct values added, using 2**'p'
+    single byte registers for a relative error of about 1.04/sqrt(2**'p').
+    See Flajolet et al, HyperLogLog: the analysis of a near-optimal
+    cardinality estimation algorithm.
+    """
+
+    def __init__(self, p=HLL_P):
+        if p < 4 or p > 18:
+            raise ValueError("HyperLogLog precision must be from 4 to 18.")
+        self.__p = p
+        self.__registers = bytearray(1 << p)
+
+    def __len__(self):
+        return self.estimate()
+
+    def add(self, x):
+        """ Add value 'x'. """
+        h = _hash64_(x)
+        i = h >> (64 - self.__p)
+        w = h & ((1 << (64 - self.__p)) - 1)
+        rho = 64 - self.__p - w.bit_length() + 1
+        if rho > self.__registers[i]:
+            self.__registers[i] = rho
+
+    def estimate(self):
+        """ Estimated number of distinct values added. """
+        m = len(self.__registers)
+        regs = np.frombuffer(self.__registers, dtype=np.uint8)
+        est = 0.7213 / (1 + 1.079 / m) * m * m / \
+            np.sum(np.power(2.0, -regs.astype(float)))
+        zeros = m - np.count_nonzero(regs)
+        if est <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities.
+            est = m * log(m / zeros)
+        return int(round(est))
+
+    @staticmethod
+    def from_dict(state):
+        """ HyperLogLog restored from its 'to_dict' 'state'. """
+        hll = HyperLogLog(state['p'])
+        if len(state['registers']) != len(hll.__registers):
+            raise ValueError("HyperLogLog registers do not match precision.")
+        hll.__registers = bytearray(state['registers'])
+        return hll
+
+    def to_dict(self):
+        """ State of the sketch as a dictionary of builtin types. """
+        return dict(p=self.__p, registers=bytes(self.__registers))
+
+    def merge(self, other):
+        """ Merge HyperLogLog 'other', of the same precision, into this. """
+        if other.__p != self.__p:
+            raise ValueError("HyperLogLog precisions differ.")
+        self.__registers = bytearray(np.maximum(
+            np.frombuffer(self.__registers, dtype=np.uint8),
+            np.frombuffer(other.__registers, dtype=np.uint8)))
+        return self
@@ -0,0 +1,240 @@
+"""
+SlotRecord is a compact, read only record with a generated class per set of
+field names, a fast alternative to OpenRecord for large numbers of records.
+"""
+try:
+    from collections import _tuplegetter
+except ImportError:
+    _tuplegetter = None
+import csv
+import sys
+from util.open_record import _csv_rows_, SNIFF_SIZE
+from util.text_fmt import to_text_cols, to_text_rows
+from util.util_tools import to_json, to_snake_name, to_str
+
+_CLASSES = {}
+
+
+def _field_getter_(i, name):
+    """ Property returning the value of field 'name' at index 'i'. """
+    if _tuplegetter is not None:
+        return _tuplegetter(i, "Value of field %s." % name)
+    return property(lambda self: tuple.__getitem__(self, i),
+                    doc="Value of field %s." % name)
+
+
+def record_class(fields, name='SlotRecord'):
+    """
+    SlotRecord class for the field names 'fields', generated once per set
+    of names and then reused. Fields that are identifiers, not private and
+    not SlotRecord methods are also attributes of the records.
+    """
+    fields = tuple(fields)
+    try:
+        return _CLASSES[fields]
+    except KeyError:
+        pass
+    if len(set(fields)) != len(fields):
+        raise ValueError("Duplicate field names: %s" % ','.join(fields))
+    attrs = dict(__slots__=(),
+                 _fields=fields,
+                 _index={fn: i for i, fn in enumerate(fields)})
+    for i, fn in enumerate(fields):
+        if fn.isidentifier() and not fn.startswith('_') and \
+                fn not in SlotRecord.__dict__:
+            attrs[fn] = _field_getter_(i, fn)
+    cls = _CLASSES[fields] = type(name, (SlotRecord,), attrs)
+    return cls
+
+
+def _rebuild_(fields, values):
+    """ SlotRecord of 'fields' with 'values', for unpickling. """
+    return record_class(fields)._make(values)
+
+
+class SlotRecord(tuple):
+    """
+    A read only record storing its values in a tuple, with a class per set
+    of field names from 'record_class' holding the names and their indexes.
+    Records have no instance dictionary, so take a fraction of the memory of
+    an OpenRecord, and are built from a row of values without conversion.
+    Fields are accessed as properties or dictionary style by name, and
+    records iterate, compare and convert to JSON as dictionaries do. Nested
+    values are kept as given.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __new__(cls, *args, **kwargs):
+        """
+        Create a record with values by position in 'args', or from a
+        dictionary as the only argument, or by name in 'kwargs'. Fields not
+        given are None.
+        """
+        if len(args) == 1 and isinstance(args[0], dict):
+            kwargs = args[0]
+        elif len(args):
+            if len(args) != len(cls._fields) or len(kwargs):
+                raise ValueError("Expected %d values for fields %s." %
+                                 (len(cls._fields), ','.join(cls._fields)))
+            return tuple.__new__(cls, args)
+        unknown = set(kwargs) - set(cls._index)
+        if len(unknown):
+            raise ValueError("Unknown fields: %s" % ','.join(sorted(unknown)))
+        return tuple.__new__(cls, [kwargs.get(fn) for fn in cls._fields])
+
+    @classmethod
+    def _make(cls, values):
+        """ Create a record from the sequence of 'values', in field order. """
+        rec = tuple.__new__(cls, values)
+        if len(rec) != len(cls._fields):
+            raise ValueError("Expected %d values for fields %s." %
+                             (len(cls._fields), ','.join(cls._fields)))
+        return rec
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __eq__(self, other):
+        if isinstance(other, SlotRecord):
+            return self._fields == other._fields and \
+                tuple.__eq__(self, other)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __getattr__(self, name):
+        """ Fields that are not properties, such as private names. """
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        """ Value of field 'key' by name, or by index or slice. """
+        if key.__class__ is str:
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __hash__(self):
+        return hash((self._fields, tuple.__hash__(self)))
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __reduce__(self):
+        return _rebuild_, (self._fields, self.values())
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ', '.join(
+            "%s=%r" % fv for fv in self.items()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SlotRecord is read only, see 'replace'.")
+
+    def __str__(self):
+        """ Return string report of the record. """
+        return to_text_cols([self])
+
+    def get(self, key, default=None):
+        """ Value of field 'key', 'default' if there is no such field. """
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def items(self):
+        """ Field names and values. """
+        return zip(self._fields, self.values())
+
+    def keys(self):
+        """ Field names. """
+        return self._fields
+
+    def replace(self, **kwargs):
+        """ New record with the fields in 'kwargs' replaced. """
+        vals = list(self.values())
+        for fn, fv in kwargs.items():
+            vals[self._index[fn]] = fv
+        return tuple.__new__(type(self), vals)
+
+    def select(self, fields, exclude=False):
+        """ Produce a new record with only 'fields' selected if 'exclude'
+            is False or ony fields not in 'fields' if 'exclude' is True. """
+        if not exclude:
+            names = [fn for fn in fields if fn in self._index]
+        else:
+            names = [fn for fn in self._fields if fn not in fields]
+        return record_class(names)._make([self[fn] for fn in names])
+
+    def to_dict(self):
+        """ Dictionary of the fields and values. """
+        return dict(self.items())
+
+    def to_json(self):
+        """ Generate unformatted JSON from the record. """
+        return to_json(self.to_dict())
+
+    def to_pretty_json(self):
+        """ Generate formatted JSON from the record. """
+        return to_json(self.to_dict(), indent=4)
+
+    def values(self):
+        """ Field values, in field order. """
+        return tuple.__getitem__(self, slice(None))
+
+    @staticmethod
+    def from_cursor(src):
+        """ Create records from DBI cursor 'src', one class for all rows. """
+        make = record_class(
+            [to_snake_name(x[0]) for x in src.description])._make
+        return [make(row) for row in src]
+
+    @staticmethod
+    def from_csv(src, sniff_size=SNIFF_SIZE):
+        """
+        Create records from CSV 'src', a file handler, file name or string,
+        read a row at a time with the dialect and header sniffed from the
+        first 'sniff_size' characters, as 'OpenRecord.iter_csv' reads it.
+        """
+        with _csv_rows_(src, sniff_size) as (names, rows):
+            if not len(names):
+                return []
+            make = record_class(names)._make
+            return [make(row) for row in rows]
+
+    @staticmethod
+    def from_records(records):
+        """
+        Create records from dictionaries 'records', sharing a class between
+        records with the same fields in the same order.
+        """
+        return [record_class(rec.keys())._make(rec.values())
+                for rec in records]
+
+    @staticmethod
+    def to_csv(records, fo=sys.stdout):
+        """ Generate CSV for 'records' writen to 'fo'. """
+        if len(records) > 0:
+            wrt = csv.writer(fo)
+            wrt.writerow(records[0].keys())
+            for rec in records:
+                wrt.writerow([to_str(x) for x in rec.values()])
+
+    @staticmethod
+    def to_text_cols(records, digits=3, max_len=80, indent=0):
+        """
+        Formats 'records' into text columns, see OpenRecord.to_text_cols.
+        """
+        return to_text_cols(records, digits, max_len, indent)
+
+    @staticmethod
+    def to_text_rows(records, digits=3, max_len=80, indent=0):
+        """
+        Formats 'records' into evenly spaced text rows, see
+        OpenRecord.to_text_rows.
+        """
+        return to_text_rows(records, digits, max_len, indent)
@@ -5,8 +5,13 @@ from collections import defaultdict
 import datetime as dt
 from math import ceil, copysign, exp, floor, sqrt
 import numpy as np
+import scipy.stats as ss
 from .util_tools import zero_if_none
 
+# Fewer values than this are added to or counted in a RankTree one at a time
+# rather than as arrays, which cost more to set up than a few short loops.
+RANK_TREE_LOOP_N = 64
+
 
 def adjust_mean(data, mu, prec=.01):
     """ Adjust values in 'data' to mean 'mu' with precision 'prec'. """
@@ -192,6 +197,42 @@ def rankdata(data):
     return [dd[x][0] / dd[x][1] for x in data]
 
 
+def rank_sums(test, base):
+    """
+    Rank sums test score of 'test' values against 'base' values, the same as
+    the statistic of 'scipy.stats.ranksums', ranking the combined values once.
+    If 'test' and 'base' are matrices, each row of 'test' is scored against
+    the same row of 'base' and an array of scores is returned.
+    """
+    test = np.asarray(test, dtype=float)
+    base = np.asarray(base, dtype=float)
+    n1 = test.shape[-1]
+    n2 = base.shape[-1]
+    ranks = ss.rankdata(np.concatenate((test, base), axis=-1), axis=-1)
+    return _rs_score_(ranks[..., :n1].sum(axis=-1), n1, n2)
+
+
+def rank_sums_split(data, lo=1, hi=None):
+    """
+    Rank sums test scores of the after values 'data[k:]' against the before
+    values 'data[:k]' for each split 'k' from 'lo' up to, but not including,
+    'hi' (default len(data)). 'data' is ranked once and the after rank sums
+    are accumulated from the end. Returns an array of scores, the first one
+    for split 'lo'.
+    """
+    n = len(data)
+    hi = n if hi is None else min(hi, n)
+    ks = np.arange(max(lo, 1), max(hi, 1))
+    after_rs = np.cumsum(ss.rankdata(data)[::-1])[::-1]
+    return _rs_score_(after_rs[ks], n - ks, ks)
+
+
+def _rs_score_(rs, n1, n2):
+    """ Normalized score for rank sum 'rs' of 'n1' test, 'n2' base values. """
+    sd = np.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    return (rs - n1 * (n1 + n2 + 1) / 2) / sd
+
+
 def t_limits(n, p):
     """
     Trim/winsorize Limit offsets for 'n' values and proportion 'p', constrained
@@ -280,3 +321,106 @@ def wx_test(test, base=None):
         elif x < 0:
             rs -= i + 1
     return rs / sqrt(((n * (n + 1)) * ((2 * n) + 1)) / 12)
+
+
+class RankSums:
+    """
+    Rank sums tester against a base of values that only grows, out of a
+    known set of 'values'. The base is counted in a RankTree, so adding
+    values and locating each test value in the base are both O(log n)
+    rather than re-ranking the base and test values together.
+    """
+
+    def __init__(self, values, base=()):
+        """
+        Create RankSums over the possible 'values', with the initial 'base'
+        values.
+        """
+        self.__base = RankTree(values)
+        if len(base):
+            self.__base.add(base)
+
+    def __len__(self):
+        return len(self.__base)
+
+    def add(self, values):
+        """ Add 'values' to the base, each one of the possible values. """
+        self.__base.add(values)
+
+    def score(self, test):
+        """
+        Rank sums test score of 'test' values against the base, the same as
+        'rank_sums(test, base)'. Returns zero if either is empty.
+        """
+        n1 = len(test)
+        n2 = len(self.__base)
+        if n1 == 0 or n2 == 0:
+            return 0
+        # Ranks of the test values among themselves sum to n1(n1+1)/2, add
+        # the base values below each test value and half of those tied,
+        # half of those below and half of those below or tied.
+        below = self.__base.count_below(test).sum()
+        at_most = self.__base.count_below(test, equal=True).sum()
+        rs = n1 * (n1 + 1) / 2 + (below + at_most) / 2
+        return _rs_score_(rs, n1, n2)
+
+
+class RankTree:
+    """
+    Counts of values added so far out of a known set of 'values', kept in a
+    binary indexed (Fenwick) tree over the sorted distinct values. Adding
+    values and counting those added below given values are both O(log n),
+    done for whole arrays of values at once or for a few values in loops
+    over a view of the tree.
+    """
+
+    def __init__(self, values):
+        """ Create RankTree over the possible 'values' that can be added. """
+        self.__keys = np.unique(np.asarray(values, dtype=float))
+        self.__tree = np.zeros(len(self.__keys) + 1, dtype=np.int64)
+        self.__view = memoryview(self.__tree)
+        self.__count = 0
+
+    def __len__(self):
+        return self.__count
+
+    def add(self, values):
+        """ Add 'values', each of which must be one of the possible values. """
+        idx = np.searchsorted(self.__keys, values) + 1
+        if len(idx) < RANK_TREE_LOOP_N:
+            tree = self.__view
+            n = len(tree)
+            for i in idx.tolist():
+                while i < n:
+                    tree[i] += 1
+                    i += i & -i
+        else:
+            while len(idx):
+                np.add.at(self.__tree, idx, 1)
+                idx = idx + (idx & -idx)
+                idx = idx[idx < len(self.__tree)]
+        self.__count += len(values)
+
+    def count_below(self, values, equal=False):
+        """
+        Count of values added less than each of 'values', or less than or
+        equal to them if 'equal'.
+        """
+        idx = np.searchsorted(self.__keys, values,
+                              side='right' if equal else 'left')
+        if len(idx) < RANK_TREE_LOOP_N:
+            tree = self.__view
+            counts = []
+            for i in idx.tolist():
+                c = 0
+                while i > 0:
+                    c += tree[i]
+                    i -= i & -i
+                counts.append(c)
+            counts = np.array(counts, dtype=np.int64)
+        else:
+            counts = np.zeros(len(idx), dtype=np.int64)
+            while np.any(idx > 0):
+                counts += self.__tree[idx]
+                idx = idx - (idx & -idx)
+        return counts
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Evaluates testers and changepoint methods with Monte Carlo sweeps. Series are
+generated with daily cycles, the last so many values changed by a change
+ratio, and each method is run across a grid of parameters in a process pool.
+Reports detection rate, false positive and false alarm rates, time to detect
+and throughput for each method and set of parameters.
+"""
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from collections import defaultdict
+import datetime as dt
+from multiprocessing import cpu_count
+import random
+import numpy as np
+from util.changepoint import rs_cpd_multi, ti_cpd_multi
+from util.concurrent_utils import run_procs
+from util.data_generator import change, gen_cycle
+from util.open_record import OpenRecord
+from util.testers import (
+    grs_cusum,
+    grs_ewma,
+    gti_cusum,
+    gti_ewma,
+    pr_cusum,
+    pr_ewma,
+    ti_cusum,
+    ti_ewma
+)
+from util.timer import Timer
+
+# Method name to function, kind of method and grid of (arguments, threshold).
+# Grouped testers take the group size and tester parameter, point testers the
+# tester parameter and changepoint methods are given the threshold.
+METHODS = {
+    'grs_cusum': (grs_cusum, 'grouped', [((5, 1), 3.5), ((5, .5), 4)]),
+    'grs_ewma': (grs_ewma, 'grouped', [((5, .15), 2), ((5, .3), 2.5)]),
+    'gti_cusum': (gti_cusum, 'grouped', [((5, .5), 2.5), ((5, 1), 2)]),
+    'gti_ewma': (gti_ewma, 'grouped', [((5, .15), 1.5), ((5, .3), 2)]),
+    'pr_cusum': (pr_cusum, 'point', [((.5,), 2), ((1,), 2)]),
+    'pr_ewma': (pr_ewma, 'point', [((.15,), .92), ((.33,), .92)]),
+    'ti_cusum': (ti_cusum, 'point', [((.5,), 3.5), ((1,), 3)]),
+    'ti_ewma': (ti_ewma, 'point', [((.15,), 2.5), ((.33,), 2.5)]),
+    'rs_cpd_multi': (rs_cpd_multi, 'cpd', [((), 3), ((), 5)]),
+    'ti_cpd_multi': (ti_cpd_multi, 'cpd', [((), 3), ((), 5)])
+}
+
+CHANGE_RATIOS = (.5, 1, 2)
+COUNT = 50
+CYCLE = 'mid'
+DAY_N = 288
+DAYS = 7
+MU = 5
+SC = 1.5
+TIMEOUT = 3600
+
+
+def gen_series(seed, cr, test_n, **kv_args):
+    """
+    Generate a series of values with daily cycles, changing the last 'test_n'
+    values by change ratio 'cr'. Series generated from the same 'seed' share
+    the same values before the change. Key word arguments are the 'mu',
+    'day_n', 'days', 'cycle', 'sc' and 'last_date' used with 'gen_cycle'.
+    Returns the values and the index of the first changed value.
+    """
+    day_n = kv_args.get('day_n', DAY_N)
+    data_n = day_n * kv_args.get('days', DAYS)
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    _, values = gen_cycle(kv_args.get('mu', MU),
+                          day_n,
+                          data_n,
+                          last_date=kv_args.get('last_date'),
+                          cycle=kv_args.get('cycle', CYCLE),
+                          sc=kv_args.get('sc', SC))
+    ci = data_n - test_n
+    return change(values, cr, ci, data_n), ci
+
+
+def run_method(name, args, h, values, ci, test_n):
+    """
+    Run method 'name' with arguments 'args' and threshold 'h' on 'values'
+    changed from index 'ci'. Returns the signed maximum test score and the
+    index of the first value where the change was detected, zero if not
+    detected, and the number of false alarms before the change. For testers
+    the maximum score is taken from the change on, and scores over 'h'
+    before it are false alarms. For changepoint methods the strongest
+    changepoint found no more than 'test_n' values before the change is
+    used, and those found earlier are false alarms.
+    """
+    fn, kind, _ = METHODS[name]
+    cp_k = max_ts = fa_n = 0
+    if kind == 'cpd':
+        for cp in fn(values, h, *args):
+            if cp.ci < ci - test_n:
+                fa_n += 1
+            elif abs(cp.ts) > abs(max_ts):
+                cp_k = cp.ci
+                max_ts = cp.ts
+    else:
+        gp_n = args[0] if kind == 'grouped' else 1
+        for i, ts in enumerate(fn(values, *args)):
+            k = i * gp_n
+            if k < ci:
+                if abs(ts) > h:
+                    fa_n += 1
+            else:
+                if cp_k == 0 and abs(ts) > h:
+                    cp_k = k
+                if abs(ts) > abs(max_ts):
+                    max_ts = ts
+    return max_ts, cp_k, fa_n
+
+
+def _eval_task_(task):
+    """
+    Run one cell of the grid: method 'name' with 'args' and 'h' on 'count'
+    series changed by 'cr'. Returns the cell key with the outcome counts,
+    the number of series with false alarms before the change, the summed
+    time to detect, the points processed and seconds spent. Outcomes are
+    'tp', 'fn' or 'wd', detected in the wrong direction, for changed
+    series and 'fp' or 'tn' for unchanged series.
+    """
+    name, args, h, cr, count, seed, test_n, kv_args = task
+    counts = defaultdict(int)
+    fa = ttd = points = secs = 0
+    for j in range(count):
+        values, ci = gen_series(seed + j, cr, test_n, **kv_args)
+        with Timer() as tm:
+            max_ts, cp_k, fa_n = run_method(name, args, h, values, ci,
+                                            test_n)
+        secs += tm.secs
+        points += len(values)
+        if abs(max_ts) <= h:
+            outcome = 'tn' if cr == 1 else 'fn'
+        elif cr == 1:
+            outcome = 'fp'
+        else:
+            outcome = 'tp' if (max_ts > 0) == (cr > 1) else 'wd'
+        counts[outcome] += 1
+        if outcome == 'tp':
+            ttd += cp_k - ci
+        if fa_n:
+            fa += 1
+    return (name, args, h), cr, counts, fa, ttd, points, secs
+
+
+def evaluate(methods=None,
+             grid=None,
+             crs=CHANGE_RATIOS,
+             count=COUNT,
+             test_n=None,
+             seed=1,
+             proc_n=None,
+             timeout=TIMEOUT,
+             **kv_args):
+    """
+    Evaluate 'methods', a list of names from METHODS (default all), across
+    their grids of parameters. 'grid' optionally maps method names to their
+    own lists of (arguments, threshold) to use instead. Each method is run
+    on 'count' generated series for each change ratio in 'crs', where a
+    ratio of 1 means unchanged. The last 'test_n' values are changed
+    (default a quarter day). Series are
+    generated from 'seed' so every method sees the same series. Grid cells
+    run in a pool of 'proc_n' processes (default the number of CPUs). Key
+    word arguments are passed on to 'gen_series'.
+    Returns a record for each method and set of parameters with:
+    dr - detection rate, proportion of changed series detected in the
+        direction of the change, None without changed series
+    fpr - false positive rate, proportion of unchanged series with a
+        detection after the change point, None without unchanged series
+    far - false alarm rate, proportion of all series with a detection
+        before the change point
+    tp, fn, wd - proportions of all series tested that were changed and
+        detected, not detected or detected in the wrong direction
+    fp, tn - proportions of all series tested that were unchanged and
+        detected or not
+    ttd - mean number of values from change to detection
+    pps - points per second processed by the method
+    """
+    methods = list(METHODS) if methods is None else methods
+    for name in methods:
+        if name not in METHODS:
+            raise ValueError("Unknown method: %s" % name)
+    grid = {name: (grid or {}).get(name, METHODS[name][2]) for name in methods}
+    test_n = kv_args.get('day_n', DAY_N) // 4 if test_n is None else test_n
+    kv_args.setdefault('last_date', dt.datetime.now())
+    proc_n = cpu_count() if proc_n is None else proc_n
+    tasks = []
+    for name in methods:
+        for args, h in grid[name]:
+            for cr in crs:
+                tasks.append(
+                    (name, tuple(args), h, cr, count, seed, test_n, kv_args))
+
+    # Run the grid, combining the cells for each method and parameters.
+    results = {}
+    for key, cr, counts, fa, ttd, points, secs in run_procs(
+            _eval_task_, tasks, proc_n, timeout):
+        rslt = results.setdefault(key, dict(
+            counts=defaultdict(int), changed=0, unchanged=0, fa=0, ttd=0,
+            points=0, secs=0))
+        for outcome, c in counts.items():
+            rslt['counts'][outcome] += c
+        rslt['changed' if cr != 1 else 'unchanged'] += count
+        rslt['fa'] += fa
+        rslt['ttd'] += ttd
+        rslt['points'] += points
+        rslt['secs'] += secs
+
+    # Report in the order methods and parameters were given.
+    rpts = []
+    for name in methods:
+        for args, h in grid[name]:
+            rslt = results[(name, tuple(args), h)]
+            counts = rslt['counts']
+            ct = sum(counts.values())
+            rpts.append(OpenRecord(
+                method=name,
+                args=','.join([str(x) for x in args]),
+                h=h,
+                n=ct,
+                dr=(counts['tp'] / rslt['changed']
+                    if rslt['changed'] else None),
+                fpr=(counts['fp'] / rslt['unchanged']
+                     if rslt['unchanged'] else None),
+                far=rslt['fa'] / ct,
+                tp=counts['tp'] / ct,
+                fn=counts['fn'] / ct,
+                wd=counts['wd'] / ct,
+                fp=counts['fp'] / ct,
+                tn=counts['tn'] / ct,
+                ttd=rslt['ttd'] / counts['tp'] if counts['tp'] else 0,
+                pps=rslt['points'] / rslt['secs'] if rslt['secs'] else 0
+            ))
+    return rpts
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description=__doc__,
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '--methods',
+        nargs='+',
+        choices=sorted(METHODS),
+        help="Methods to evaluate, default all.")
+    parser.add_argument(
+        '--crs',
+        nargs='+',
+        type=float,
+        default=CHANGE_RATIOS,
+        help="Change ratios to apply, 1 for unchanged series.")
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=COUNT,
+        help="Series per change ratio.")
+    parser.add_argument(
+        '--day-n',
+        dest='day_n',
+        type=int,
+        default=DAY_N,
+        help="Periods per day.")
+    parser.add_argument(
+        '--days',
+        type=int,
+        default=DAYS,
+        help="Days per series.")
+    parser.add_argument(
+        '--test-n',
+        dest='test_n',
+        type=int,
+        help="Values changed at the end of each series, default 1/4 day.")
+    parser.add_argument(
+        '--cycle',
+        choices=('low', 'mid', 'high'),
+        default=CYCLE,
+        help="Cycle intensity.")
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=1,
+        help="Random seed for generating series.")
+    parser.add_argument(
+        '--procs',
+        type=int,
+        default=cpu_count(),
+        help="Number of processes to run.")
+    args = parser.parse_args()
+
+    rpts = evaluate(args.methods,
+                    crs=args.crs,
+                    count=args.count,
+                    test_n=args.test_n,
+                    seed=args.seed,
+                    proc_n=args.procs,
+                    day_n=args.day_n,
+                    days=args.days,
+                    cycle=args.cycle)
+    print(OpenRecord.to_text_rows(rpts))
@@ -1,11 +1,9 @@
 """
 Testers for determining when a change has occurred in a series of values.
 """
-from bisect import bisect_left
 from math import sqrt
 import numpy as np
-import scipy.stats as ss
-from util.stat_utils import c4
+from util.stat_utils import RankSums, RankTree, c4
 from util.transform import to_sqrt_trans
 
 
@@ -41,6 +39,52 @@ def ewma(scores, a):
         yield max(sl, sh, key=abs)
 
 
+def cusum_batch(scores, k):
+    """
+    Cumulative sums tester, the same as 'cusum', for a matrix of test 'scores'
+    with a row per series and a column per test. Sums for all series are
+    advanced together one test at a time. Returns the matrix of tracked sums.
+    """
+    if k <= 0:
+        raise ValueError("Expected k > 0.")
+    scores = np.array(scores, dtype=float, ndmin=2)
+    sums = np.zeros(scores.shape)
+    sl = sh = np.zeros(scores.shape[0])
+    for j in range(scores.shape[1]):
+        sl = np.minimum(sl + scores[:, j] + k, 0)
+        sh = np.maximum(sh + scores[:, j] - k, 0)
+        sums[:, j] = np.where(np.abs(sh) > np.abs(sl), sh, sl)
+    return sums
+
+
+def ewma_batch(scores, a):
+    """
+    Exponential weighted moving average tester, the same as 'ewma', for a
+    matrix of test 'scores' with a row per series and a column per test.
+    Means for all series are advanced together one test at a time. Returns
+    the matrix of tracked means.
+    """
+    if a <= 0 or a >= 1:
+        raise ValueError("Expected 0 < a < 1.")
+    scores = np.array(scores, dtype=float, ndmin=2)
+    means = np.zeros(scores.shape)
+    sl = sh = np.zeros(scores.shape[0])
+    for j in range(scores.shape[1]):
+        sl = np.minimum((a * scores[:, j]) + ((1 - a) * sl), 0)
+        sh = np.maximum((a * scores[:, j]) + ((1 - a) * sh), 0)
+        means[:, j] = np.where(np.abs(sh) > np.abs(sl), sh, sl)
+    return means
+
+
+def score_batch(score_fn, data, *args):
+    """
+    Matrix of scores generated by 'score_fn', such as 'grs_scores', with
+    arguments 'args' for each row of values in 'data', one row per series.
+    """
+    return np.array([list(score_fn(values, *args)) for values in data],
+                    dtype=float, ndmin=2)
+
+
 def gti_scores(data, gp_n):
     """
     Grouped T independent scores for values in 'data' using 'gp_n' as
@@ -68,55 +112,70 @@ def grs_scores(data, gp_n):
     Generates base median, test median and test score (-6 <= ts <= 6) for each
     group.
     """
+    data = list(data)
     gp = []
-    base = []
+    base = RankSums(data)
     for x in data:
         gp.append(x)
         if len(gp) == gp_n:
-            np.median(gp)
             ts = 0
             if len(base) >= gp_n * 2:
-                np.median(base)
-                ts = ss.ranksums(gp, base)[0]
-            base.extend(gp)
+                ts = base.score(gp)
+            base.add(gp)
             gp = []
             yield min(max(ts, -6), 6)
 
 
 def pr_scores(data):
+    """
+    Percentile ranked scores for values in 'data', each ranked against the
+    base of values seen before it, refreshed every sqrt(n) values. Generates
+    scores in range -1 <= ps < 1.
+    """
     n = len(data)
     ref_n = int(sqrt(n))
-    stage = []
-    base = []
-    for x in data:
-        ps = 0
+    base = RankTree(data)
+    for i in range(0, n, max(ref_n, 1)):
+        stage = data[i:i + ref_n]
         if len(base):
-            ps = (bisect_left(base, x) / (len(base) + .5) - .5) * 2
-        stage.append(x)
+            pss = (base.count_below(stage) / (len(base) + .5) - .5) * 2
+            yield from pss.tolist()
+        else:
+            yield from [0] * len(stage)
         if len(stage) == ref_n:
-            base.extend(stage)
-            base.sort()
-            stage = []
-        yield ps
+            base.add(stage)
 
 
 def ti_scores(data):
+    """
+    T independent scores for values in 'data', each tested against the mean
+    and standard deviation of the base of values seen before it, refreshed
+    every sqrt(n) values. Base moments are accumulated as the base grows.
+    Generates scores in range -6 <= ts <= 6.
+    """
     n = len(data)
     ref_n = int(sqrt(n))
-    stage = []
-    base = []
+    base_n = 0
     mu = sd = 1
-    for x in to_sqrt_trans(data):
-        ts = 0
-        if len(base):
-            ts = min(max((x - mu) / sd, -6), 6)
-        stage.append(x)
+    m2 = 0
+    xs = np.array(to_sqrt_trans(data), dtype=float)
+    for i in range(0, n, max(ref_n, 1)):
+        stage = xs[i:i + ref_n]
+        if base_n:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                yield from np.clip((stage - mu) / sd, -6, 6).tolist()
+        else:
+            yield from [0] * len(stage)
         if len(stage) == ref_n:
-            base.extend(stage)
-            mu = np.mean(base)
-            sd = np.std(base) / .6745
-            stage = []
-        yield ts
+            # Merge the stage moments into the base moments.
+            st_mu = np.mean(stage)
+            dx = st_mu - mu
+            tot_n = base_n + ref_n
+            mu += dx * ref_n / tot_n
+            m2 += np.sum((stage - st_mu) ** 2) + \
+                dx ** 2 * base_n * ref_n / tot_n
+            base_n = tot_n
+            sd = sqrt(m2 / base_n) / .6745
 
 
 def grs_cusum(data, gp_n, k):
@@ -163,7 +222,7 @@ def pr_cusum(data, k):
 
 def pr_ewma(data, a):
     """
-    Percentile ranked exponentially weighted moving averahe tester for the
+    Percentile ranked exponentially weighted moving average tester for the
     values in 'data' using 'a' as the smoothing factor.
     """
     return ((ts**a if ts > 0 else -(abs(ts)**a))
@@ -180,8 +239,78 @@ def ti_cusum(data, k):
 
 def ti_ewma(data, a):
     """
-    T independent exponentially weighted moving averahe tester for the
+    T independent exponentially weighted moving average tester for the
     values in 'data' using 'a' as the smoothing factor.
     """
     g = (a / (2 - a))**(1 / 2)
     return (ts / g for ts in ewma(ti_scores(data), a))
+
+
+def grs_cusum_batch(data, gp_n, k):
+    """
+    Grouped summed ranks cumulative sums tester for each row of values in
+    'data' using 'gp_n' as the group size and 'k' as the noise factor.
+    """
+    return cusum_batch(score_batch(grs_scores, data, gp_n), k)
+
+
+def grs_ewma_batch(data, gp_n, a):
+    """
+    Grouped summed ranks exponentially weighted moving average tester for each
+    row of values in 'data' using 'gp_n' as the group size and 'a' as the
+    smoothing coefficient.
+    """
+    g = min(sqrt(a / (2 - a)) * 2, 1)
+    return ewma_batch(score_batch(grs_scores, data, gp_n), a) / g
+
+
+def gti_cusum_batch(data, gp_n, k):
+    """
+    Grouped T independent cumulative sums tester for each row of values in
+    'data' using 'gp_n' as the group size and 'k' as the noise factor.
+    """
+    return cusum_batch(score_batch(gti_scores, data, gp_n), k)
+
+
+def gti_ewma_batch(data, gp_n, a):
+    """
+    Grouped T independent exponentially weighted moving average tester for
+    each row of values in 'data' using 'gp_n' as the group size and 'a' as the
+    smoothing coefficient.
+    """
+    g = sqrt(a / (2 - a)) * 2
+    return ewma_batch(score_batch(gti_scores, data, gp_n), a) / g
+
+
+def pr_cusum_batch(data, k):
+    """
+    Percentile ranked cumulative sums tester for each row of values in 'data'
+    using 'k' as the noise factor to remove from scores before summing.
+    """
+    return cusum_batch(score_batch(pr_scores, data), k)
+
+
+def pr_ewma_batch(data, a):
+    """
+    Percentile ranked exponentially weighted moving average tester for each
+    row of values in 'data' using 'a' as the smoothing factor.
+    """
+    means = ewma_batch(score_batch(pr_scores, data), a)
+    return np.sign(means) * np.abs(means)**a
+
+
+def ti_cusum_batch(data, k):
+    """
+    T independent cumulative sums tester for each row of values in 'data'
+    using 'k' as the noise factor to remove from scores before summing.
+    """
+    return cusum_batch(score_batch(ti_scores, data), k)
+
+
+def ti_ewma_batch(data, a):
+    """
+    T independent exponentially weighted moving average tester for each row
+    of values in 'data' using 'a' as the smoothing factor.
+    """
+    g = (a / (2 - a))**(1 / 2)
+    return ewma_batch(score_batch(ti_scores, data), a) / g
@@ -1,8 +1,44 @@
 """ Formats records (dictionaries) into text reports. """
 from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
 import io
+from itertools import chain, islice
+from operator import itemgetter
+import re
 from .util_tools import is_num, to_str
 
+SAMPLE_ROWS = 1000
+
+# ASCII text float() accepts, which is right justified as a number.
+_DIGITS = r'\d(?:_?\d)*'
+_NUMBER = re.compile(
+    r'\s*[+-]?(?:(?:{0}(?:\.(?:{0})?)?|\.{0})(?:e[+-]?{0})?'
+    r'|inf(?:inity)?|nan)\s*'.format(_DIGITS),
+    re.ASCII | re.IGNORECASE).fullmatch
+
+
+def cols_to_text_cols(columns, digits=3, max_len=80, indent=0,
+                      colnames=None):
+    """
+    Formats 'columns', a dictionary of field names to lists of values of the
+    same length, into text columns as 'to_text_cols' formats the records
+    they hold, with a line for each field. None values are blank.
+    """
+    return _cols_text_(_format_columns_(columns, digits, max_len),
+                       list(columns), max_len, indent, colnames)
+
+
+def cols_to_text_rows(columns, digits=3, max_len=80, indent=0):
+    """
+    Formats 'columns', a dictionary of field names to lists of values of the
+    same length, into evenly spaced text rows as 'to_text_rows' formats the
+    records they hold. None values are blank.
+    """
+    n = max(map(len, columns.values()), default=0)
+    return _rows_text_(_format_columns_(columns, digits, max_len), n, indent)
+
 
 def to_text_cols(records, digits=3, max_len=80, indent=0, colnames=None):
     """
@@ -12,22 +48,79 @@ def to_text_cols(records, digits=3, max_len=80, indent=0, colnames=None):
     maximum length printed for strings. 'indent' will indent the table the
     specified number of spaces.
     """
-    records = [records] if isinstance(records, dict) else records
-    cv_recs = []
-    for rec in records:
-        flds = [(fn, to_str(rec[fn], digits, max_len)) for fn in rec]
-        cv_recs.append(OrderedDict(flds))
+    records = [records] if isinstance(records, dict) else list(records)
+    return _cols_text_(_text_columns_(records, digits, max_len),
+                       list(records[0]), max_len, indent, colnames)
+
+
+def to_text_rows(records, digits=3, max_len=80, indent=0):
+    """
+    Formats 'records' into evenly spaced text rows. 'digits'
+    specifies precison for floating or decimal fields. 'max_len' is the
+    maximum length printed for strings. 'indent' will indent the table the
+    specified number of spaces.
+    """
+    records = [records] if isinstance(records, dict) else list(records)
+    return _rows_text_(_text_columns_(records, digits, max_len),
+                       len(records), indent)
+
+
+def write_text_rows(records, fo, digits=3, max_len=80, indent=0,
+                    sample_n=SAMPLE_ROWS, widths=None):
+    """
+    Write 'records' to file object 'fo' as evenly spaced text rows, as
+    'to_text_rows' formats them, in batches of 'sample_n' records as they
+    are generated. The column widths are fixed by 'widths', a dictionary of
+    field names to widths in the order written, or else from the first
+    batch, so only a batch of records is held at once. Fields not in
+    'widths', or without values in the first batch, are left out, and text
+    longer than its column is cut to fit. Returns the number of records
+    written.
+    """
+    if sample_n is None or sample_n < 1:
+        raise ValueError("Sample size must be at least 1.")
+    records = iter(records)
+    batch = list(islice(records, sample_n))
+    columns = None
+    if widths is None:
+        columns = _text_columns_(batch, digits, max_len)
+        widths = _text_widths_(columns)
+    else:
+        widths = OrderedDict(
+            [(fn, max(fl, len(fn))) for fn, fl in widths.items()])
+    fo.write(_text_header_(widths, indent))
+    fo.write('\n')
+    n = 0
+    while len(batch):
+        if columns is None:
+            columns = _text_columns_(batch, digits, max_len, list(widths))
+        for line in _text_lines_(columns, widths, len(batch), indent):
+            fo.write(line)
+            fo.write('\n')
+        n += len(batch)
+        batch = list(islice(records, sample_n))
+        columns = None
+    return n
+
+
+def _cols_text_(columns, names, max_len, indent, colnames):
+    """
+    Text of the fields 'names' of text 'columns' laid out in columns, a line
+    per field with text, see 'to_text_cols'.
+    """
+    texts = OrderedDict([(fn, col[0]) for fn, col in columns.items()])
     so = io.StringIO()
-    fn_len = max([len(fn) for fn in cv_recs[0]])
-    col_lens = [max([len(x) for x in cr.values()]) for cr in cv_recs]
-    for i, fn in enumerate(cv_recs[0]):
+    fn_len = max([len(fn) for fn in names], default=0)
+    col_lens = [max(lens) for lens in
+                zip(*[map(len, col) for col in texts.values()])]
+    for i, fn in enumerate(names):
         if i == 0:
             if colnames is not None:
                 print("%s %s" %
                       (''.ljust(max_len),
                        ' '.join([cn.rjust(max_len) for cn in colnames])),
                       file=so)
-        row = [cr[fn].rjust(ln) for ln, cr in zip(col_lens, cv_recs)]
+        row = [fv.rjust(ln) for ln, fv in zip(col_lens, texts[fn])]
         if sum([len(x.strip()) for x in row]):
             print("%s%s %s" %
                   (' '.ljust(indent), fn.ljust(fn_len), ' '.join(row)),
@@ -35,50 +128,110 @@ def to_text_cols(records, digits=3, max_len=80, indent=0, colnames=None):
     return so.getvalue().rstrip()
 
 
-def to_text_rows(records, digits=3, max_len=80, indent=0):
+def _format_column_(values, digits, max_len):
     """
-    Formats 'records' into evenly spaced text rows. 'digits'
-    specifies precison for floating or decimal fields. 'max_len' is the
-    maximum length printed for strings. 'indent' will indent the table the
-    specified number of spaces.
+    Text of the column 'values', as 'to_str' converts each value, and
+    whether it is right justified, as numbers are. The conversion is chosen
+    once from the types in the column. Justification is a flag for the
+    whole column, or a list of flags for each value when the column holds
+    text that may be a number.
     """
-    records = [records] if isinstance(records, dict) else records
+    types = set(map(type, values))
+    blanks = type(None) in types
+    types.discard(type(None))
+    if not len(types):
+        return [''] * len(values), False
+    if types == {int}:
+        conv, right = '%d'.__mod__, True
+    elif types <= {float, Decimal}:
+        conv, right = ('%%.%df' % digits).__mod__, True
+    elif types == {str}:
+        conv, right = itemgetter(slice(max_len)), None
+    elif types == {datetime}:
+        conv, right = datetime.isoformat, False
+    else:
+        conv, right = partial(to_str, digits=digits, max_len=max_len), None
+    if blanks:
+        texts = ['' if x is None else conv(x) for x in values]
+    else:
+        texts = list(map(conv, values))
+    if right is None:
+        right = [_NUMBER(fv) is not None if fv.isascii() else is_num(fv)
+                 for fv in texts]
+        if not any(right):
+            right = False
+    return texts, right
 
-    # Convert fields to printable text.
-    cv_recs = []
-    for rec in records:
-        flds = [(fn, to_str(rec[fn], digits, max_len)) for fn in rec]
-        cv_recs.append(OrderedDict(flds))
 
-    # find the max length of each convertedf field.
-    fld_lens = OrderedDict()
-    for cr in cv_recs:
-        for fn, fv in cr.items():
-            try:
-                fld_lens[fn] = max(fld_lens[fn], len(fv))
-            except KeyError:
-                fld_lens[fn] = len(fv)
+def _format_columns_(columns, digits, max_len):
+    """
+    Dictionary of the fields of 'columns', lists of values, to the text of
+    their values and justification, see '_format_column_'.
+    """
+    return OrderedDict(
+        [(fn, _format_column_(col, digits, max_len))
+         for fn, col in columns.items()])
 
-    # Filter fields with values, length > 0, add in field name max size.
-    fld_lens = OrderedDict(
-        [(fn, max(fl, len(fn))) for fn, fl in fld_lens.items() if fl > 0])
 
-    # Build the report.
-    so = io.StringIO()
-    so.write(' ' * indent)
-    for j, fn in enumerate(fld_lens):
-        if j > 0:
-            so.write(' ')
-        so.write(fn.ljust(fld_lens[fn]))
-    print(file=so)
-    for i, cr in enumerate(cv_recs):
-        so.write(' ' * indent)
-        for j, fn in enumerate(fld_lens):
-            if j > 0:
-                so.write(' ')
-            if is_num(cr[fn]):
-                so.write(cr[fn].rjust(fld_lens[fn]))
-            else:
-                so.write(cr[fn].ljust(fld_lens[fn]))
-        print(file=so)
-    return so.getvalue().rstrip()
+def _rows_text_(columns, n, indent):
+    """ Text of the 'n' rows of text 'columns', see 'to_text_rows'. """
+    widths = _text_widths_(columns)
+    lines = [_text_header_(widths, indent)]
+    lines.extend(_text_lines_(columns, widths, n, indent))
+    return '\n'.join(lines).rstrip()
+
+
+def _text_columns_(records, digits, max_len, names=None):
+    """
+    Dictionary of the fields of 'records', or only 'names', in the order
+    they are first found, to the text of their values and justification,
+    see '_format_column_'. Fields missing from a record are blank.
+    """
+    if names is None:
+        names = list(dict.fromkeys(chain.from_iterable(records)))
+    cols = OrderedDict()
+    for fn in names:
+        try:
+            cols[fn] = list(map(itemgetter(fn), records))
+        except KeyError:
+            cols[fn] = [rec.get(fn) for rec in records]
+    return _format_columns_(cols, digits, max_len)
+
+
+def _text_header_(widths, indent):
+    """ Header line of the field names in columns of 'widths'. """
+    return ' ' * indent + ' '.join([fn.ljust(fl) for fn, fl in widths.items()])
+
+
+def _text_lines_(columns, widths, n, indent):
+    """
+    Lines of the 'n' rows of text 'columns' in columns of 'widths', indented
+    'indent' spaces. Text longer than its column is cut to fit.
+    """
+    cells = []
+    for fn, fl in widths.items():
+        texts, right = columns[fn]
+        if right is True:
+            cells.append([fv.rjust(fl) for fv in texts])
+        elif right is False:
+            cells.append([fv[:fl].ljust(fl) for fv in texts])
+        else:
+            cells.append([fv.rjust(fl) if r else fv[:fl].ljust(fl)
+                          for fv, r in zip(texts, right)])
+    pad = ' ' * indent
+    if not len(cells):
+        return [pad] * n
+    return [pad + ' '.join(row) for row in zip(*cells)]
+
+
+def _text_widths_(columns):
+    """
+    Widths of text 'columns', the longest value or field name, for fields
+    with values.
+    """
+    widths = OrderedDict()
+    for fn, (texts, _) in columns.items():
+        fl = max(map(len, texts), default=0)
+        if fl > 0:
+            widths[fn] = max(fl, len(fn))
+    return widths
@@ -1,42 +1,152 @@
 """ Utility tools. """
-from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime, time
 from decimal import Decimal
-from difflib import SequenceMatcher
+from functools import lru_cache
 from inspect import currentframe, getframeinfo
+import io
+import json
+import math
 from numbers import Number
-import operator
 import os
+import re
 from typing import Callable
 
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+NDJSON_CHUNK = 1000
+SNAKE_CACHE = 4096
+
+_JSON = {}
+
+# Word starts in ASCII names, an upper case letter after a lower case one
+# or before one, from the third character on.
+_SNAKE_WORD = re.compile(
+    r'(?=[A-Z])(?<=..)(?:(?<=[a-z])|(?=.[a-z]))', re.S)
+_SNAKE_SEPS = re.compile(r'[\W_]+')
+
 
 def find_lcs(names):
-    """ Finds longest common substring among the strings in 'names'. """
-    sub_counts = defaultdict(int)
-    for i in range(0, len(names)):
-        for j in range(i + 1, len(names)):
-            sm = SequenceMatcher(None, names[i], names[j])
-            match = sm.find_longest_match(0, len(names[i]), 0, len(names[j]))
-            match_sub = names[i][match.a:match.a + match.size]
-            sub_counts[match_sub] += 1
-    common_sub = max(sub_counts.items(), key=operator.itemgetter(1))[0]
+    """
+    Finds the common substring among the strings in 'names' that is shared
+    most, by the number of pairs of names containing it times its length,
+    favouring long substrings common to many names. Returns it and 'names'
+    with it removed. The substrings are found with a generalized suffix
+    automaton of 'names', counting the names containing each, in time
+    near linear in their total length. This is not the longest match of
+    each pair of names counted, so it may differ from that, like
+    '_latency_p' rather than 'app_' for names such as 'app_latency_p50',
+    'app_errors' and 'db_latency_p99'.
+    """
+    if len(names) < 2:
+        raise ValueError("At least two names are needed to find a common "
+                         "substring.")
+    nxt, link, length = _suffix_automaton_(names)
+
+    # Count the names containing the substrings of each state, from the
+    # state of each prefix up the suffix links, and note where they are
+    # first found.
+    counts = [0] * len(length)
+    marks = [-1] * len(length)
+    ends = [None] * len(length)
+    for i, name in enumerate(names):
+        v = 0
+        for j, c in enumerate(name, 1):
+            v = nxt[v][c]
+            p = v
+            while p > 0 and marks[p] != i:
+                marks[p] = i
+                counts[p] += 1
+                if ends[p] is None:
+                    ends[p] = (i, j)
+                p = link[p]
+
+    best, best_key = 0, (0, 0)
+    for v in range(1, len(length)):
+        if counts[v] > 1:
+            key = (counts[v] * (counts[v] - 1) // 2 * length[v], length[v])
+            if key > best_key or key == best_key and ends[v] < ends[best]:
+                best, best_key = v, key
+    common_sub = ''
+    if best:
+        i, j = ends[best]
+        common_sub = names[i][j - length[best]:j]
     return common_sub, [name.replace(common_sub, '') for name in names]
 
 
+def _suffix_automaton_(names):
+    """
+    Generalized suffix automaton of the strings in 'names', the
+    transitions, suffix links and longest substring length of each state,
+    with the start state 0.
+    """
+    nxt, link, length = [{}], [-1], [0]
+
+    def _clone_(p, q, c):
+        """ Split state 'q' reached from 'p' by 'c', returning the clone. """
+        cl = len(length)
+        nxt.append(dict(nxt[q]))
+        link.append(link[q])
+        length.append(length[p] + 1)
+        while p != -1 and nxt[p].get(c) == q:
+            nxt[p][c] = cl
+            p = link[p]
+        link[q] = cl
+        return cl
+
+    for name in names:
+        last = 0
+        for c in name:
+            q = nxt[last].get(c)
+            if q is not None:
+                # The prefix is already a substring of an earlier name.
+                last = q if length[q] == length[last] + 1 else \
+                    _clone_(last, q, c)
+                continue
+            cur = len(length)
+            nxt.append({})
+            link.append(0)
+            length.append(length[last] + 1)
+            p = last
+            while p != -1 and c not in nxt[p]:
+                nxt[p][c] = cur
+                p = link[p]
+            if p != -1:
+                q = nxt[p][c]
+                link[cur] = q if length[q] == length[p] + 1 else \
+                    _clone_(p, q, c)
+            last = cur
+    return nxt, link, length
+
+
 def flatten_list(x):
-    """ Flatten sub-lists embedded in 'ls'. """
-    def _flatten_list_(x, fls):
-        if isinstance(x, (list, tuple)):
-            for y in x:
-                if isinstance(y, (list, tuple)):
-                    for z in y:
-                        _flatten_list_(z, fls)
-                else:
-                    fls.append(y)
+    """
+    Flatten sub-lists embedded in 'x', to any depth. Deeper lists are
+    walked with a stack of iterators rather than recursion, so depth is not
+    limited by the recursion limit.
+    """
+    if not isinstance(x, (list, tuple)):
+        return [x]
+    fls = []
+    append = fls.append
+    stack = [iter(x)]
+    while len(stack):
+        for y in stack[-1]:
+            if not isinstance(y, (list, tuple)):
+                append(y)
+                continue
+            # Sub-lists of values are flattened in line.
+            sub = iter(y)
+            for z in sub:
+                if isinstance(z, (list, tuple)):
+                    stack.append(sub)
+                    stack.append(iter(z))
+                    break
+                append(z)
+            else:
+                continue
+            break
         else:
-            fls.append(x)
-        return fls
-    return _flatten_list_(x, [])
+            stack.pop()
+    return fls
 
 
 def get_default(args, name, def_val=None):
@@ -62,6 +172,11 @@ def get_source_info():
     return tb.filename.rpartition('/')[2], tb.lineno, tb.function
 
 
+def get_type(x):
+    """ Name of the type of 'x', such as 'str', 'int' or 'datetime'. """
+    return type(x).__name__
+
+
 def is_empty(value, key=None):
     """ Returns true if 'value' or 'value[key]' is None or has no data. """
     test_val = None
@@ -114,6 +229,76 @@ def import_name(module, name):
         raise ImportError("Failed to import module %s: %s" % (module, ex))
 
 
+def json_default(x):
+    """
+    JSON value for 'x' of a type the JSON backends do not serialize, ISO
+    format for dates and times, float for Decimal, a list for sets and
+    tuples and the string of anything else.
+    """
+    if isinstance(x, (date, datetime, time)):
+        return x.isoformat()
+    if isinstance(x, Decimal):
+        return float(x)
+    if isinstance(x, (frozenset, set, tuple)):
+        return list(x)
+    return str(x)
+
+
+def max_or_none(x, y):
+    """ Maximum of 'x' and 'y' ignoring None, None if both are None. """
+    if x is None:
+        return y
+    if y is None:
+        return x
+    return max(x, y)
+
+
+def min_or_none(x, y):
+    """ Minimum of 'x' and 'y' ignoring None, None if both are None. """
+    if x is None:
+        return y
+    if y is None:
+        return x
+    return min(x, y)
+
+
+def set_json_backend(name=None):
+    """
+    Serialize JSON in 'to_json' and 'to_ndjson' with module 'name', one of
+    JSON_BACKENDS, or the first of them installed if None. Returns the name
+    of the module used.
+    """
+    if name is not None and name not in JSON_BACKENDS:
+        raise ValueError("Unknown JSON backend: %s" % name)
+    for mod_name in JSON_BACKENDS if name is None else (name,):
+        try:
+            mod = __import__(mod_name)
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        if mod_name == 'orjson':
+            def dumps(x, opt=mod.OPT_NON_STR_KEYS):
+                try:
+                    return mod.dumps(
+                        x, default=json_default, option=opt).decode()
+                except TypeError:
+                    return _json_dumps_(x)
+        elif mod_name == 'ujson':
+            def dumps(x, mod_dumps=mod.dumps):
+                try:
+                    return mod_dumps(
+                        x, default=json_default, ensure_ascii=False,
+                        escape_forward_slashes=False, allow_nan=False)
+                except (OverflowError, TypeError, ValueError):
+                    return _json_dumps_(x)
+        else:
+            dumps = _json_dumps_
+        _JSON['name'] = mod_name
+        _JSON['dumps'] = dumps
+        return mod_name
+
+
 def to_camel_name(name):
     """ Converts names like get_http_response_code to getHttpResponseCode."""
     result = []
@@ -128,10 +313,109 @@ def to_camel_name(name):
     return ''.join(result)
 
 
+def to_json(x, indent=None):
+    """
+    JSON for 'x' from the backend chosen by 'set_json_backend', by default
+    the fastest installed. Dates, times, Decimals and sets are serialized
+    by the backend through 'json_default', without copying 'x' first. If
+    'indent' is set the json module formats it with that indent. Every
+    backend writes the same compact UTF-8 text, with NaN and infinities as
+    null, and values a backend fails on, like integers over 64 bits for
+    orjson, are written by the json module. Only the exponents of floats
+    may be written differently, like 1e16 or 1e+16.
+    """
+    if indent is not None:
+        return _json_dumps_(x, indent)
+    if not _JSON:
+        set_json_backend()
+    return _JSON['dumps'](x)
+
+
+def to_ndjson(records, fo, chunk_size=NDJSON_CHUNK):
+    """
+    Write 'records' to file object 'fo' as newline delimited JSON, see
+    'to_json', joining 'chunk_size' lines for each write. Binary files are
+    written UTF-8 encoded. Returns the number of records written.
+    """
+    if not _JSON:
+        set_json_backend()
+    dumps = _JSON['dumps']
+    binary = isinstance(fo, (io.BufferedIOBase, io.RawIOBase))
+    lines = []
+    n = 0
+    for rec in records:
+        lines.append(dumps(rec))
+        if len(lines) >= chunk_size:
+            n += _write_lines_(fo, lines, binary)
+            lines = []
+    if len(lines):
+        n += _write_lines_(fo, lines, binary)
+    return n
+
+
+def _json_dumps_(x, indent=None):
+    """
+    JSON for 'x' from the json module, as the other backends write it, see
+    'to_json'.
+    """
+    opts = {'default': json_default, 'ensure_ascii': False,
+            'indent': indent}
+    if indent is None:
+        opts['separators'] = (',', ':')
+    try:
+        return json.dumps(x, allow_nan=False, **opts)
+    except ValueError:
+        return json.dumps(_to_finite_(to_safe_json(x)), **opts)
+
+
+def _to_finite_(x):
+    """
+    Copy of JSON safe 'x' with NaN and infinite floats replaced by None.
+    """
+    if isinstance(x, float):
+        return x if math.isfinite(x) else None
+    if isinstance(x, dict):
+        return {k: _to_finite_(v) for k, v in x.items()}
+    if isinstance(x, list):
+        return [_to_finite_(v) for v in x]
+    return x
+
+
+def _write_lines_(fo, lines, binary):
+    """ Write 'lines' to 'fo', encoded if 'binary', returning how many. """
+    text = '\n'.join(lines) + '\n'
+    fo.write(text.encode() if binary else text)
+    return len(lines)
+
+
+def to_safe_json(x):
+    """
+    Copy of 'x' with only the types the json module serializes, dictionaries
+    and lists copied recursively and other values converted by
+    'json_default'.
+    """
+    if x is None or isinstance(x, (bool, float, int, str)):
+        return x
+    if isinstance(x, dict):
+        return {k: to_safe_json(v) for k, v in x.items()}
+    if isinstance(x, (frozenset, list, set, tuple)):
+        return [to_safe_json(v) for v in x]
+    return json_default(x)
+
+
+@lru_cache(maxsize=SNAKE_CACHE)
 def to_snake_name(name):
-    """ Converts names like getHttpResponseCode to get_http_response_code. """
+    """
+    Converts names like getHttpResponseCode to get_http_response_code.
+    Names repeat, the columns of every query or file, so conversions are
+    cached.
+    """
+    name = name.strip()
+    if name.isascii():
+        sn_name = _SNAKE_WORD.sub('_', name).lower()
+        return sn_name if name.isalnum() else _SNAKE_SEPS.sub('_', sn_name)
     result = []
-    chx = [c if c.isalnum() else '_' for c in name.strip()]
+    chx = [c if c.isalnum() else '_' for c in name]
     for i, ch in enumerate(chx):
         if ch.isupper():
             if ((i - 1 > 0 and chx[i - 1].islower()) or